@@ -0,0 +1,340 @@
+"""Віджети редактора для великих сценаріїв: віртуалізований список сцен, пул рядків відповідей і пошук."""
+import tkinter as tk
+from tkinter import ttk
+
+import tracing
+
+
+class VirtualList:
+    """Список сцен, що малює лише видимі рядки.
+
+    Дані беруться з моделі `SceneNames`; у Listbox завжди лише одне «вікно» рядків,
+    тож вибір і прокрутка не залежать від кількості сцен.
+    """
+
+    def __init__(self, parent, model, on_select=None, width=24):
+        self.model = model
+        self.on_select = on_select
+        self.top = 0
+        self.rows = 20
+        self.selected = -1
+
+        self.frame = ttk.Frame(parent)
+        self.listbox = tk.Listbox(self.frame, width=width, exportselection=False, activestyle="none")
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.on_scrollbar)
+        self.listbox.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="left", fill="y")
+
+        self.listbox.bind("<<ListboxSelect>>", self.on_listbox_select)
+        self.listbox.bind("<Configure>", self.on_configure)
+        self.listbox.bind("<MouseWheel>", self.on_wheel)
+        self.listbox.bind("<Button-4>", lambda event: self.scroll(-3))
+        self.listbox.bind("<Button-5>", lambda event: self.scroll(3))
+        self.listbox.bind("<Up>", lambda event: self.move_selection(-1))
+        self.listbox.bind("<Down>", lambda event: self.move_selection(1))
+        self.listbox.bind("<Prior>", lambda event: self.move_selection(-self.rows))
+        self.listbox.bind("<Next>", lambda event: self.move_selection(self.rows))
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    @tracing.traced("editor.scene_list.refresh")
+    def refresh(self):
+        """Перемальовує видиме вікно рядків."""
+        total = len(self.model)
+        self.top = max(0, min(self.top, total - self.rows))
+        self.listbox.delete(0, "end")
+        visible = [self.model[row] for row in range(self.top, min(total, self.top + self.rows))]
+        if visible:
+            self.listbox.insert("end", *visible)
+        if self.top <= self.selected < self.top + len(visible):
+            self.listbox.selection_set(self.selected - self.top)
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + self.rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def on_configure(self, event):
+        """Кількість видимих рядків залежить від висоти віджета."""
+        line = self.listbox.bbox(0)
+        height = line[3] + 1 if line else 17
+        rows = max(1, event.height // height)
+        if rows != self.rows:
+            self.rows = rows
+            self.refresh()
+
+    def scroll(self, delta):
+        self.top += delta
+        self.refresh()
+        return "break"
+
+    def on_wheel(self, event):
+        return self.scroll(-3 if event.delta > 0 else 3)
+
+    def on_scrollbar(self, action, amount, unit=None):
+        total = len(self.model)
+        if action == "moveto":
+            self.top = int(float(amount) * total)
+        elif unit == "pages":
+            self.top += int(amount) * self.rows
+        else:
+            self.top += int(amount)
+        self.refresh()
+
+    def see(self, row):
+        """Прокручує так, щоб рядок був видимим."""
+        if row < self.top:
+            self.top = row
+        elif row >= self.top + self.rows:
+            self.top = row - self.rows + 1
+
+    def on_listbox_select(self, event):
+        selection = self.listbox.curselection()
+        if selection:
+            self.set_selected(self.top + selection[0])
+
+    def move_selection(self, delta):
+        if len(self.model):
+            self.set_selected(max(0, min(len(self.model) - 1, self.selected + delta)))
+        return "break"
+
+    def set_selected(self, row, notify=True):
+        self.selected = row
+        if row >= 0:
+            self.see(row)
+        self.refresh()
+        if notify and row >= 0 and self.on_select:
+            self.on_select(self.model[row])
+
+    def select(self, name, notify=False):
+        """Виділяє сцену за назвою (O(1) через індекс моделі)."""
+        self.set_selected(self.model.row(name), notify)
+
+    def clear_selection(self):
+        self.selected = -1
+        self.refresh()
+
+    def selected_name(self):
+        if 0 <= self.selected < len(self.model):
+            return self.model[self.selected]
+        return None
+
+
+class SearchBox:
+    """Поле пошуку зі списком результатів, що оновлюється під час введення.
+
+    `search(query)` повертає пару (рядки [(підпис, значення)], текст стану);
+    `on_pick(value)` викликається при виборі результату.
+    """
+
+    DELAY_MS = 150  # Пошук запускається після паузи у введенні
+
+    def __init__(self, parent, search, on_pick, width=24, height=8):
+        self.search = search
+        self.on_pick = on_pick
+        self.values = []
+        self._pending = None
+
+        self.frame = ttk.Frame(parent)
+        self.query_var = tk.StringVar()
+        self.entry = ttk.Entry(self.frame, textvariable=self.query_var, width=width)
+        self.entry.pack(fill="x")
+        self.status_var = tk.StringVar()
+        ttk.Label(self.frame, textvariable=self.status_var, foreground="gray").pack(anchor="w")
+        self.listbox = tk.Listbox(self.frame, width=width, height=height, exportselection=False, activestyle="none")
+
+        self.query_var.trace_add("write", lambda *args: self.schedule())
+        self.entry.bind("<Return>", lambda event: self.run())
+        self.entry.bind("<Down>", self.focus_results)
+        self.entry.bind("<Escape>", lambda event: self.query_var.set(""))
+        self.listbox.bind("<<ListboxSelect>>", self.on_select)
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def schedule(self):
+        if self._pending is not None:
+            self.frame.after_cancel(self._pending)
+        self._pending = self.frame.after(self.DELAY_MS, self.run)
+
+    def run(self):
+        self._pending = None
+        query = self.query_var.get().strip()
+        if not query:
+            self.show([], "")
+            return
+        rows, status = self.search(query)
+        self.show(rows, status)
+
+    def show(self, rows, status):
+        self.values = [value for _, value in rows]
+        self.listbox.delete(0, "end")
+        if rows:
+            self.listbox.insert("end", *[label for label, _ in rows])
+            if not self.listbox.winfo_ismapped():
+                self.listbox.pack(fill="x", pady=(0, 5))
+        elif self.listbox.winfo_ismapped():
+            self.listbox.pack_forget()
+        self.status_var.set(status)
+
+    def focus_results(self, event=None):
+        if self.values:
+            self.listbox.focus_set()
+            self.listbox.selection_clear(0, "end")
+            self.listbox.selection_set(0)
+            self.on_select()
+        return "break"
+
+    def on_select(self, event=None):
+        selection = self.listbox.curselection()
+        if selection:
+            self.on_pick(self.values[selection[0]])
+
+
+class ChoiceRow:
+    """Один рядок редагування відповіді: текст, наступна сцена, умова й ефект."""
+
+    def __init__(self, parent, scene_values):
+        self.frame = ttk.Frame(parent)
+        self.text_var = tk.StringVar()
+        self.next_scene_var = tk.StringVar()
+        self.requires_var = tk.StringVar()  # Умова доступності, напр. `money >= 20`
+        self.effect_var = tk.StringVar()  # Ефект рядком, напр. `health -= 10; money = max(money - 20, 0)`
+        self.shown = False
+
+        ttk.Entry(self.frame, textvariable=self.text_var, width=20).pack(side="left", padx=2)
+        # Список сцен підставляється лише при відкритті, зі спільної моделі
+        next_scene_menu = ttk.Combobox(self.frame, textvariable=self.next_scene_var, width=20, state="readonly")
+        next_scene_menu.configure(postcommand=lambda: next_scene_menu.configure(values=scene_values()))
+        next_scene_menu.pack(side="left", padx=2)
+        ttk.Entry(self.frame, textvariable=self.requires_var, width=14).pack(side="left", padx=2)
+        ttk.Entry(self.frame, textvariable=self.effect_var, width=20).pack(side="left", padx=2)
+
+    def set(self, text="", next_scene="", requires="", effect=""):
+        self.text_var.set(text)
+        self.next_scene_var.set(next_scene)
+        self.requires_var.set(requires)
+        self.effect_var.set(effect)
+
+    def entry(self):
+        return self.text_var, self.next_scene_var, self.requires_var, self.effect_var
+
+
+class ChoiceRowPool:
+    """Пул рядків відповідей: при зміні сцени рядки перезаповнюються, а не створюються заново."""
+
+    def __init__(self, parent, scene_values, before=None):
+        self.parent = parent
+        self.scene_values = scene_values
+        self.before = before  # Віджет, над яким пакуються рядки (кнопка «Додати відповідь»)
+        self.rows = []
+        self.count = 0
+
+    def _row(self, index):
+        if index == len(self.rows):
+            self.rows.append(ChoiceRow(self.parent, self.scene_values))
+        row = self.rows[index]
+        if not row.shown:
+            options = {"before": self.before} if self.before is not None else {}
+            row.frame.pack(fill="x", padx=5, pady=2, **options)
+            row.shown = True
+        return row
+
+    @tracing.traced("editor.choice_rows.show")
+    def show(self, values):
+        """Показує рядки для списку кортежів (текст, next_scene, умова, ефект)."""
+        for index, row_values in enumerate(values):
+            self._row(index).set(*row_values)
+        self.count = len(values)
+        for row in self.rows[self.count:]:
+            if row.shown:
+                row.frame.pack_forget()
+                row.shown = False
+
+    def add(self, *row_values):
+        """Додає ще один рядок відповіді."""
+        self._row(self.count).set(*row_values)
+        self.count += 1
+
+    def entries(self):
+        """Змінні видимих рядків у форматі `(text, next_scene, requires, effect)`."""
+        return [row.entry() for row in self.rows[:self.count]]
+
+
+WHOLE_SCENARIO = -1  # Результат ask_chapter: відкрити всі розділи
+
+
+def ask_chapter(parent, chapter_names, title="Розділ", whole_label="Увесь сценарій",
+                ok_label="Відкрити", cancel_label="Скасувати"):
+    """Модальний вибір розділу маніфесту.
+
+    Повертає номер розділу, `WHOLE_SCENARIO` для всього сценарію або None, якщо вибір скасовано.
+    """
+    dialog = tk.Toplevel(parent)
+    dialog.title(title)
+    if parent.winfo_viewable():  # Візуалізатор ховає головне вікно, і діалог не має до нього прив'язуватися
+        dialog.transient(parent)
+    result = []
+
+    listbox = tk.Listbox(dialog, width=40, height=min(15, len(chapter_names) + 1), exportselection=False)
+    listbox.insert("end", whole_label, *chapter_names)
+    listbox.selection_set(0)
+    listbox.pack(padx=10, pady=10, fill="both", expand=True)
+
+    def choose(event=None):
+        selection = listbox.curselection()
+        if selection:
+            result.append(selection[0] - 1 if selection[0] else WHOLE_SCENARIO)
+        dialog.destroy()
+
+    buttons = ttk.Frame(dialog)
+    buttons.pack(pady=(0, 10))
+    ttk.Button(buttons, text=ok_label, command=choose).pack(side="left", padx=5)
+    ttk.Button(buttons, text=cancel_label, command=dialog.destroy).pack(side="left", padx=5)
+    listbox.bind("<Double-Button-1>", choose)
+    dialog.bind("<Return>", choose)
+    dialog.bind("<Escape>", lambda event: dialog.destroy())
+
+    dialog.grab_set()
+    listbox.focus_set()
+    parent.wait_window(dialog)
+    return result[0] if result else None
+
+
+def ask_history_step(parent, labels, position, title="Історія правок", initial_label="Початковий стан",
+                     undone_label="скасовано", ok_label="Перейти", cancel_label="Скасувати"):
+    """Модальний вибір стану в історії правок.
+
+    Рядок 0 — стан до першого кроку, рядок `i` — стан після кроку `i`. Повертає номер
+    вибраного стану або None, якщо вибір скасовано.
+    """
+    dialog = tk.Toplevel(parent)
+    dialog.title(title)
+    dialog.transient(parent)
+    result = []
+
+    listbox = tk.Listbox(dialog, width=50, height=min(20, len(labels) + 1), exportselection=False)
+    listbox.insert("end", initial_label, *[f"{i}. {label}" + (f" ({undone_label})" if i > position else "")
+                                           for i, label in enumerate(labels, start=1)])
+    listbox.selection_set(position)
+    listbox.see(position)
+    listbox.pack(padx=10, pady=10, fill="both", expand=True)
+
+    def choose(event=None):
+        selection = listbox.curselection()
+        if selection:
+            result.append(selection[0])
+        dialog.destroy()
+
+    buttons = ttk.Frame(dialog)
+    buttons.pack(pady=(0, 10))
+    ttk.Button(buttons, text=ok_label, command=choose).pack(side="left", padx=5)
+    ttk.Button(buttons, text=cancel_label, command=dialog.destroy).pack(side="left", padx=5)
+    listbox.bind("<Double-Button-1>", choose)
+    dialog.bind("<Return>", choose)
+    dialog.bind("<Escape>", lambda event: dialog.destroy())
+
+    dialog.grab_set()
+    listbox.focus_set()
+    parent.wait_window(dialog)
+    return result[0] if result else None
@@ -0,0 +1,491 @@
+"""Асинхронний сервер гри: багато партій над одним скомпільованим сценарієм (HTTP/JSON).
+
+Сценарій завантажується й компілюється один раз і далі лише читається; стан кожного
+гравця — компактний запис `Session`. Хід виконує `CompiledScenario.step`, тобто діють ті
+самі правила ефектів і смерті, що й у `plot_game.py`.
+
+API:
+    POST   /sessions                 {"name": ...}    — нова партія
+    GET    /sessions/<id>                             — стан партії
+    POST   /sessions/<id>/choose     {"choice": i}    — зробити вибір
+    POST   /sessions/<id>/restart                     — почати спочатку
+    DELETE /sessions/<id>                             — завершити партію
+    GET    /stats                                     — кількість партій і затримки кроків
+"""
+import argparse
+import asyncio
+import json
+import random
+import secrets
+import sys
+import time
+from collections import OrderedDict
+
+from scenario_binary import load_scenario_file
+from scenario_engine import DEAD, ENDED, PLAYING, ChoiceNotAvailable, compile_scenario
+import tracing
+
+IDLE_TIMEOUT = 600.0  # Секунд без запитів, після яких партія видаляється
+EVICT_INTERVAL = 5.0
+MAX_BODY = 64 * 1024
+LATENCY_WINDOW = 100_000  # Скільки останніх вимірів затримки кроку зберігається
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large"}
+
+
+class Session:
+    """Стан одного гравця."""
+
+    __slots__ = ("id", "name", "scene", "attrs", "status", "steps", "last_seen")
+
+    def __init__(self, session_id, name, now):
+        self.id = session_id
+        self.name = name
+        self.scene = -1
+        self.attrs = None
+        self.status = ENDED
+        self.steps = 0
+        self.last_seen = now
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class SessionManager:
+    """Партії над спільним сценарієм з видаленням неактивних.
+
+    Партії зберігаються в порядку останнього звернення, тож видалення неактивних
+    переглядає лише ті, що справді застаріли.
+    """
+
+    def __init__(self, compiled, idle_timeout=IDLE_TIMEOUT):
+        self.compiled = compiled
+        self.idle_timeout = idle_timeout
+        self.sessions = OrderedDict()
+        self.latencies = LatencyWindow()  # Затримки кроків
+        self.steps = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def create(self, name, now=None):
+        now = time.monotonic() if now is None else now
+        session_id = secrets.token_hex(8)
+        session = Session(session_id, name, now)
+        self.sessions[session_id] = session
+        self.restart(session)
+        return session
+
+    def restart(self, session):
+        """Починає партію спочатку, як `Engine.start`."""
+        compiled = self.compiled
+        session.attrs = list(compiled.initial)
+        session.steps = 0
+        if not compiled.scene_count:
+            session.scene, session.status = -1, ENDED
+        else:
+            session.scene = 0
+            session.status = ENDED if compiled.is_ending(0) or compiled.is_stuck(0, session.attrs) else PLAYING
+        return session
+
+    def get(self, session_id, now=None):
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HttpError(404, f"Unknown session '{session_id}'.")
+        session.last_seen = time.monotonic() if now is None else now
+        self.sessions.move_to_end(session_id)
+        return session
+
+    def remove(self, session_id):
+        if self.sessions.pop(session_id, None) is None:
+            raise HttpError(404, f"Unknown session '{session_id}'.")
+
+    def choose(self, session, index):
+        """Робить вибір у партії за правилами `Game.make_choice`."""
+        if session.status != PLAYING:
+            raise HttpError(409, "The game is not in progress.")
+        started = time.perf_counter()
+        try:
+            session.scene, session.status = self.compiled.step(session.scene, session.attrs, index)
+        except IndexError as error:
+            raise HttpError(400, str(error))
+        except ChoiceNotAvailable as error:
+            raise HttpError(409, str(error))
+        session.steps += 1
+        self.steps += 1
+        self.latencies.add(time.perf_counter() - started)
+        return session
+
+    def evict_idle(self, now=None):
+        """Видаляє партії, неактивні довше за `idle_timeout`; повертає їх кількість."""
+        now = time.monotonic() if now is None else now
+        deadline = now - self.idle_timeout
+        sessions = self.sessions
+        count = 0
+        while sessions:
+            session = next(iter(sessions.values()))
+            if session.last_seen > deadline:
+                break
+            sessions.popitem(last=False)
+            count += 1
+        self.evicted += count
+        return count
+
+    def state(self, session):
+        """Стан партії для відповіді клієнту."""
+        compiled = self.compiled
+        scene = session.scene
+        playing = session.status == PLAYING
+        if scene >= 0:
+            offsets = compiled.offsets
+            choices = compiled.choice_texts[offsets[scene]:offsets[scene + 1]] if playing else []
+            name, text = compiled.scene_names[scene], compiled.scene_texts[scene]
+        else:
+            choices, name, text = [], None, ""
+        return {
+            "session": session.id,
+            "name": session.name,
+            "scene": name,
+            "text": text,
+            "choices": list(choices),
+            "available": compiled.available(scene, session.attrs) if playing else [],
+            "character": dict(zip(compiled.attr_names, session.attrs)),
+            "status": session.status,
+            "steps": session.steps,
+        }
+
+    def stats(self):
+        return {
+            "sessions": len(self.sessions),
+            "steps": self.steps,
+            "evicted": self.evicted,
+            "step_latency_ms": self.latencies.summary(),
+        }
+
+
+class LatencyWindow:
+    """Останні LATENCY_WINDOW вимірів затримки (кільцевий буфер)."""
+
+    def __init__(self, size=LATENCY_WINDOW):
+        self.size = size
+        self.values = []
+        self.pos = 0
+
+    def add(self, seconds):
+        if len(self.values) < self.size:
+            self.values.append(seconds)
+        else:
+            self.values[self.pos] = seconds
+            self.pos = (self.pos + 1) % self.size
+
+    def summary(self):
+        return latency_summary(self.values)
+
+
+def latency_summary(latencies):
+    """Перцентилі затримок у мілісекундах."""
+    if not latencies:
+        return {}
+    ordered = sorted(latencies)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 4)
+    return {"p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99), "max": round(ordered[-1] * 1000, 4)}
+
+
+class GameServer:
+    """HTTP/1.1 з keep-alive поверх asyncio-потоків; кожен запит обробляється синхронно."""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.server = None
+        self.evictor = None
+        self.latencies = LatencyWindow()  # Повна обробка запиту: від розбору до готової відповіді
+
+    async def start(self, host="127.0.0.1", port=8080):
+        self.server = await asyncio.start_server(self.handle, host, port)
+        self.evictor = asyncio.ensure_future(self.evict_loop())
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self.evictor is not None:
+            self.evictor.cancel()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def evict_loop(self):
+        while True:
+            await asyncio.sleep(EVICT_INTERVAL)
+            tracing.count("server.evicted", self.manager.evict_idle())
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, path, _ = lines[0].split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    key, sep, value = line.partition(":")
+                    if sep:
+                        headers[key.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # Без довжини тіла не знайти початок наступного запиту: відповідаємо й закриваємо
+                    data = json.dumps({"error": "Invalid Content-Length header."}).encode("utf-8")
+                    status, keep_alive = 400, False
+                elif length > MAX_BODY:
+                    status, payload = 413, {"error": "Request body is too large."}
+                    data = json.dumps(payload).encode("utf-8")
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    started = time.perf_counter()
+                    status, payload = self.dispatch(method, path, body)
+                    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                    self.latencies.add(time.perf_counter() - started)
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @tracing.traced("server.dispatch")
+    def dispatch(self, method, path, body):
+        """Виконує запит і повертає (код відповіді, JSON-об'єкт)."""
+        manager = self.manager
+        parts = [part for part in path.split("?", 1)[0].split("/") if part]
+        try:
+            request = json.loads(body) if body else {}
+            if not isinstance(request, dict):
+                raise HttpError(400, "Request body must be a JSON object.")
+            if parts == ["stats"] and method == "GET":
+                return 200, dict(manager.stats(), request_latency_ms=self.latencies.summary())
+            if not parts or parts[0] != "sessions" or len(parts) > 3:
+                raise HttpError(404, f"Unknown path '{path}'.")
+            if len(parts) == 1:
+                if method != "POST":
+                    raise HttpError(405, "Use POST to create a session.")
+                return 201, manager.state(manager.create(str(request.get("name", ""))))
+            if len(parts) == 2:
+                if method == "GET":
+                    return 200, manager.state(manager.get(parts[1]))
+                if method == "DELETE":
+                    manager.remove(parts[1])
+                    return 200, {"session": parts[1], "deleted": True}
+                raise HttpError(405, "Use GET or DELETE on a session.")
+            if method != "POST":
+                raise HttpError(405, "Use POST for session actions.")
+            session = manager.get(parts[1])
+            if parts[2] == "choose":
+                choice = request.get("choice")
+                if not isinstance(choice, int) or isinstance(choice, bool):
+                    raise HttpError(400, "'choice' must be an integer.")
+                return 200, manager.state(manager.choose(session, choice))
+            if parts[2] == "restart":
+                return 200, manager.state(manager.restart(session))
+            raise HttpError(404, f"Unknown action '{parts[2]}'.")
+        except HttpError as error:
+            return error.status, {"error": str(error)}
+        except ValueError:
+            return 400, {"error": "Request body is not valid JSON."}
+
+
+class GameClient:
+    """Простий клієнт з одним keep-alive з'єднанням (для перевірок і навантажувального тесту)."""
+
+    def __init__(self, host="127.0.0.1", port=8080):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        return self
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+
+    async def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                          f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split(" ", 2)[1])
+        length = 0
+        for line in lines[1:]:
+            key, _, value = line.partition(":")
+            if key.strip().lower() == "content-length":
+                length = int(value)
+        data = json.loads(await self.reader.readexactly(length)) if length else {}
+        return status, data
+
+    async def create(self, name):
+        return await self.request("POST", "/sessions", {"name": name})
+
+    async def state(self, session_id):
+        return await self.request("GET", f"/sessions/{session_id}")
+
+    async def choose(self, session_id, choice):
+        return await self.request("POST", f"/sessions/{session_id}/choose", {"choice": choice})
+
+    async def restart(self, session_id):
+        return await self.request("POST", f"/sessions/{session_id}/restart")
+
+
+async def serve(scenario, host, port, idle_timeout):
+    manager = SessionManager(compile_scenario(load_scenario_file(scenario, lazy=True)), idle_timeout)
+    server = GameServer(manager)
+    port = await server.start(host, port)
+    print(f"Serving '{scenario}' on http://{host}:{port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+async def play(host, port):
+    """Текстовий клієнт для ручної перевірки сервера."""
+    client = await GameClient(host, port).connect()
+    loop = asyncio.get_running_loop()
+    try:
+        name = (await loop.run_in_executor(None, input, "Name: ")).strip()
+        status, state = await client.create(name)
+        while True:
+            print(f"\n[{state['scene']}] {state['text']}")
+            print("  " + ", ".join(f"{key}: {value}" for key, value in state["character"].items()))
+            if state["status"] != PLAYING:
+                print("You died." if state["status"] == DEAD else "The end.")
+                return
+            for i, (text, available) in enumerate(zip(state["choices"], state["available"])):
+                print(f"  {i + 1}. {text}" + ("" if available else " (not available)"))
+            answer = await loop.run_in_executor(None, input, "> ")
+            if not answer.strip().isdigit():
+                continue
+            status, reply = await client.choose(state["session"], int(answer) - 1)
+            if status == 200:
+                state = reply
+            else:
+                print(reply["error"])
+    finally:
+        await client.close()
+
+
+async def bench(scenario, players, connections, steps, seed):
+    """Навантажувальний тест: `players` одночасних партій через `connections` з'єднань.
+
+    Сервер працює в тому самому процесі й циклі подій, тож результат — оцінка для одного ядра
+    разом з витратами клієнтів.
+    """
+    manager = SessionManager(compile_scenario(load_scenario_file(scenario, lazy=True)))
+    server = GameServer(manager)
+    port = await server.start("127.0.0.1", 0)
+    rng = random.Random(seed)
+    round_trips = []
+
+    async def worker(count):
+        client = await GameClient("127.0.0.1", port).connect()
+        try:
+            states = []
+            for _ in range(count):
+                status, state = await client.create(f"player{len(states)}")
+                states.append(state)
+            done = 0
+            while done < steps * count:
+                for i, state in enumerate(states):
+                    started = time.perf_counter()
+                    options = [i for i, available in enumerate(state["available"]) if available]
+                    if state["status"] == PLAYING and options:
+                        status, state = await client.choose(state["session"], rng.choice(options))
+                    else:  # Партія завершилася або застрягла — починаємо її знову
+                        status, state = await client.restart(state["session"])
+                    round_trips.append(time.perf_counter() - started)
+                    states[i] = state
+                    done += 1
+        finally:
+            await client.close()
+
+    started = time.perf_counter()
+    share, extra = divmod(players, connections)
+    await asyncio.gather(*(worker(share + (i < extra)) for i in range(connections) if share + (i < extra)))
+    elapsed = time.perf_counter() - started
+    await server.close()
+    return {
+        "players": players,
+        "connections": connections,
+        "requests": len(round_trips),
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(round_trips) / elapsed),
+        "step_latency_ms": manager.latencies.summary(),
+        "request_latency_ms": server.latencies.summary(),
+        "round_trip_ms": latency_summary(round_trips),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-session game server for scenarios.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="host games over HTTP/JSON")
+    serve_parser.add_argument("scenario", help="JSON or .istb scenario")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8080)
+    serve_parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT,
+                              help="seconds before an inactive session is evicted")
+    serve_parser.add_argument("--trace", metavar="FILE", help="write a Chrome trace and print a timing summary")
+
+    play_parser = commands.add_parser("play", help="play on a running server from the console")
+    play_parser.add_argument("--host", default="127.0.0.1")
+    play_parser.add_argument("--port", type=int, default=8080)
+
+    bench_parser = commands.add_parser("bench", help="load-test an in-process server")
+    bench_parser.add_argument("scenario", help="JSON or .istb scenario")
+    bench_parser.add_argument("--players", type=int, default=10_000, help="concurrent sessions")
+    bench_parser.add_argument("--connections", type=int, default=100, help="client connections")
+    bench_parser.add_argument("--steps", type=int, default=5, help="requests per player")
+    bench_parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        if args.trace:
+            tracing.enable(args.trace)
+        try:
+            asyncio.run(serve(args.scenario, args.host, args.port, args.idle_timeout))
+        except KeyboardInterrupt:
+            pass
+    elif args.command == "play":
+        asyncio.run(play(args.host, args.port))
+    else:
+        if args.players < 1 or args.connections < 1:
+            sys.exit("--players and --connections must be positive")
+        result = asyncio.run(bench(args.scenario, args.players, min(args.connections, args.players),
+                                   args.steps, args.seed))
+        print(json.dumps(result, indent=4))
+
+
+if __name__ == "__main__":
+    main()
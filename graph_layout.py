@@ -0,0 +1,246 @@
+"""Розкладка графа сценарію: шарова (Sugiyama) для великих історій і кеш позицій поруч зі сценарієм."""
+import hashlib
+import json
+import os
+
+import networkx as nx
+
+from scenario_binary import atomic_write
+from tracing import span, traced
+
+LAYOUT_VERSION = 1
+SPRING_LIMIT = 300  # До цієї кількості сцен за замовчуванням лишається силова розкладка
+INCREMENTAL_LIMIT = 400  # Найбільша околиця змін, яку розкладаємо інкрементально
+X_GAP = 1.0
+Y_GAP = 1.5
+
+
+def structure_hash(G):
+    """Хеш структури графа: назви сцен і переходи в порядку їх появи."""
+    digest = hashlib.sha1()
+    for node in G.nodes:
+        digest.update(str(node).encode("utf-8") + b"\0")
+    digest.update(b"\1")
+    for u, v in G.edges:
+        digest.update(str(u).encode("utf-8") + b"\0" + str(v).encode("utf-8") + b"\0")
+    return digest.hexdigest()
+
+
+def spring_layout(G, pos=None, fixed=None):
+    """Силова розкладка з параметрами, звичними для візуалізатора."""
+    return nx.spring_layout(G, seed=42, k=1.2, pos=pos, fixed=fixed)
+
+
+def layered_layout(G, sweeps=4):
+    """Шарова розкладка для історій: DAG зі зворотними ребрами.
+
+    1. Зворотні ребра (цикли) відкидаються обходом у глибину від стартової сцени.
+    2. Шар сцени — найдовший шлях до неї в отриманому ациклічному графі.
+    3. Порядок у шарі уточнюється кількома проходами барицентричного методу.
+    """
+    nodes = list(G.nodes)
+    index = {node: i for i, node in enumerate(nodes)}
+    n = len(nodes)
+    succ = [[] for _ in range(n)]
+    for u, v in G.edges:
+        if u != v:
+            succ[index[u]].append(index[v])
+
+    # Обхід у глибину: порядок завершення дає топологічне сортування без зворотних ребер
+    state = bytearray(n)  # 0 — не відвідано, 1 — у стеку, 2 — завершено
+    finished = []
+    forward = [[] for _ in range(n)]
+    for root in range(n):
+        if state[root]:
+            continue
+        state[root] = 1
+        stack = [(root, 0)]
+        while stack:
+            v, i = stack[-1]
+            if i < len(succ[v]):
+                stack[-1] = (v, i + 1)
+                w = succ[v][i]
+                if state[w] == 1:
+                    continue  # Зворотне ребро — цикл історії
+                forward[v].append(w)
+                if not state[w]:
+                    state[w] = 1
+                    stack.append((w, 0))
+                continue
+            state[v] = 2
+            finished.append(v)
+            stack.pop()
+
+    layer = [0] * n
+    for v in reversed(finished):
+        for w in forward[v]:
+            if layer[w] < layer[v] + 1:
+                layer[w] = layer[v] + 1
+
+    layers = [[] for _ in range(max(layer, default=-1) + 1)]
+    for v in reversed(finished):
+        layers[layer[v]].append(v)
+    position = [0.0] * n
+    for row in layers:
+        for i, v in enumerate(row):
+            position[v] = i
+
+    pred = [[] for _ in range(n)]
+    for v in range(n):
+        for w in forward[v]:
+            pred[w].append(v)
+
+    def reorder(row, neighbours):
+        keyed = []
+        for i, v in enumerate(row):
+            around = neighbours[v]
+            keyed.append((sum(position[w] for w in around) / len(around) if around else position[v], i, v))
+        keyed.sort()
+        row[:] = [v for _, _, v in keyed]
+        for i, v in enumerate(row):
+            position[v] = i
+
+    for _ in range(sweeps):
+        for row in layers[1:]:
+            reorder(row, pred)
+        for row in reversed(layers[:-1]):
+            reorder(row, forward)
+
+    pos = {}
+    for depth, row in enumerate(layers):
+        middle = (len(row) - 1) / 2
+        for i, v in enumerate(row):
+            pos[nodes[v]] = ((i - middle) * X_GAP, -depth * Y_GAP)
+    return pos
+
+
+def compute_layout(G, algorithm="auto"):
+    """Повна розкладка: `spring`, `layered` або `auto` (за розміром графа)."""
+    algorithm = _resolve(G, algorithm)
+    with span("layout." + algorithm, nodes=len(G)):
+        if algorithm == "spring":
+            return {node: tuple(map(float, xy)) for node, xy in spring_layout(G).items()}
+        return layered_layout(G)
+
+
+class LayoutCache:
+    """Позиції вузлів у JSON-файлі поруч зі сценарієм (`story.layout.json` для `story.json`)."""
+
+    def __init__(self, scenario_path):
+        self.path = os.path.splitext(scenario_path)[0] + ".layout.json"
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get("version") != LAYOUT_VERSION:
+            return None
+        return cached
+
+    def save(self, graph_hash, algorithm, pos):
+        data = {
+            "version": LAYOUT_VERSION,
+            "hash": graph_hash,
+            "algorithm": algorithm,
+            "positions": {str(node): [float(x), float(y)] for node, (x, y) in pos.items()},
+        }
+        try:
+            atomic_write(self.path, lambda f: json.dump(data, f, ensure_ascii=False), mode="w", encoding="utf-8")
+        except OSError:
+            pass  # Кеш необов'язковий: каталог може бути лише для читання
+
+
+def _resolve(G, algorithm):
+    if algorithm == "auto":
+        return "spring" if len(G) <= SPRING_LIMIT else "layered"
+    return algorithm
+
+
+def _place_layered(G, known, new):
+    """Ставить нові сцени в сітку шарів: під попередниками, над наступниками, у найближчу вільну клітинку."""
+    pos = dict(known)
+    occupied = {(round(x / X_GAP), round(y / Y_GAP)) for x, y in known.values()}
+
+    def place(node):
+        preds = [pos[w] for w in G.predecessors(node) if w in pos and w != node]
+        succs = [pos[w] for w in G.successors(node) if w in pos and w != node]
+        around = preds + succs
+        x = sum(p[0] for p in around) / len(around)
+        if preds:
+            y = min(p[1] for p in preds) - Y_GAP
+        else:
+            y = max(p[1] for p in succs) + Y_GAP
+        cx, cy = round(x / X_GAP), round(y / Y_GAP)
+        step = 0
+        while (cx + step, cy) in occupied:
+            step = -step if step > 0 else -step + 1  # 0, 1, -1, 2, -2, ...
+        occupied.add((cx + step, cy))
+        pos[node] = ((cx + step) * X_GAP, cy * Y_GAP)
+
+    pending = list(new)
+    while pending:
+        rest = []
+        for node in pending:
+            if any(w in pos for w in G.predecessors(node)) or any(w in pos for w in G.successors(node)):
+                place(node)
+            else:
+                rest.append(node)
+        if len(rest) == len(pending):
+            # Окремі нові компоненти — рядком під усім графом
+            bottom = min((y for _, y in pos.values()), default=0.0) - Y_GAP
+            for i, node in enumerate(rest):
+                pos[node] = (i * X_GAP, bottom)
+            break
+        pending = rest
+    return pos
+
+
+@traced("layout.incremental")
+def incremental_layout(G, known, algorithm="auto"):
+    """Розкладає лише нові сцени та їхніх сусідів; решта позицій закріплена.
+
+    Повертає None, якщо змінена околиця завелика для інкрементального оновлення.
+    """
+    new = [node for node in G.nodes if node not in known]
+    if not new:
+        return {node: known[node] for node in G.nodes}
+    region = set(new)
+    for node in new:
+        region.update(G.predecessors(node))
+        region.update(G.successors(node))
+    if len(region) > INCREMENTAL_LIMIT:
+        return None
+
+    kept = {node: known[node] for node in G.nodes if node in known}
+    if _resolve(G, algorithm) == "layered":
+        return _place_layered(G, kept, new)
+
+    pinned = [node for node in region if node in known]
+    if not pinned:
+        return None
+    local = spring_layout(G.subgraph(region), pos={node: known[node] for node in pinned}, fixed=pinned)
+    kept.update({node: tuple(map(float, local[node])) for node in new})
+    return kept
+
+
+@traced("layout.cached")
+def cached_layout(G, scenario_path, algorithm="auto"):
+    """Позиції з кешу; при змінах графа — інкрементальне оновлення, інакше повна розкладка."""
+    cache = LayoutCache(scenario_path)
+    graph_hash = structure_hash(G)
+    cached = cache.load()
+    if cached and cached.get("algorithm") == algorithm:
+        known = {node: tuple(cached["positions"][str(node)]) for node in G.nodes if str(node) in cached["positions"]}
+        if cached.get("hash") == graph_hash and len(known) == len(G):
+            return known
+        if known:
+            pos = incremental_layout(G, known, algorithm)
+            if pos is not None:
+                cache.save(graph_hash, algorithm, pos)
+                return pos
+
+    pos = compute_layout(G, algorithm)
+    cache.save(graph_hash, algorithm, pos)
+    return pos
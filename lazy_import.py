@@ -0,0 +1,17 @@
+"""Відкладений імпорт важких залежностей.
+
+Імпорт NumPy коштує ~0,1 с, networkx і matplotlib — ще більше. Модулі ядра (модель,
+завантаження, перевірка, правила гри) не імпортують їх на рівні модуля, а беруть через
+`optional()` у тій функції, якій вони справді потрібні, тож запуск гри чи редактора їх не чекає.
+"""
+import functools
+import importlib
+
+
+@functools.lru_cache(maxsize=None)
+def optional(name):
+    """Модуль `name` або None, якщо його не встановлено; імпортується під час першого виклику."""
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
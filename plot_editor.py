@@ -1,6 +1,18 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import json
+
+from editor_widgets import WHOLE_SCENARIO, ChoiceRowPool, SearchBox, VirtualList, ask_chapter, ask_history_step
+from scenario_binary import load_scenario_file
+from scenario_chapters import ChapterScenes
+from scenario_expr import ExpressionError, compile_expression, format_effect, parse_effect
+from scenario_history import History
+from scenario_model import ScenarioModel
+from scenario_search import CHOICE, NAME, SearchIndex
+from scenario_store import ChangeJournal, ScenarioStore
+from scenario_texts import pack_scenario
+import tracing
+
+AUTOSAVE_MS = 3000  # Період дописування змін у журнал
 
 class ScenarioEditor:
     def __init__(self, root):
@@ -12,9 +24,15 @@ class ScenarioEditor:
             "scenes": {}
         }
         self.filename = None
+        self.manifest = None  # Маніфест, якщо відкрито сценарій з розділів
+        self.chapter = None  # Номер відкритого розділу; None — відкрито весь сценарій
+        # Записи на диск виконуються у фоновому потоці, інтерфейс не чекає
+        self.store = ScenarioStore()
 
         self.create_menu()
         self.create_tabs()
+        self.root.protocol("WM_DELETE_WINDOW", self.quit)
+        self.root.after(AUTOSAVE_MS, self.autosave)
 
     def create_menu(self):
         menu_bar = tk.Menu(self.root)
@@ -24,9 +42,17 @@ class ScenarioEditor:
         file_menu.add_command(label="Зберегти", command=self.save_scenario)
         file_menu.add_command(label="Зберегти як...", command=self.save_scenario_as)
         file_menu.add_separator()
-        file_menu.add_command(label="Вихід", command=self.root.quit)
+        file_menu.add_command(label="Вихід", command=self.quit)
         menu_bar.add_cascade(label="Файл", menu=file_menu)
+        edit_menu = tk.Menu(menu_bar, tearoff=0)
+        edit_menu.add_command(label="Скасувати", accelerator="Ctrl+Z", command=self.undo)
+        edit_menu.add_command(label="Повторити", accelerator="Ctrl+Y", command=self.redo)
+        edit_menu.add_command(label="Історія правок...", command=self.show_history)
+        menu_bar.add_cascade(label="Правка", menu=edit_menu)
         self.root.config(menu=menu_bar)
+        self.root.bind("<Control-z>", lambda event: self.undo())
+        self.root.bind("<Control-y>", lambda event: self.redo())
+        self.root.bind("<Control-Z>", lambda event: self.redo())
 
     def create_tabs(self):
         self.tabs = ttk.Notebook(self.root)
@@ -59,15 +85,26 @@ class ScenarioEditor:
 
     def save_character(self):
         """Зберігає змінені характеристики персонажа в self.data."""
-        for attr, var in self.character_fields.items():
-            self.data["character"][attr] = var.get()
+        with self.history.group("Характеристики персонажа"):
+            self.model.set_character({attr: var.get() for attr, var in self.character_fields.items()})
         messagebox.showinfo("Збережено", "Характеристики персонажа збережено!")
 
 
     def create_scenario_tab(self):
-        self.scene_listbox = tk.Listbox(self.scenario_tab)
-        self.scene_listbox.pack(side="left", fill="y", padx=5, pady=5)
-        self.scene_listbox.bind("<<ListboxSelect>>", self.load_selected_scene)
+        # Модель сценарію: назви сцен (спільні для списку й випадаючих списків) і зворотні посилання
+        self.model = ScenarioModel(self.data)
+        # Скасування правок: кроки тримають лише змінені сцени, а не копії сценарію
+        self.history = History(self.model)
+        # Пошуковий індекс оновлюється разом з моделлю, після завантаження будується у фоні
+        self.search_index = SearchIndex(self.model)
+        self.scene_names = self.model.names
+
+        left = ttk.Frame(self.scenario_tab)
+        left.pack(side="left", fill="y", padx=5, pady=5)
+        self.search_box = SearchBox(left, self.search_scenes, on_pick=self.show_search_hit)
+        self.search_box.pack(fill="x")
+        self.scene_list = VirtualList(left, self.scene_names, on_select=self.load_selected_scene)
+        self.scene_list.pack(fill="both", expand=True)
 
         btn_frame = ttk.Frame(self.scenario_tab)
         btn_frame.pack(side="left", fill="y")
@@ -89,177 +126,290 @@ class ScenarioEditor:
 
         self.choices_frame = ttk.LabelFrame(self.scene_editor, text="Варіанти відповідей")
         self.choices_frame.pack(fill="both", padx=5, pady=5, expand=True)
-        self.choice_entries = []
+        add_choice_button = ttk.Button(self.choices_frame, text="Додати відповідь", command=self.add_choice_entry)
+        add_choice_button.pack(fill="x", padx=5, pady=2)
+        # Рядки відповідей перевикористовуються між сценами
+        self.choice_rows = ChoiceRowPool(self.choices_frame, self.scene_names.values, before=add_choice_button)
 
         ttk.Button(self.scene_editor, text="Зберегти сцену", command=self.save_scene).pack(fill="x", padx=5, pady=2)
 
     def add_scene(self):
-        new_scene_name = f"Сцена {len(self.data['scenes']) + 1}"
-        self.data["scenes"][new_scene_name] = {"text": "", "choices": []}
-        self.scene_listbox.insert("end", new_scene_name)
-
+        number = len(self.data["scenes"]) + 1
+        while f"Сцена {number}" in self.data["scenes"]:
+            number += 1
+        new_scene_name = f"Сцена {number}"
+        with self.history.group(f"Додано сцену «{new_scene_name}»"):
+            self.model.put_scene(new_scene_name, {"text": "", "choices": []})
+        self.scene_list.see(len(self.scene_names) - 1)
+        self.scene_list.refresh()
+
+    @tracing.traced("editor.delete_scene")
     def delete_scene(self):
-        selected = self.scene_listbox.curselection()
-        if not selected:
-            return
-        scene_name = self.scene_listbox.get(selected[0])
-        del self.data["scenes"][scene_name]
-        self.scene_listbox.delete(selected[0])
-
-    def add_choice_entry(self, text="", next_scene="", effect=None):
-        frame = ttk.Frame(self.choices_frame)
-        frame.pack(fill="x", padx=5, pady=2)
-    
-        text_var = tk.StringVar(value=text)
-        next_scene_var = tk.StringVar(value=next_scene)
-    
-        effect = effect or {}
-    
-        ttk.Entry(frame, textvariable=text_var, width=20).pack(side="left", padx=2)
-    
-        next_scene_menu = ttk.Combobox(frame, textvariable=next_scene_var, values=list(self.data["scenes"].keys()), width=20, state="readonly")
-        next_scene_menu.pack(side="left", padx=2)
-    
-        char_attr_var = tk.StringVar(value=list(effect.keys())[0] if effect else "")
-        char_attr_menu = ttk.Combobox(frame, textvariable=char_attr_var, values=list(self.data["character"].keys()), width=10, state="readonly")
-        char_attr_menu.pack(side="left", padx=2)
-    
-        effect_value_var = tk.StringVar(value=str(list(effect.values())[0]) if effect else "")
-        ttk.Entry(frame, textvariable=effect_value_var, width=10).pack(side="left", padx=2)
-    
-        self.choice_entries.append((text_var, next_scene_var, char_attr_var, effect_value_var))
-
-
-
-    def load_selected_scene(self, event):
-        selected = self.scene_listbox.curselection()
-        if not selected:
+        scene_name = self.scene_list.selected_name()
+        if scene_name is None:
             return
-    
-        scene_name = self.scene_listbox.get(selected[0])
+        referrers = self.model.referrers(scene_name)
+        drop = False
+        if referrers:
+            sources = sorted({source for source, _ in referrers})
+            shown = ", ".join(sources[:5]) + (" ..." if len(sources) > 5 else "")
+            drop = messagebox.askyesnocancel(
+                "Видалення сцени",
+                f"На сцену «{scene_name}» посилаються відповіді ({len(referrers)}) у сценах: {shown}.\n"
+                "Видалити ці відповіді разом зі сценою? («Ні» — залишити посилання)")
+            if drop is None:
+                return
+        with self.history.group(f"Видалено сцену «{scene_name}»"):
+            self.model.delete_scene(scene_name, drop_references=drop)
+        self.scene_list.clear_selection()
+
+    @tracing.traced("editor.load_selected_scene")
+    def load_selected_scene(self, scene_name):
         scene_data = self.data["scenes"][scene_name]
-    
+
         self.scene_title_var.set(scene_name)
         self.scene_text.delete("1.0", "end")
-        self.scene_text.insert("1.0", scene_data["text"])
-    
-        # Очищення старих варіантів відповідей
-        for widget in self.choices_frame.winfo_children():
-            widget.destroy()
-    
-        self.choice_entries = []
-    
-        for choice in scene_data["choices"]:
-            effect = choice.get("effect", {})
-            attr, value = (next(iter(effect.items())) if effect else ("", ""))  # Розбираємо словник ефекту
-            self.add_choice_entry(choice["text"], choice["next_scene"], attr, str(value))
-
-    
-        ttk.Button(self.choices_frame, text="Додати відповідь", command=self.add_choice_entry).pack(fill="x", padx=5, pady=2)
-    
-
-    def add_choice_entry(self, text="", next_scene="", attr="", effect_value=""):
-        frame = ttk.Frame(self.choices_frame)
-        frame.pack(fill="x", padx=5, pady=2)
-    
-        text_var = tk.StringVar(value=text)
-        next_scene_var = tk.StringVar(value=next_scene)
-        char_attr_var = tk.StringVar(value=attr)  # Змінювана характеристика
-        effect_value_var = tk.StringVar(value=effect_value)  # Значення ефекту
-    
-        ttk.Entry(frame, textvariable=text_var, width=20).pack(side="left", padx=2)
-        next_scene_menu = ttk.Combobox(frame, textvariable=next_scene_var, values=list(self.data["scenes"].keys()), width=20, state="readonly")
-        next_scene_menu.pack(side="left", padx=2)
-        char_attr_menu = ttk.Combobox(frame, textvariable=char_attr_var, values=list(self.data["character"].keys()), width=10, state="readonly")
-        char_attr_menu.pack(side="left", padx=2)
-        ttk.Entry(frame, textvariable=effect_value_var, width=10).pack(side="left", padx=2)
-    
-        self.choice_entries.append((text_var, next_scene_var, char_attr_var, effect_value_var))
-    
+        self.scene_text.insert("1.0", str(scene_data["text"]))  # Стиснений текст розпаковується лише тут
+
+        # Перезаповнюємо наявні рядки відповідей замість створення нових віджетів
+        rows = [(str(choice["text"]), choice["next_scene"], choice.get("requires") or "",
+                 format_effect(choice.get("effect")))
+                for choice in scene_data["choices"]]
+        self.choice_rows.show(rows)
 
+    def add_choice_entry(self, text="", next_scene="", requires="", effect=""):
+        self.choice_rows.add(text, next_scene, requires, effect)
+
+    @tracing.traced("editor.save_scene")
     def save_scene(self):
-        old_scene_name = self.scene_listbox.get(self.scene_listbox.curselection()) if self.scene_listbox.curselection() else None
+        old_scene_name = self.scene_list.selected_name()
         new_scene_name = self.scene_title_var.get().strip()
-        
+
         if not new_scene_name:
             messagebox.showwarning("Помилка", "Назва сцени не може бути порожньою!")
             return
-        
-        # Видаляємо стару сцену, якщо змінилася назва
-        if old_scene_name and old_scene_name != new_scene_name:
-            self.data["scenes"].pop(old_scene_name, None)
-            self.scene_listbox.delete(self.scene_listbox.get(0, "end").index(old_scene_name))
-        
-        # Оновлюємо дані сцени
-        self.data["scenes"][new_scene_name] = {
-            "text": self.scene_text.get("1.0", "end").strip(),
-            "choices": [
-                {
-                    "text": text.get(),
-                    "next_scene": next_scene.get(),
-                    "effect": {char_attr.get(): int(effect_value.get())} if char_attr.get() else {}
-                }
-                for text, next_scene, char_attr, effect_value in self.choice_entries
-            ],
-        }
-    
-        # Оновлюємо список сцен у Listbox
-        if new_scene_name not in self.scene_listbox.get(0, "end"):
-            self.scene_listbox.insert("end", new_scene_name)
-    
-    
+
+        attr_index = {name: i for i, name in enumerate(self.data["character"])}
+        choices = []
+        for i, (text, next_scene, requires, effect) in enumerate(self.choice_rows.entries(), start=1):
+            choice = {"text": text.get(), "next_scene": next_scene.get()}
+            try:
+                choice["effect"] = parse_effect(effect.get())
+                if requires.get().strip():
+                    compile_expression(requires.get().strip(), attr_index)
+                    choice["requires"] = requires.get().strip()
+                for value in choice["effect"].values():
+                    if isinstance(value, str):
+                        compile_expression(value, attr_index)
+            except ExpressionError as error:
+                messagebox.showwarning("Помилка", f"Відповідь {i}: {error}")
+                return
+            choices.append(choice)
+        scene = {"text": self.scene_text.get("1.0", "end").strip(), "choices": choices}
+
+        renamed = old_scene_name and old_scene_name != new_scene_name
+        if renamed and new_scene_name in self.data["scenes"]:
+            messagebox.showwarning("Помилка", f"Сцена «{new_scene_name}» вже існує!")
+            return
+
+        # Перейменування разом з оновленням посилань і новим вмістом — один крок історії
+        with self.history.group(f"Змінено сцену «{new_scene_name}»"):
+            # При перейменуванні посилання на сцену оновлюються через індекс зворотних посилань
+            if renamed:
+                self.model.rename_scene(old_scene_name, new_scene_name)
+                for choice in scene["choices"]:
+                    if choice["next_scene"] == old_scene_name:
+                        choice["next_scene"] = new_scene_name
+
+            # Оновлюємо дані сцени та список сцен
+            self.model.put_scene(new_scene_name, scene)
+        self.scene_list.select(new_scene_name)
+
+    def search_scenes(self, query):
+        """Рядки результатів для поля пошуку: `to:назва` — відповіді, що ведуть до сцени."""
+        hits = self.search_index.search(query)
+        rows = []
+        for hit in hits:
+            if hit.choices:
+                label = f"{hit.name} → " + ", ".join(f"#{i + 1}" for i in hit.choices)
+            else:
+                label = hit.name + {NAME: "", CHOICE: " (відповідь)"}.get(hit.field, " (текст)")
+            rows.append((label, hit.name))
+        status = f"Знайдено: {len(hits)}" if hits else "Нічого не знайдено"
+        if not self.search_index.ready:
+            status += " (індексування…)"
+        return rows, status
+
+    def show_search_hit(self, scene_name):
+        if scene_name in self.data["scenes"]:
+            self.scene_list.select(scene_name, notify=True)
+
+    def undo(self):
+        if self.history.can_undo():
+            self.jump_history(self.history.position - 1)
+
+    def redo(self):
+        if self.history.can_redo():
+            self.jump_history(self.history.position + 1)
+
+    def show_history(self):
+        position = ask_history_step(self.root, self.history.labels(), self.history.position)
+        if position is not None:
+            self.jump_history(position)
+
+    @tracing.traced("editor.jump_history")
+    def jump_history(self, position):
+        """Скасовує чи повторює кроки до стану `position` і оновлює інтерфейс."""
+        selected = self.scene_list.selected_name()  # Після кроку рядки списку можуть зсунутися
+        changed = self.history.jump(position)
+        for attr, var in self.character_fields.items():
+            if attr in self.data["character"]:
+                var.set(self.data["character"][attr])
+        if selected not in self.data["scenes"]:
+            # Сцену видалено або перейменовано; якщо крок зачепив одну сцену — показуємо її
+            existing = [name for name in changed if name in self.data["scenes"]]
+            selected = existing[0] if len(existing) == 1 else None
+        elif selected not in changed:
+            self.scene_list.select(selected)  # Вміст не змінився, незбережені поля лишаються
+            return
+        if selected is None:
+            self.scene_list.clear_selection()
+            self.scene_title_var.set("")
+            self.scene_text.delete("1.0", "end")
+            self.choice_rows.show([])
+        else:
+            self.scene_list.select(selected)
+            self.load_selected_scene(selected)
+
     def new_scenario(self):
+        self.flush_journal()
+        self.filename = None
+        self.manifest = self.chapter = None
         self.data = {"character": {"health": 100, "strength": 10, "money": 50}, "scenes": {}}
-        self.scene_listbox.delete(0, "end")
+        self.model.reset(self.data)
+        self.history.clear()
+        self.search_index.rebuild()
+        self.scene_list.clear_selection()
+
+    def scenario_path(self):
+        """Файл, поруч з яким ведеться журнал: відкритий розділ, маніфест або звичайний сценарій."""
+        if self.manifest is not None and self.chapter is not None:
+            return self.manifest.chapter_path(self.chapter)
+        return self.filename
 
     def save_scenario(self):
         if self.filename:
-            with open(self.filename, "w", encoding="utf-8") as f:
-                json.dump(self.data, f, ensure_ascii=False, indent=4)
-            messagebox.showinfo("Збережено", f"Сценарій збережено у {self.filename}!")
+            # Повний запис стискає журнал, тож накопичені зміни вже не потрібні
+            self.model.take_changes()
+            write = None
+            if self.manifest is not None:
+                manifest, chapter = self.manifest, self.chapter
+                write = lambda snapshot: manifest.save(snapshot, chapter)  # Розділи й маніфест
+            future = self.store.save(self.model.snapshot(), self.scenario_path(), write)
+            self.root.after(100, self.check_save, future)
         else:
             self.save_scenario_as()
 
+    def check_save(self, future):
+        if not future.done():
+            self.root.after(100, self.check_save, future)
+            return
+        error = future.exception()
+        if error is not None:
+            messagebox.showerror("Помилка", f"Не вдалося зберегти сценарій: {error}")
+        else:
+            messagebox.showinfo("Збережено", f"Сценарій збережено у {future.result()}!")
+
     def save_scenario_as(self):
-        filename = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON файли", "*.json")])
+        filename = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON файли", "*.json"), ("Бінарні сценарії", "*.istb")])
         if filename:
+            if self.filename and self.scenario_path() != filename:
+                # Зміни переходять у новий файл, журнал старого більше не потрібен
+                self.store.discard_journal(self.scenario_path())
             self.filename = filename
+            self.manifest = self.chapter = None  # Відкрите зберігається окремим сценарієм
             self.save_scenario()
 
+    @tracing.traced("editor.flush_journal")
+    def flush_journal(self):
+        """Дописує зміни з останнього автозбереження в журнал відкритого файлу."""
+        if self.filename:
+            character, scenes, order = self.model.take_changes()
+            if character is not None or scenes or order is not None:
+                self.store.journal(self.scenario_path(), character, scenes, order)
+
+    def autosave(self):
+        self.flush_journal()
+        self.root.after(AUTOSAVE_MS, self.autosave)
+
+    def quit(self):
+        # Незбережені зміни лишаються в журналі й пропонуються до відновлення при відкритті
+        self.flush_journal()
+        self.store.close()
+        self.root.quit()
+
+    @tracing.traced("editor.update_ui_after_load")
     def update_ui_after_load(self):
         # Оновлення характеристик персонажа
         for attr, var in self.character_fields.items():
             if attr in self.data["character"]:
                 var.set(self.data["character"][attr])
-    
-        # Очищення списку сцен
-        self.scene_listbox.delete(0, "end")
-    
-        # Додавання сцен у список
-        for scene_name in self.data["scenes"]:
-            self.scene_listbox.insert("end", scene_name)
-    
+
+        # Тексти стискаються: у пам'яті лишаються лише блоки zlib, розпаковується вибрана сцена
+        pack_scenario(self.data)
+
+        # Список сцен малює лише видимі рядки, тож достатньо замінити модель
+        self.model.reset(self.data)
+        self.history.clear()
+        self.search_index.rebuild()
+        self.scene_list.top = 0
+        self.scene_list.clear_selection()
+
         # Очищення полів редагування сцени
         self.scene_title_var.set("")
         self.scene_text.delete("1.0", "end")
-    
+
         # Очищення варіантів відповідей
-        for widget in self.choices_frame.winfo_children():
-            widget.destroy()
-    
-        self.choice_entries = []
-    
+        self.choice_rows.show([])
 
     def load_scenario(self):
-        filename = filedialog.askopenfilename(filetypes=[("JSON файли", "*.json")])
+        filename = filedialog.askopenfilename(filetypes=[("Сценарії", "*.json *.istb"), ("JSON файли", "*.json"), ("Бінарні сценарії", "*.istb")])
         if filename:
-            with open(filename, "r", encoding="utf-8") as f:
-                self.data = json.load(f)
-            self.filename = filename
+            self.flush_journal()
+            self.store.wait()
+            data = load_scenario_file(filename, lazy=True)
+            manifest = chapter = None
+            if isinstance(data["scenes"], ChapterScenes):
+                # Сценарій з розділів: відкриваємо один розділ або весь
+                manifest = data["scenes"].manifest
+                chapter = ask_chapter(self.root, manifest.chapter_names)
+                if chapter is None:
+                    return
+                if chapter == WHOLE_SCENARIO:
+                    chapter = None
+                    data = manifest.merged()
+                else:
+                    data = manifest.chapter_data(chapter)
+            elif not isinstance(data["scenes"], dict):
+                data = load_scenario_file(filename)  # Бінарний файл декодуємо повністю
+            self.data = data
+            self.filename, self.manifest, self.chapter = filename, manifest, chapter
+            journal = ChangeJournal(self.scenario_path())
+            if journal.exists():
+                if messagebox.askyesno("Відновлення", "Знайдено незбережені зміни з попереднього сеансу. Відновити їх?"):
+                    journal.replay(self.data)
+                else:
+                    journal.clear()
             self.update_ui_after_load()
             messagebox.showinfo("Завантажено", f"Сценарій завантажено з {filename}!")
 
 
-root = tk.Tk()
-app = ScenarioEditor(root)
-root.mainloop()
+def main():
+    tracing.enable_from_argv()
+    root = tk.Tk()
+    ScenarioEditor(root)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,81 @@
 import tkinter as tk
+import time
 from tkinter import ttk, filedialog, messagebox
-import json
+
+from scenario_binary import load_scenario_file
+from scenario_chapters import ChapterScenario, ChapterScenes
+from scenario_engine import Engine, compile_scenario, DEAD, ENDED
+from scenario_texts import compress_texts
+import tracing
+
+CHARS_PER_SECOND = 33  # Звична швидкість друку (приблизно символ за 30 мс)
+MAX_REVEAL_SECONDS = 3.0  # Довгі сцени друкуються швидше, щоб анімація не тривала вічно
+FRAME_MS = 30  # Найменший інтервал між кадрами
+FRAME_BUDGET = 0.5  # Частка часу між кадрами, яку може займати оновлення тексту
+
+
+class TextReveal:
+    """Поступове виведення тексту в мітку кадрами, а не окремим after() на кожен символ.
+
+    Кількість видимих символів залежить від часу, що минув, тож повільний кадр наздоганяється
+    наступним. Інтервал між кадрами росте, якщо оновлення мітки дороге, і анімація триває
+    не довше MAX_REVEAL_SECONDS, тож кількість подій Tk обмежена. Одночасно активна лише одна
+    анімація: новий запуск скасовує попередню.
+    """
+
+    def __init__(self, root, label):
+        self.root = root
+        self.label = label
+        self.text = ""
+        self.shown = 0
+        self.handle = None
+        self.on_done = None
+
+    def start(self, text, on_done=None):
+        self.cancel()
+        self.text = text
+        self.shown = 0
+        self.on_done = on_done
+        self.speed = max(CHARS_PER_SECOND, len(text) / MAX_REVEAL_SECONDS)
+        self.started = time.perf_counter()
+        self.label.config(text="")
+        self.frame()
+
+    @tracing.traced("game.text_frame")
+    def frame(self):
+        self.handle = None
+        now = time.perf_counter()
+        count = min(len(self.text), int((now - self.started) * self.speed) + 1)
+        if count != self.shown:
+            tracing.count("game.chars_revealed", count - self.shown)
+            self.shown = count
+            self.label.config(text=self.text[:count])
+        if count >= len(self.text):
+            self.finish()
+            return
+        cost = time.perf_counter() - now
+        delay = max(FRAME_MS, int(cost * 1000 / FRAME_BUDGET))
+        self.handle = self.root.after(delay, self.frame)
+
+    def skip(self, event=None):
+        """Одразу показує весь текст."""
+        if self.handle is None:
+            return
+        self.cancel()
+        self.shown = len(self.text)
+        self.label.config(text=self.text)
+        self.finish()
+
+    def cancel(self):
+        if self.handle is not None:
+            self.root.after_cancel(self.handle)
+            self.handle = None
+
+    def finish(self):
+        on_done, self.on_done = self.on_done, None
+        if on_done:
+            on_done()
+
 
 class Game:
     def __init__(self, root):
@@ -10,6 +85,7 @@ class Game:
         self.root.configure(bg="#2E3440")  # Темний фон
 
         self.data = {}
+        self.engine = None
         self.character = {}
         self.current_scene = None
         self.player_name = ""
@@ -38,6 +114,8 @@ class Game:
 
         self.text_label = ttk.Label(self.root, text="", justify="left", wraplength=450, font=("Arial", 12))
         self.text_label.pack(pady=15)
+        self.reveal = TextReveal(self.root, self.text_label)
+        self.text_label.bind("<Button-1>", self.reveal.skip)  # Клік по тексту показує його повністю
 
         self.choices_frame = ttk.Frame(self.root, style="TFrame")
         self.choices_frame.pack()
@@ -45,13 +123,31 @@ class Game:
         self.character_label = ttk.Label(self.root, text="", font=("Arial", 12, "italic"), foreground="#A3BE8C")
         self.character_label.pack(pady=10)
 
+    @tracing.traced("game.load_scenario")
     def load_scenario(self):
         """Завантаження сценарію гри"""
-        filename = filedialog.askopenfilename(filetypes=[("JSON файли", "*.json")])
+        filename = filedialog.askopenfilename(filetypes=[("Сценарії", "*.json *.istb"), ("JSON файли", "*.json"), ("Бінарні сценарії", "*.istb")])
         if not filename:
             return
-        with open(filename, "r", encoding="utf-8") as f:
-            self.data = json.load(f)
+        self.data = load_scenario_file(filename, lazy=True)  # Бінарні сцени читаються з диска на вимогу
+        if self.engine is not None and isinstance(self.engine.compiled, ChapterScenario):
+            self.engine.compiled.close()  # Зупиняємо фонове читання попереднього сценарію
+        scenes = self.data.get("scenes")
+        if isinstance(scenes, ChapterScenes):
+            # Сценарій з розділів: у пам'яті лише поточний і сусідні розділи
+            self.engine = Engine(ChapterScenario(scenes.manifest))
+        else:
+            try:
+                compiled = compile_scenario(self.data)  # Компілюємо сценарій один раз
+            except ValueError as error:  # Напр. помилка у виразі `requires` чи ефекту
+                messagebox.showerror("Помилка", f"Не вдалося завантажити сценарій: {error}")
+                return
+            if isinstance(compiled.scene_texts, list):
+                # Тексти JSON-сценарію стискаються й розпаковуються лише для показаної сцени;
+                # словник сцен після компіляції не потрібен
+                compress_texts(compiled)
+                self.data = {"character": self.data.get("character", {})}
+            self.engine = Engine(compiled)
         self.character = self.data.get("character", {}).copy()  # Створюємо копію характеристик
         messagebox.showinfo("Готово", "Сценарій завантажено!")
 
@@ -62,63 +158,63 @@ class Game:
             messagebox.showwarning("Помилка", "Введіть ім'я персонажа!")
             return
 
+        if self.engine is None or not self.engine.compiled.scene_count:
+            messagebox.showwarning("Помилка", "Спочатку завантажте сценарій!")
+            return
+
         self.player_name = name  # Зберігаємо ім'я персонажа
-        self.current_scene = list(self.data.get("scenes", {}).keys())[0]
+        self.engine.start()
+        self.current_scene = self.engine.scene_name()
+        self.character = self.engine.character()
         self.name_entry.config(state="disabled")  # Блокуємо поле імені після старту гри
         self.update_scene()
 
+    @tracing.traced("game.update_scene")
     def update_scene(self):
         """Оновлення сцени"""
-        if not self.current_scene or self.current_scene not in self.data["scenes"]:
+        if self.engine is None or self.engine.scene < 0:
             return
-        scene = self.data["scenes"][self.current_scene]
-
-        # Анімація поступового виведення тексту
-        self.animate_text(scene["text"])
+        text = self.engine.scene_text()
 
         for widget in self.choices_frame.winfo_children():
             widget.destroy()
 
-        if not scene["choices"]:  # Якщо немає вибору - це фінальна сцена
-            self.root.after(2000, lambda: self.end_game(scene["text"]))  # Даємо час дочитати сцену
+        if self.engine.status == ENDED:  # Якщо немає вибору - це фінальна сцена
+            # Даємо час дочитати сцену після того, як текст виведено
+            self.reveal.start(text, on_done=lambda: self.root.after(2000, lambda: self.end_game(text)))
         else:
-            for choice in scene["choices"]:
-                btn = ttk.Button(self.choices_frame, text=choice["text"], 
-                                 command=lambda ch=choice: self.make_choice(ch))
+            # Анімація поступового виведення тексту
+            self.reveal.start(text)
+            # Вибори з невиконаною умовою `requires` видно, але натиснути їх не можна
+            for index, (choice_text, available) in enumerate(zip(self.engine.choices(), self.engine.available())):
+                btn = ttk.Button(self.choices_frame, text=choice_text,
+                                 command=lambda i=index: self.make_choice(i))
+                if not available:
+                    btn.state(["disabled"])
                 btn.pack(fill="x", pady=3, padx=10)
 
         self.character_label.config(text=self.format_characteristics())
+        if isinstance(self.engine.compiled, ChapterScenario):
+            self.engine.compiled.prefetch(self.engine.scene)  # Поки гравець читає, вантажимо наступні розділи
 
-    def animate_text(self, text, index=0):
-        """Анімація поступового виведення тексту"""
-        if index == 0:
-            self.text_label.config(text="")  # Очистка перед виведенням нового тексту
-
-        if index < len(text):
-            self.text_label.config(text=self.text_label["text"] + text[index])
-            self.root.after(30, lambda: self.animate_text(text, index + 1))  # Швидкість друку
-        else:
+    @tracing.traced("game.make_choice")
+    def make_choice(self, index):
+        """Обробка вибору гравця"""
+        try:
+            status = self.engine.choose(index)
+        except (OSError, ValueError) as error:  # Напр. розділ сценарію не читається або зіпсований
+            messagebox.showerror("Помилка", f"Не вдалося зробити вибір: {error}")
             return
+        self.character = self.engine.character()
 
-    def make_choice(self, choice):
-        """Обробка вибору гравця"""
-        if "effect" in choice:
-            for attr, value in choice["effect"].items():
-                if attr in self.character:
-                    self.character[attr] += value
-    
         # Перевіряємо, чи здоров'я впало до 0 або нижче
-        if self.character.get("health", 1) <= 0:
+        if status == DEAD:
             messagebox.showinfo("Гра закінчена", "Ви програли! 💀")
             self.root.quit()
             return
-    
-        self.current_scene = choice["next_scene"]
-    
-        if not self.current_scene:
-            self.end_game(self.data["scenes"][choice["next_scene"]]["text"])
-        else:
-            self.update_scene()
+
+        self.current_scene = self.engine.scene_name()
+        self.update_scene()
 
     def format_characteristics(self):
         """Форматування характеристик героя"""
@@ -133,6 +229,13 @@ class Game:
         messagebox.showinfo("Кінець гри", final_message)
         self.root.quit()  # Закриття гри
 
-root = tk.Tk()
-app = Game(root)
-root.mainloop()
+
+def main():
+    tracing.enable_from_argv()
+    root = tk.Tk()
+    Game(root)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""Статичний аналіз графа сценарію за O(V+E) без networkx і matplotlib."""
+import json
+import sys
+from bisect import bisect_right
+from collections.abc import Mapping
+
+from lazy_import import optional
+from scenario_binary import load_scenario_file
+from scenario_engine import compile_scenario, invalid_effect
+from scenario_expr import ExpressionError, expression_names
+import tracing
+
+NUMPY_MIN_SCENES = 50_000  # Менші графи швидше обійти на Python, ніж імпортувати NumPy (~0,15 с)
+SMALL_FRONTIER = 256  # Вужчий фронт BFS обходиться чергою на Python, а не операціями NumPy
+
+
+class AnalysisReport:
+    """Результат аналізу: помилки (биті посилання, замкнені цикли) та попередження."""
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+        self.unreachable = []  # Сцени, недосяжні зі стартової
+        self.dangling = []  # (сцена, номер вибору, next_scene)
+        self.dead_loops = []  # Списки сцен: цикли без виходу й без фіналу
+        self.no_ending = []  # Сцени, з яких не досягти жодної фінальної сцени
+        self.unknown_attrs = []  # (сцена, номер вибору, ключ ефекту)
+        self.zero_divisions = []  # (сцена, номер вибору, вираз з діленням на сталий нуль)
+
+    @property
+    def errors(self):
+        return len(self.dangling) + len(self.dead_loops)
+
+    @property
+    def warnings(self):
+        return len(self.unreachable) + len(self.no_ending) + len(self.unknown_attrs) + len(self.zero_divisions)
+
+    @property
+    def ok(self):
+        return not self.errors and not self.warnings
+
+    def to_dict(self):
+        return {
+            "unreachable": self.unreachable,
+            "dangling": [{"scene": s, "choice": i, "next_scene": name} for s, i, name in self.dangling],
+            "dead_loops": self.dead_loops,
+            "no_ending": self.no_ending,
+            "unknown_attrs": [{"scene": s, "choice": i, "attr": attr} for s, i, attr in self.unknown_attrs],
+            "zero_divisions": [{"scene": s, "choice": i, "expression": source}
+                               for s, i, source in self.zero_divisions],
+        }
+
+    def format(self, limit=20):
+        """Людиночитний звіт; кожен розділ обрізається до `limit` рядків."""
+        sections = [
+            ("Dangling next_scene references", [f"'{s}' choice #{i} -> '{name}'" for s, i, name in self.dangling]),
+            ("Loops with no exit", [" -> ".join(loop[:10]) + (" ..." if len(loop) > 10 else "")
+                                    for loop in self.dead_loops]),
+            ("Unreachable scenes", self.unreachable),
+            ("Scenes that cannot reach an ending", self.no_ending),
+            ("Unknown effect attributes", [f"'{s}' choice #{i}: '{attr}'" for s, i, attr in self.unknown_attrs]),
+            ("Division by zero (always gives 0)", [f"'{s}' choice #{i}: '{source}'"
+                                                   for s, i, source in self.zero_divisions]),
+        ]
+        lines = []
+        for title, items in sections:
+            if not items:
+                continue
+            lines.append(f"{title} ({len(items)}):")
+            lines.extend(f"  {item}" for item in items[:limit])
+            if len(items) > limit:
+                lines.append(f"  ... and {len(items) - limit} more")
+        return "\n".join(lines) if lines else "No issues found."
+
+
+def validate_scenario(data):
+    """Перевіряє структуру сценарію у форматі README; при порушенні кидає ValueError."""
+    if "character" not in data or "scenes" not in data:
+        raise ValueError("Invalid JSON format: Missing 'character' or 'scenes' key.")
+
+    if not isinstance(data["scenes"], Mapping):  # Також ліниві сцени бінарного файлу й розділів
+        raise ValueError("Invalid JSON format: 'scenes' should be a dictionary.")
+    if not isinstance(data["character"], Mapping):
+        raise ValueError("Invalid JSON format: 'character' should be a dictionary.")
+
+    for scene_id, scene in data["scenes"].items():
+        if not isinstance(scene, Mapping) or "text" not in scene or "choices" not in scene:
+            raise ValueError(f"Scene '{scene_id}' is missing 'text' or 'choices' keys.")
+        if not isinstance(scene["choices"], list):
+            raise ValueError(f"Scene '{scene_id}': 'choices' should be a list.")
+
+        for choice in scene["choices"]:
+            if not isinstance(choice, Mapping) or "text" not in choice or "next_scene" not in choice:
+                raise ValueError(f"Choice in scene '{scene_id}' is missing 'text' or 'next_scene'.")
+
+        for i, choice in enumerate(scene["choices"]):
+            effect = choice.get("effect") or {}
+            if not isinstance(effect, Mapping):
+                raise ValueError(f"Scene '{scene_id}' choice #{i}: 'effect' should be a dictionary.")
+            for attr, value in effect.items():
+                if not isinstance(value, (int, float, str)):
+                    raise invalid_effect(scene_id, i, attr, value)
+            expressions = [value for value in effect.values() if isinstance(value, str)]
+            if choice.get("requires") is not None:
+                expressions.append(choice["requires"])
+            for source in expressions:
+                try:
+                    names = expression_names(source)
+                except ExpressionError as error:
+                    raise ValueError(f"Scene '{scene_id}' choice #{i}: {error}") from None
+                unknown = [name for name in names if name not in data["character"]]
+                if unknown:
+                    raise ValueError(f"Scene '{scene_id}' choice #{i}: unknown attribute '{unknown[0]}' "
+                                     f"in '{source}'.")
+
+
+def _reverse_edges(offsets, targets, n):
+    """Зворотна CSR-таблиця: для кожної сцени — сцени, з яких до неї веде вибір."""
+    counts = [0] * (n + 1)
+    for t in targets:
+        counts[t + 1] += 1  # Ціль -1 потрапляє в комірку 0 і далі не використовується
+    rev_offsets = [0] * (n + 1)
+    total = 0
+    for s in range(n):
+        total += counts[s + 1]
+        rev_offsets[s + 1] = total
+    fill = rev_offsets[:-1]
+    sources = [0] * total
+    for s in range(n):
+        for t in targets[offsets[s]:offsets[s + 1]]:
+            if t >= 0:
+                sources[fill[t]] = s
+                fill[t] += 1
+    return rev_offsets, sources
+
+
+def _mark(offsets, targets, n, seeds):
+    """Позначає сцени, досяжні з `seeds` по CSR-таблиці (звичайний BFS)."""
+    marked = bytearray(n)
+    queue = list(seeds)
+    for s in queue:
+        marked[s] = 1
+    append = queue.append
+    for s in queue:
+        for t in targets[offsets[s]:offsets[s + 1]]:
+            if t >= 0 and not marked[t]:
+                marked[t] = 1
+                append(t)
+    return marked
+
+
+def _np_reverse_edges(offsets, targets, n):
+    np = optional("numpy")
+    sources = np.repeat(np.arange(n, dtype=np.int64), np.diff(offsets))
+    valid = targets >= 0
+    sources, dest = sources[valid], targets[valid]
+    order = np.argsort(dest)
+    rev_offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(dest, minlength=n), out=rev_offsets[1:])
+    return rev_offsets, sources[order]
+
+
+def _np_mark(offsets, targets, n, seeds):
+    """BFS: широкий фронт розгортається однією векторною операцією, вузький — чергою на Python.
+
+    У глибоких графах (ланцюги з тисяч сцен) фронт тримається вузьким тисячі рівнів поспіль,
+    і накладні витрати на кожну операцію NumPy там переважили б саму роботу.
+    """
+    np = optional("numpy")
+    marked = bytearray(n)
+    view = np.frombuffer(marked, dtype=bool)  # Той самий буфер: позначки спільні для обох режимів
+    stamp = np.empty(n, dtype=np.int64)
+    lists = None
+    frontier = np.asarray(seeds, dtype=np.int64)
+    view[frontier] = True
+    while len(frontier):
+        if len(frontier) < SMALL_FRONTIER:
+            if lists is None:
+                lists = offsets.tolist(), targets.tolist()  # Списки Python: без скалярів NumPy у циклі
+            offsets_l, targets_l = lists
+            # Звичайна черга, поки в ній мало сцен; порядок обходу для позначок неважливий
+            queue = frontier.tolist() if isinstance(frontier, np.ndarray) else frontier
+            append = queue.append
+            head = 0
+            while head < len(queue) and len(queue) - head < SMALL_FRONTIER:
+                s = queue[head]
+                head += 1
+                for t in targets_l[offsets_l[s]:offsets_l[s + 1]]:
+                    if t >= 0 and not marked[t]:
+                        marked[t] = 1
+                        append(t)
+            frontier = queue[head:]
+            continue
+        frontier = np.asarray(frontier, dtype=np.int64)
+        starts = offsets[frontier]
+        degree = offsets[frontier + 1] - starts
+        total = int(degree.sum())
+        if not total:
+            break
+        # Індекси всіх ребер фронту: start + 0..degree-1 для кожної сцени
+        shift = np.repeat(starts - np.cumsum(degree) + degree, degree)
+        nxt = targets[shift + np.arange(total)]
+        nxt = nxt[nxt >= 0]
+        nxt = nxt[~view[nxt]]
+        # Прибираємо дублікати за O(фронту): лишається останнє входження кожної сцени
+        positions = np.arange(len(nxt))
+        stamp[nxt] = positions
+        frontier = nxt[stamp[nxt] == positions]
+        view[frontier] = True
+    return view
+
+
+def _closed_components(compiled, nodes):
+    """Компоненти сильної зв'язності (ітеративний Тарʼян), з яких немає ребер назовні.
+
+    `nodes` — замкнена множина сцен (усі ребра з неї ведуть у неї ж), тож кожна знайдена
+    нетривіальна компонента без виходу — цикл, з якого не вибратися.
+    """
+    offsets, targets = compiled.offsets, compiled.targets
+    index = {}
+    low = {}
+    comp = {}
+    stack, on_stack = [], set()
+    loops = []
+    counter = 0
+    for root in nodes:
+        if root in index:
+            continue
+        work = [(root, offsets[root])]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            v, e = work[-1]
+            if e < offsets[v + 1]:
+                work[-1] = (v, e + 1)
+                w = targets[e]
+                if w < 0:
+                    continue
+                if w not in index:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack.add(w)
+                    work.append((w, offsets[w]))
+                elif w in on_stack and index[w] < low[v]:
+                    low[v] = index[w]
+                continue
+            work.pop()
+            if work:
+                u = work[-1][0]
+                if low[v] < low[u]:
+                    low[u] = low[v]
+            if low[v] == index[v]:
+                members = []
+                while True:
+                    w = stack.pop()
+                    on_stack.discard(w)
+                    comp[w] = v
+                    members.append(w)
+                    if w == v:
+                        break
+                members.reverse()
+                loops.append(members)
+
+    closed = []
+    for members in loops:
+        root = comp[members[0]]
+        exits = False
+        cyclic = len(members) > 1
+        for s in members:
+            for e in range(offsets[s], offsets[s + 1]):
+                t = targets[e]
+                if t < 0 or comp.get(t) != root:
+                    exits = True
+                    break
+                if t == s:
+                    cyclic = True
+            if exits:
+                break
+        if cyclic and not exits:
+            closed.append(members)
+    return closed
+
+
+def _zero_divisions(compiled):
+    """Вирази умов і ефектів, що діляться на сталий нуль, у порядку виборів."""
+    expressions = [(edge, expr) for edge, expr in compiled.conditions.items()]
+    expressions += [(edge, expr) for edge, items in compiled.assignments.items() for _, expr in items]
+    found = []
+    for edge, expr in sorted(expressions, key=lambda item: item[0]):
+        if expr.zero_divisor:
+            s = bisect_right(compiled.offsets, edge) - 1
+            found.append((compiled.scene_names[s], edge - compiled.offsets[s], expr.source))
+    return found
+
+
+@tracing.traced("analyzer.analyze")
+def analyze(compiled):
+    """Аналізує скомпільований сценарій і повертає `AnalysisReport`."""
+    report = AnalysisReport(compiled)
+    names = compiled.scene_names
+    n = compiled.scene_count
+    offsets, targets = compiled.offsets, compiled.targets
+
+    report.dangling = [(names[s], i, name) for s, i, name in compiled.dangling]
+    report.unknown_attrs = [(names[s], i, attr) for s, i, attr in compiled.unknown_attrs]
+    report.zero_divisions = _zero_divisions(compiled)
+    if not n:
+        return report
+
+    # NumPy необов'язковий: без нього працює чистий Python, лише повільніше. Якщо NumPy ще
+    # не імпортовано, для невеликого сценарію його імпорт коштував би більше за весь обхід
+    np = optional("numpy") if n >= NUMPY_MIN_SCENES or "numpy" in sys.modules else None
+    if np is not None:
+        offsets_np = np.asarray(offsets, dtype=np.int64)
+        targets_np = np.asarray(targets, dtype=np.int64)
+        endings = np.flatnonzero(offsets_np[1:] == offsets_np[:-1])
+        reached = _np_mark(offsets_np, targets_np, n, [0])
+        rev_offsets, sources = _np_reverse_edges(offsets_np, targets_np, n)
+        alive = _np_mark(rev_offsets, sources, n, endings)
+        unreachable = np.flatnonzero(~reached).tolist()
+        stuck = np.flatnonzero(~alive).tolist()
+    else:
+        endings = [s for s in range(n) if offsets[s] == offsets[s + 1]]
+        reached = _mark(offsets, targets, n, [0])
+        rev_offsets, sources = _reverse_edges(offsets, targets, n)
+        alive = _mark(rev_offsets, sources, n, endings)
+        unreachable = [s for s in range(n) if not reached[s]]
+        stuck = [s for s in range(n) if not alive[s]]
+
+    report.unreachable = [names[s] for s in unreachable]
+    # Сцени, з яких не досягти фінальної (без варіантів вибору), і цикли без виходу серед них
+    report.no_ending = [names[s] for s in stuck]
+    if stuck:
+        report.dead_loops = [[names[s] for s in loop] for loop in _closed_components(compiled, stuck)]
+    return report
+
+
+def analyze_data(data):
+    """Компілює та аналізує завантажений сценарій."""
+    return analyze(compile_scenario(data))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Static analysis of scenario graphs.")
+    parser.add_argument("scenario", help="JSON or .istb scenario")
+    parser.add_argument("--json", action="store_true", help="print machine-readable report")
+    parser.add_argument("--strict", action="store_true", help="fail on warnings as well as errors")
+    parser.add_argument("--limit", type=int, default=20, help="items shown per section")
+    parser.add_argument("--trace", metavar="FILE", help="write a Chrome trace and print a timing summary")
+    args = parser.parse_args()
+    if args.trace:
+        tracing.enable(args.trace)
+
+    report = analyze_data(load_scenario_file(args.scenario, lazy=True))
+    if args.json:
+        print(json.dumps(report.to_dict(), ensure_ascii=False, indent=4))
+    else:
+        print(report.format(args.limit))
+    failed = report.errors or (args.strict and report.warnings)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
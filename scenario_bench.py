@@ -0,0 +1,310 @@
+"""Бенчмарки інструментів на синтетичних сценаріях (без вікон: matplotlib з бекендом Agg).
+
+Вимірюються:
+    load          — завантаження й перевірка файлу, як `ScenarioVisualizer.load_scenario`
+    graph         — `build_graph` і `draw_graph` візуалізатора з холодним кешем розкладки
+    graph_cached  — `draw_graph` з готовим кешем розкладки
+    game          — кроки гри зі стисненими текстами, як `Game.make_choice` / `update_scene`
+    editor        — вибір, збереження й перейменування сцен над стисненими текстами з історією правок, як у редакторі
+    startup       — холодний імпорт кожного модуля ядра й інструмента в окремому процесі; модулі ядра
+                    не мають імпортувати numpy, networkx, matplotlib чи tkinter
+
+Результати записуються в JSON і можуть порівнюватися з раніше збереженою базою.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from scenario_analyzer import analyze, validate_scenario
+from scenario_binary import load_scenario_file, save_scenario_file
+from scenario_engine import Engine, PLAYING, compile_scenario
+from scenario_expr import format_effect
+from scenario_gen import generate
+from scenario_history import History
+from scenario_model import ScenarioModel
+from scenario_texts import compress_texts, pack_scenario
+
+CASES = ("load", "graph", "graph_cached", "game", "editor", "startup")
+GAME_STEPS = 100_000
+EDITOR_OPS = 2_000
+CORE_MODULES = ("scenario_model", "scenario_expr", "scenario_engine", "scenario_texts", "scenario_binary",
+                "scenario_chapters", "scenario_analyzer", "scenario_history", "scenario_store", "scenario_search")
+TOOL_MODULES = ("plot_editor", "plot_game", "visio", "game_server", "story_batch", "scenario_sim", "scenario_solver")
+HEAVY_MODULES = ("numpy", "networkx", "matplotlib", "tkinter")
+_STARTUP_PROBE = """import sys, time
+started = time.perf_counter()
+import {module}
+print(time.perf_counter() - started)
+print(" ".join(name for name in {heavy!r} if name in sys.modules))
+"""
+
+
+def _visualizer(path, data):
+    """Візуалізатор без діалогів Tk: файл і дані підставляються напряму."""
+    import matplotlib
+    matplotlib.use("Agg")
+    from visio import ScenarioVisualizer
+
+    visualizer = ScenarioVisualizer.__new__(ScenarioVisualizer)
+    visualizer.json_file = path
+    visualizer.data = data
+    visualizer.compiled = compile_scenario(data)
+    visualizer.setup_figure()
+    return visualizer
+
+
+def _close(visualizer):
+    import matplotlib.pyplot as plt
+    plt.close(visualizer.fig)
+
+
+def bench_load(path, data):
+    loaded = load_scenario_file(path)
+    validate_scenario(loaded)
+    analyze(compile_scenario(loaded))
+    return len(loaded["scenes"])
+
+
+def bench_graph(path, data):
+    from graph_layout import LayoutCache
+    try:
+        os.remove(LayoutCache(path).path)
+    except FileNotFoundError:
+        pass
+    visualizer = _visualizer(path, data)
+    visualizer.build_graph()
+    visualizer.draw_graph()
+    _close(visualizer)
+    return visualizer.G.number_of_edges()
+
+
+def bench_graph_cached(path, data):
+    from graph_layout import LayoutCache
+    if not os.path.exists(LayoutCache(path).path):
+        bench_graph(path, data)
+    visualizer = _visualizer(path, data)
+    visualizer.build_graph()
+    visualizer.draw_graph()
+    _close(visualizer)
+    return visualizer.G.number_of_edges()
+
+
+def bench_game(path, data, steps=GAME_STEPS):
+    compiled = compile_scenario(data)
+    compress_texts(compiled)
+    engine = Engine(compiled)
+    rng = random.Random(0)
+    engine.start()
+    for _ in range(steps):
+        if engine.status != PLAYING:
+            engine.start()
+            continue
+        engine.scene_text()
+        engine.choices()
+        engine.choose(rng.choice([i for i, ok in enumerate(engine.available()) if ok]))
+        engine.character()
+    return steps
+
+
+def bench_editor(path, data, ops=EDITOR_OPS):
+    scenes = {name: dict(scene, choices=[dict(choice) for choice in scene["choices"]])
+              for name, scene in data["scenes"].items()}
+    loaded = {"character": dict(data["character"]), "scenes": scenes}
+    pack_scenario(loaded)
+    model = ScenarioModel(loaded)
+    history = History(model)
+    rng = random.Random(0)
+    names = list(scenes)
+    for i in range(ops):
+        name = names[rng.randrange(len(names))]
+        # Вибір сцени: рядки відповідей, як у load_selected_scene
+        scene = model.scenes[name]
+        rows = [(str(choice["text"]), choice["next_scene"], choice.get("requires") or "",
+                 format_effect(choice.get("effect")))
+                for choice in scene["choices"]]
+        model.names.row(name)
+        # Збереження сцени
+        with history.group(name):
+            model.put_scene(name, {"text": str(scene["text"]) + "!", "choices": list(scene["choices"])})
+        # Перейменування туди й назад
+        model.rename_scene(name, name + "~")
+        model.rename_scene(name + "~", name)
+        if i % 100 == 99:
+            # Скасування й повторення сотні кроків, як зі списку історії правок
+            history.jump(history.position - 100)
+            history.jump(len(history))
+    return ops
+
+
+BENCHMARKS = {
+    "load": bench_load,
+    "graph": bench_graph,
+    "graph_cached": bench_graph_cached,
+    "game": bench_game,
+    "editor": bench_editor,
+}
+
+
+def measure_startup(module, repeat):
+    """Час імпорту `module` у свіжому інтерпретаторі (найкращий і середній); None — модуль не імпортується."""
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)  # Як після встановлення: з готовим байт-кодом
+    command = [sys.executable, "-c", _STARTUP_PROBE.format(module=module, heavy=HEAVY_MODULES)]
+    times = []
+    for _ in range(repeat + 1):  # Перший запуск лише записує байт-код
+        done = subprocess.run(command, cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                              capture_output=True, text=True)
+        if done.returncode:
+            return None  # Немає залежності інструмента (наприклад, tkinter)
+        seconds, heavy = (done.stdout.splitlines() + [""])[:2]
+        times.append(float(seconds))
+    times = times[1:]
+    return {
+        "seconds": min(times),
+        "mean_seconds": sum(times) / len(times),
+        "items": 0,
+        "peak_memory_kb": 0,
+        "heavy_imports": heavy.split(),
+    }
+
+
+def startup_problems(current):
+    """Рядки звіту для модулів ядра, що під час імпорту потягли важкі бібліотеки."""
+    return [f"{key:<30} imports {', '.join(result['heavy_imports'])}"
+            for key, result in current["results"].items()
+            if key.startswith("startup/") and key.split("/", 1)[1] in CORE_MODULES and result.get("heavy_imports")]
+
+
+def measure(function, path, data, repeat):
+    """Найкращий і середній час за `repeat` запусків, потім окремий запуск для пікової пам'яті."""
+    times = []
+    count = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = function(path, data)
+        times.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        function(path, data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "seconds": min(times),
+        "mean_seconds": sum(times) / len(times),
+        "items": count,
+        "peak_memory_kb": peak // 1024,
+    }
+
+
+def run(sizes, cases=CASES, repeat=3, seed=0, workdir=None, log=None, **generator):
+    """Запускає бенчмарки для кожного розміру; повертає словник результатів."""
+    results = {}
+    if "startup" in cases:
+        for module in CORE_MODULES + TOOL_MODULES:
+            key = f"startup/{module}"
+            result = measure_startup(module, repeat)
+            if result is None:
+                if log:
+                    log(f"{key:<30} skipped (import failed)")
+                continue
+            results[key] = result
+            if log:
+                log(f"{key:<30} {result['seconds'] * 1000:10.1f} ms  {' '.join(result['heavy_imports'])}".rstrip())
+    if "graph" in cases or "graph_cached" in cases:
+        _close(_visualizer(None, {}))  # Імпорт matplotlib і networkx не входить у виміри
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for size in sizes:
+            data = generate(size, seed=seed, **generator)
+            path = os.path.join(tmp, f"bench_{size}.json")
+            save_scenario_file(data, path)
+            for case in cases:
+                if case == "startup":
+                    continue  # Не залежить від розміру сценарію
+                key = f"{case}/{size}"
+                results[key] = measure(BENCHMARKS[case], path, data, repeat)
+                if log:
+                    log(f"{key:<30} {results[key]['seconds'] * 1000:10.1f} ms  "
+                        f"{results[key]['peak_memory_kb']:>9} KiB peak")
+    return {
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "config": dict(generator, sizes=list(sizes), repeat=repeat, seed=seed),
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance=0.25):
+    """Порівнює час і пам'ять з базою; повертає (рядки звіту, чи є регресії)."""
+    lines = []
+    regressed = False
+    base = baseline.get("results", {})
+    for key, result in current["results"].items():
+        if key not in base:
+            lines.append(f"{key:<30} new")
+            continue
+        ratio = result["seconds"] / base[key]["seconds"] if base[key]["seconds"] else 1.0
+        memory = (result["peak_memory_kb"] / base[key]["peak_memory_kb"]
+                  if base[key]["peak_memory_kb"] else 1.0)
+        flags = []
+        if ratio > 1 + tolerance:
+            flags.append("SLOWER")
+        if memory > 1 + tolerance:
+            flags.append("MORE MEMORY")
+        regressed = regressed or bool(flags)
+        lines.append(f"{key:<30} time x{ratio:5.2f}  memory x{memory:5.2f}  {' '.join(flags)}".rstrip())
+    return lines, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scenario tools on generated scenarios.")
+    parser.add_argument("--sizes", default="1000,10000", help="comma-separated scene counts")
+    parser.add_argument("--cases", default=",".join(CASES), help="comma-separated subset of: " + ", ".join(CASES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--branching", type=int, default=3)
+    parser.add_argument("--cycles", type=float, default=0.1)
+    parser.add_argument("--text-length", type=int, default=200)
+    parser.add_argument("--attributes", type=int, default=3)
+    parser.add_argument("--output", default="bench_results.json", help="where to write results")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--save-baseline", help="also write the results to this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing")
+    args = parser.parse_args()
+
+    cases = [case for case in args.cases.split(",") if case]
+    unknown = [case for case in cases if case not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+
+    current = run(sizes, cases, args.repeat, args.seed, log=print, branching=args.branching,
+                  cycles=args.cycles, text_length=args.text_length, attributes=args.attributes)
+    for target in filter(None, (args.output, args.save_baseline)):
+        with open(target, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=4)
+
+    regressed = False
+    problems = startup_problems(current)
+    if problems:
+        print("\nCore modules importing heavy libraries:")
+        print("\n".join(problems))
+        regressed = True
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        lines, slower = compare(current, baseline, args.tolerance)
+        print("\nCompared with " + args.baseline + ":")
+        print("\n".join(lines))
+        regressed = regressed or slower
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,598 @@
+"""Компактний бінарний формат сценарію (.istb) з доступом до будь-якої сцени за O(1) через mmap.
+
+Структура файлу (little-endian):
+    заголовок | індекс рядків | UTF-8 дані рядків | характеристики | сцени | вибори | ефекти | хеш-таблиця імен
+
+Усі рядки (назви, тексти, ключі) інтерновано в одну таблицю, записи сцен, виборів і ефектів
+мають фіксовану ширину, тому сцена читається без розбору решти файлу.
+
+Версія 2 з прапорцем TEXT_BLOCKS стискає довгі тексти сцен і виборів: вони стоять у кінці
+таблиці рядків, а їхні байти записано блоками zlib зі спільним словником (scenario_texts).
+Секція даних рядків тоді має вигляд
+    TEXTS-заголовок | нестиснені рядки | словник | зміщення блоків | стиснені блоки
+і блок розпаковується лише при читанні його тексту.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import Mapping, Sequence
+
+from scenario_engine import CompiledScenario, invalid_effect
+from scenario_texts import BLOCK_SIZE, MIN_COMPRESSED, BlockCache, compress_block, train_dictionary
+from tracing import traced
+
+MAGIC = b"ISTB"
+VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+NONE = 0xFFFFFFFF
+
+HEADER = struct.Struct("<4sHH8I7Q")
+TEXTS = struct.Struct("<IIQQ")  # номер першого стисненого рядка, кількість блоків, довжина словника, розмір блоку
+STRING_OFFSET = struct.Struct("<Q")
+VALUE = struct.Struct("<IB3xq")  # ключ, тип значення, значення
+SCENE = struct.Struct("<6I")  # назва, текст, перший вибір, кількість виборів, додаткові ключі, прапорці
+CHOICE = struct.Struct("<6I")  # текст, next_scene, перший ефект, кількість ефектів, додаткові ключі, прапорці
+BUCKET = struct.Struct("<I")
+
+# Типи значень
+INT = 0
+FLOAT = 1
+JSON = 2  # Будь-яке інше значення, збережене як JSON-рядок
+
+# Прапорці записів
+HAS_TEXT = 1
+HAS_CHOICES = 2  # для сцен
+HAS_NEXT = 2  # для виборів
+HAS_EFFECT = 4
+RAW = 128  # Запис не відповідає формату й збережений цілком як JSON у полі додаткових ключів
+
+# Прапорці заголовка
+TEXT_BLOCKS = 1
+_TEXT = 1 << 40  # Тимчасові номери стиснених текстів до остаточної нумерації
+
+_SCENE_KEYS = ("text", "choices")
+_CHOICE_KEYS = ("text", "next_scene", "effect")
+
+
+def _is_number(value):
+    return type(value) is float or (type(value) is int and -2 ** 63 <= value < 2 ** 63)
+
+
+def _float_bits(value):
+    return struct.unpack("<q", struct.pack("<d", value))[0]
+
+
+def _bits_float(bits):
+    return struct.unpack("<d", struct.pack("<q", bits))[0]
+
+
+class _Writer:
+    """Збирає секції бінарного файлу з JSON-сценарію."""
+
+    def __init__(self, compress=True):
+        self.strings = {}
+        self.texts = {} if compress else None
+
+    def sid(self, text):
+        """Інтернує рядок і повертає його номер."""
+        sid = self.strings.get(text)
+        if sid is None:
+            sid = self.strings[text] = len(self.strings)
+        return sid
+
+    def text_sid(self, text):
+        """Як `sid`, але довгі тексти отримують тимчасовий номер у стисненій частині таблиці."""
+        if self.texts is None or len(text.encode("utf-8")) < MIN_COMPRESSED:
+            return self.sid(text)
+        sid = self.texts.get(text)
+        if sid is None:
+            sid = self.texts[text] = _TEXT + len(self.texts)
+        return sid
+
+    def extra(self, obj, known):
+        rest = {key: value for key, value in obj.items() if key not in known}
+        return self.sid(json.dumps(rest, ensure_ascii=False)) if rest else NONE
+
+    def value(self, key, value):
+        if _is_number(value):
+            kind, bits = (INT, value) if type(value) is int else (FLOAT, _float_bits(value))
+        else:
+            kind, bits = JSON, self.sid(json.dumps(value, ensure_ascii=False))
+        return VALUE.pack(self.sid(key), kind, bits)
+
+    @staticmethod
+    def choice_ok(choice):
+        if not isinstance(choice, dict):
+            return False
+        if not isinstance(choice.get("text", ""), str) or not isinstance(choice.get("next_scene", ""), str):
+            return False
+        effect = choice.get("effect", {})
+        return isinstance(effect, dict) and all(isinstance(key, str) for key in effect)
+
+    @classmethod
+    def scene_ok(cls, scene):
+        return (isinstance(scene, dict) and isinstance(scene.get("text", ""), str)
+                and isinstance(scene.get("choices", []), list))
+
+    def build(self, data):
+        character = data.get("character", {})
+        scenes = data.get("scenes", {})
+        character_extra = NONE
+        if not isinstance(character, dict):
+            character_extra, character = self.sid(json.dumps(character, ensure_ascii=False)), {}
+        top_extra = self.extra(data, ("character", "scenes"))
+
+        attrs = [self.value(attr, value) for attr, value in character.items()]
+        scene_records, choice_records, effect_records = [], [], []
+        for name, scene in scenes.items():
+            name_sid = self.sid(name)
+            if not self.scene_ok(scene):
+                scene_records.append((name_sid, NONE, len(choice_records), 0,
+                                      self.sid(json.dumps(scene, ensure_ascii=False)), RAW))
+                continue
+            flags = (HAS_TEXT if "text" in scene else 0) | (HAS_CHOICES if "choices" in scene else 0)
+            choices = scene.get("choices", [])
+            scene_records.append((name_sid, self.text_sid(scene.get("text", "")), len(choice_records),
+                                  len(choices), self.extra(scene, _SCENE_KEYS), flags))
+            for choice in choices:
+                if not self.choice_ok(choice):
+                    choice_records.append((NONE, NONE, len(effect_records), 0,
+                                           self.sid(json.dumps(choice, ensure_ascii=False)), RAW))
+                    continue
+                flags = ((HAS_TEXT if "text" in choice else 0) | (HAS_NEXT if "next_scene" in choice else 0)
+                         | (HAS_EFFECT if "effect" in choice else 0))
+                effect = choice.get("effect", {})
+                choice_records.append((self.text_sid(choice.get("text", "")),
+                                       self.sid(choice.get("next_scene", "")), len(effect_records),
+                                       len(effect), self.extra(choice, _CHOICE_KEYS), flags))
+                effect_records.extend(self.value(attr, value) for attr, value in effect.items())
+
+        # Хеш-таблиця назв сцен з лінійним зондуванням
+        n_buckets = 1
+        while n_buckets < 2 * len(scene_records):
+            n_buckets *= 2
+        buckets = [0] * n_buckets
+        for index, name in enumerate(scenes):
+            slot = zlib.crc32(name.encode("utf-8")) & (n_buckets - 1)
+            while buckets[slot]:
+                slot = (slot + 1) & (n_buckets - 1)
+            buckets[slot] = index + 1
+
+        # Стиснені тексти отримують номери після всіх звичайних рядків
+        text_base = len(self.strings)
+        texts = list(self.texts or ())
+
+        def final(sid):
+            return sid if sid < _TEXT else text_base + sid - _TEXT
+
+        scene_records = [SCENE.pack(name, final(text), *rest) for name, text, *rest in scene_records]
+        choice_records = [CHOICE.pack(final(text), *rest) for text, *rest in choice_records]
+
+        encoded = [text.encode("utf-8") for text in self.strings]
+        encoded_texts = [text.encode("utf-8") for text in texts]
+        string_index = bytearray()
+        position = 0
+        for chunk in encoded + encoded_texts:
+            string_index += STRING_OFFSET.pack(position)
+            position += len(chunk)
+        string_index += STRING_OFFSET.pack(position)
+
+        header_flags = 0
+        string_data = b"".join(encoded)
+        if texts:
+            header_flags |= TEXT_BLOCKS
+            zdict = train_dictionary(texts)
+            stream = b"".join(encoded_texts)
+            blocks = [compress_block(stream[i:i + BLOCK_SIZE], zdict) for i in range(0, len(stream), BLOCK_SIZE)]
+            block_offsets = [0]
+            for block in blocks:
+                block_offsets.append(block_offsets[-1] + len(block))
+            string_data = b"".join([TEXTS.pack(text_base, len(blocks), len(zdict), BLOCK_SIZE), string_data, zdict,
+                                    struct.pack(f"<{len(block_offsets)}Q", *block_offsets)] + blocks)
+
+        sections = [
+            bytes(string_index),
+            string_data,
+            b"".join(attrs),
+            b"".join(scene_records),
+            b"".join(choice_records),
+            b"".join(effect_records),
+            struct.pack(f"<{n_buckets}I", *buckets),
+        ]
+        offsets = []
+        position = HEADER.size
+        for section in sections:
+            offsets.append(position)
+            position += len(section)
+        header = HEADER.pack(MAGIC, VERSION, header_flags, len(encoded) + len(encoded_texts), len(attrs),
+                             len(scene_records), len(choice_records),
+                             len(effect_records), n_buckets, character_extra, top_extra, *offsets)
+        return header + b"".join(sections)
+
+
+def dumps_binary(data, compress=True):
+    """Кодує сценарій у байти формату .istb; `compress` стискає довгі тексти блоками."""
+    return _Writer(compress).build(data)
+
+
+def write_binary(data, path, compress=True):
+    """Записує сценарій у бінарний файл."""
+    payload = dumps_binary(data, compress)
+    atomic_write(path, lambda f: f.write(payload))
+
+
+def is_binary_file(path):
+    """Чи починається файл із сигнатури бінарного формату."""
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class _LazyStrings(Sequence):
+    """Послідовність рядків, що декодуються з mmap лише при зверненні."""
+
+    def __init__(self, scenario, sids):
+        self._scenario = scenario
+        self._sids = sids
+
+    def __len__(self):
+        return len(self._sids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._scenario.string(sid) for sid in self._sids[index]]
+        return self._scenario.string(self._sids[index])
+
+
+class LazyScenes(Mapping):
+    """Словник сцен поверх бінарного файлу: сцена декодується лише при зверненні за назвою."""
+
+    def __init__(self, scenario):
+        self._scenario = scenario
+
+    def __getitem__(self, name):
+        index = self._scenario.find(name)
+        if index < 0:
+            raise KeyError(name)
+        return self._scenario.scene(index)
+
+    def __contains__(self, name):
+        return self._scenario.find(name) >= 0
+
+    def __iter__(self):
+        scenario = self._scenario
+        return (scenario.scene_name(i) for i in range(scenario.scene_count))
+
+    def __len__(self):
+        return self._scenario.scene_count
+
+    def compile(self):
+        return self._scenario.compile()
+
+
+class BinaryScenario:
+    """Відкритий через mmap бінарний сценарій."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"'{path}' is not a binary scenario file.")
+        if len(self._mm) < HEADER.size:
+            self.close()
+            raise ValueError(f"'{path}' is not a binary scenario file.")
+        (magic, version, flags, self.string_count, self.attr_count, self.scene_count, self.choice_count,
+         self.effect_count, self._n_buckets, self._character_extra, self._top_extra, self._string_index,
+         self._string_data, self._attrs, self._scenes, self._choices, self._effects,
+         self._buckets) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"'{path}' is not a binary scenario file.")
+        self._flags = flags
+        if version not in SUPPORTED_VERSIONS or flags & ~TEXT_BLOCKS:
+            self.close()
+            raise ValueError(f"Unsupported binary scenario version {version}.")
+        if not self._layout_ok():
+            self.close()
+            raise ValueError(f"'{path}' is truncated or corrupt.")
+        self._text_base = self.string_count
+        self._plain = self._string_data
+        if flags & TEXT_BLOCKS:
+            self._text_base, n_blocks, dict_size, block_size = TEXTS.unpack_from(self._mm, self._string_data)
+            if self._text_base > self.string_count:
+                self.close()
+                raise ValueError(f"'{path}' is truncated or corrupt.")
+            self._plain += TEXTS.size
+            self._text_start = self._string_offset(self._text_base)
+            zdict_start = self._plain + self._text_start
+            self._block_index = zdict_start + dict_size
+            self._block_data = self._block_index + (n_blocks + 1) * STRING_OFFSET.size
+            self._texts = BlockCache(self._read_block, self._mm[zdict_start:self._block_index], block_size)
+        # Нестиснені рядки не виходять за свою секцію
+        if self._plain + self._string_offset(self._text_base) > self._attrs:
+            self.close()
+            raise ValueError(f"'{path}' is truncated or corrupt.")
+
+    def _layout_ok(self):
+        """Чи йдуть секції з заголовка одна за одною й чи закінчується остання рівно в кінці файлу."""
+        ends = [
+            (self._string_index, self._string_index + (self.string_count + 1) * STRING_OFFSET.size),
+            (self._string_data, self._attrs),
+            (self._attrs, self._attrs + self.attr_count * VALUE.size),
+            (self._scenes, self._scenes + self.scene_count * SCENE.size),
+            (self._choices, self._choices + self.choice_count * CHOICE.size),
+            (self._effects, self._effects + self.effect_count * VALUE.size),
+            (self._buckets, self._buckets + self._n_buckets * BUCKET.size),
+        ]
+        position = HEADER.size
+        for start, end in ends:
+            if start != position:
+                return False
+            position = end
+        if self._attrs - self._string_data < (TEXTS.size if self._flags & TEXT_BLOCKS else 0):
+            return False
+        if any(sid != NONE and sid >= self.string_count for sid in (self._character_extra, self._top_extra)):
+            return False
+        # Хеш-таблиця: степінь двійки з хоча б одним порожнім кошиком, інакше пошук не зупиниться
+        buckets = self._n_buckets
+        return position == len(self._mm) and buckets > self.scene_count and not buckets & (buckets - 1)
+
+    def _string_offset(self, sid):
+        return STRING_OFFSET.unpack_from(self._mm, self._string_index + sid * STRING_OFFSET.size)[0]
+
+    def _read_block(self, i):
+        start, end = struct.unpack_from("<QQ", self._mm, self._block_index + i * STRING_OFFSET.size)
+        return self._mm[self._block_data + start:self._block_data + end]
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def string(self, sid):
+        """Декодує рядок із таблиці за номером."""
+        start, end = struct.unpack_from("<QQ", self._mm, self._string_index + sid * STRING_OFFSET.size)
+        if sid >= self._text_base:  # Стиснений текст: розпаковується його блок
+            try:
+                return self._texts.read(start - self._text_start, end - self._text_start).decode("utf-8")
+            except zlib.error:
+                raise ValueError(f"'{self.path}' has a corrupt text block.") from None
+        return self._mm[self._plain + start:self._plain + end].decode("utf-8")
+
+    def _value(self, offset):
+        key, kind, bits = VALUE.unpack_from(self._mm, offset)
+        if kind == INT:
+            value = bits
+        elif kind == FLOAT:
+            value = _bits_float(bits)
+        else:
+            value = json.loads(self.string(bits))
+        return self.string(key), value
+
+    def _extra(self, sid):
+        return json.loads(self.string(sid)) if sid != NONE else {}
+
+    def scene_name(self, index):
+        return self.string(SCENE.unpack_from(self._mm, self._scenes + index * SCENE.size)[0])
+
+    def find(self, name):
+        """Номер сцени за назвою через хеш-таблицю, або -1."""
+        mask = self._n_buckets - 1
+        slot = zlib.crc32(name.encode("utf-8")) & mask
+        while True:
+            entry = BUCKET.unpack_from(self._mm, self._buckets + slot * BUCKET.size)[0]
+            if not entry:
+                return -1
+            if self.scene_name(entry - 1) == name:
+                return entry - 1
+            slot = (slot + 1) & mask
+
+    def character(self):
+        if self._character_extra != NONE:
+            return json.loads(self.string(self._character_extra))
+        return dict(self._value(self._attrs + i * VALUE.size) for i in range(self.attr_count))
+
+    def choice(self, index):
+        text, next_scene, first, count, extra, flags = CHOICE.unpack_from(self._mm, self._choices + index * CHOICE.size)
+        if flags & RAW:
+            return json.loads(self.string(extra))
+        choice = {}
+        if flags & HAS_TEXT:
+            choice["text"] = self.string(text)
+        if flags & HAS_NEXT:
+            choice["next_scene"] = self.string(next_scene)
+        if flags & HAS_EFFECT:
+            choice["effect"] = dict(self._value(self._effects + (first + i) * VALUE.size) for i in range(count))
+        choice.update(self._extra(extra))
+        return choice
+
+    def scene(self, index):
+        """Декодує одну сцену за номером."""
+        _name, text, first, count, extra, flags = SCENE.unpack_from(self._mm, self._scenes + index * SCENE.size)
+        if flags & RAW:
+            return json.loads(self.string(extra))
+        scene = {}
+        if flags & HAS_TEXT:
+            scene["text"] = self.string(text)
+        if flags & HAS_CHOICES:
+            scene["choices"] = [self.choice(first + i) for i in range(count)]
+        scene.update(self._extra(extra))
+        return scene
+
+    def to_dict(self):
+        """Повністю декодує сценарій у звичайний JSON-словник."""
+        data = {"character": self.character(),
+                "scenes": {self.scene_name(i): self.scene(i) for i in range(self.scene_count)}}
+        data.update(self._extra(self._top_extra))
+        return data
+
+    def lazy_dict(self):
+        """Сценарій з лінивим словником сцен; файл лишається відкритим, доки існує словник."""
+        data = {"character": self.character(), "scenes": LazyScenes(self)}
+        data.update(self._extra(self._top_extra))
+        return data
+
+    def _section(self, offset, record, count):
+        return record.iter_unpack(self._mm[offset:offset + record.size * count])
+
+    def compile(self):
+        """Компілює сценарій для рушія напряму з записів фіксованої ширини, не декодуючи тексти."""
+        mm = self._mm
+        bounds = array("Q")
+        bounds.frombytes(mm[self._string_index:self._string_index + STRING_OFFSET.size * (self.string_count + 1)])
+        if sys.byteorder != "little":
+            bounds.byteswap()
+        base = self._plain
+
+        def string(sid):
+            return mm[base + bounds[sid]:base + bounds[sid + 1]].decode("utf-8")
+
+        character = self.character()
+        attr_index = {attr: i for i, attr in enumerate(character)}
+        scenes = list(self._section(self._scenes, SCENE, self.scene_count))
+        names = [string(record[0]) for record in scenes]
+        scene_index = {name: i for i, name in enumerate(names)}
+        target_cache = {}  # номер рядка next_scene -> індекс сцени
+        attr_cache = {}  # номер рядка ключа -> індекс характеристики
+        effects = list(self._section(self._effects, VALUE, self.effect_count))
+
+        scene_sids, offsets, targets, effect_items = [], [0], [], []
+        choice_sids = []
+        dangling, unknown = [], []
+        logic = []
+        choices = self._section(self._choices, CHOICE, self.choice_count)
+        for s, (_name, text, _first, count, _extra, flags) in enumerate(scenes):
+            if flags & RAW:
+                # Нестандартна сцена: компілюємо з повного декодування
+                return CompiledScenario(self.to_dict())
+            scene_sids.append(text)
+            for i in range(count):
+                c_text, c_next, e_first, e_count, c_extra, c_flags = next(choices)
+                if c_flags & RAW:
+                    return CompiledScenario(self.to_dict())
+                choice_sids.append(c_text)
+                target = target_cache.get(c_next)
+                if target is None:
+                    next_scene = string(c_next) if c_flags & HAS_NEXT else ""
+                    target = target_cache[c_next] = scene_index.get(next_scene, -1) if next_scene else -1
+                if target < 0 and c_flags & HAS_NEXT and bounds[c_next + 1] > bounds[c_next]:
+                    dangling.append((s, i, string(c_next)))
+                targets.append(target)
+                items = []
+                expressions = []
+                for key, kind, bits in effects[e_first:e_first + e_count]:
+                    a = attr_cache.get(key)
+                    if a is None:
+                        a = attr_cache[key] = attr_index.get(string(key), -1)
+                    if a < 0:
+                        unknown.append((s, i, string(key)))
+                    elif kind == INT:
+                        items.append((a, bits))
+                    elif kind == FLOAT:
+                        items.append((a, _bits_float(bits)))
+                    else:
+                        value = json.loads(string(bits))
+                        if isinstance(value, str):  # Ефект-вираз
+                            expressions.append((a, value))
+                        elif isinstance(value, (int, float)):
+                            items.append((a, value))
+                        else:
+                            raise invalid_effect(names[s], i, string(key), value)
+                effect_items.append(tuple(items))
+                # Умова `requires` лежить серед додаткових ключів вибору
+                requires = json.loads(string(c_extra)).get("requires") if c_extra != NONE else None
+                if requires or expressions:
+                    logic.append((s, i, len(targets) - 1, requires, expressions))
+            offsets.append(len(targets))
+
+        return CompiledScenario.from_tables(character, names, _LazyStrings(self, scene_sids),
+                                            _LazyStrings(self, choice_sids), offsets, targets, effect_items,
+                                            dangling, unknown, logic)
+
+
+@traced("scenario.load")
+def load_scenario_file(path, lazy=False):
+    """Завантажує сценарій з JSON або бінарного файлу (формат визначається за сигнатурою).
+
+    З `lazy=True` бінарний файл не декодується наперед: сцени читаються з mmap при зверненні,
+    а маніфест розділів читає розділи лише тоді, коли потрібні їхні сцени.
+    """
+    if is_binary_file(path):
+        scenario = BinaryScenario(path)
+        if lazy:
+            return scenario.lazy_dict()
+        with scenario:
+            return scenario.to_dict()
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict) and "chapters" in data and "scenes" not in data:
+        from scenario_chapters import load_manifest  # scenario_chapters сам імпортує цей модуль
+        return load_manifest(path, data, lazy)
+    return data
+
+
+# umask спільна для всього процесу й читається лише через заміну, тож її читаємо один раз під час
+# імпорту (у головному потоці), а не в потоці запису, де заміна зачепила б файли інших потоків
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def atomic_write(path, write, mode="wb", **kwargs):
+    """Записує файл атомарно: `write(f)` пише у тимчасовий файл поруч, який після fsync
+    заміняє ціль. Збій посеред запису лишає попередню версію файлу неушкодженою."""
+    import tempfile  # Потрібен лише під час запису
+
+    path = os.fspath(path)
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                               dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, mode, **kwargs) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(tmp, os.stat(path).st_mode & 0o7777)  # mkstemp створює файл із правами 0600
+        except OSError:
+            os.chmod(tmp, 0o666 & ~_UMASK)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+@traced("scenario.save")
+def save_scenario_file(data, path):
+    """Зберігає сценарій у форматі за розширенням файлу: .istb — бінарний, інакше JSON."""
+    if str(path).lower().endswith(".istb"):
+        write_binary(data, path)
+    else:
+        atomic_write(path, lambda f: json.dump(data, f, ensure_ascii=False, indent=4),
+                     mode="w", encoding="utf-8")
+
+
+def main():
+    import argparse  # Лише для командного рядка: бібліотечний імпорт модуля без нього швидший
+
+    parser = argparse.ArgumentParser(description="Convert scenarios between JSON and the binary .istb format.")
+    parser.add_argument("source", help="JSON or .istb scenario")
+    parser.add_argument("target", help="output file; .istb writes binary, anything else writes JSON")
+    args = parser.parse_args()
+    save_scenario_file(load_scenario_file(args.source), args.target)
+
+
+if __name__ == "__main__":
+    main()
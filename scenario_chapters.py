@@ -0,0 +1,494 @@
+"""Сценарії, розбиті на розділи: маніфест і окремі файли розділів.
+
+Маніфест — JSON-файл зі списком розділів і назвами їхніх сцен:
+    {
+        "format": "chapters",
+        "character": {"health": 100},
+        "chapters": [
+            {"name": "intro", "file": "intro.json", "scenes": ["start", "gate"]},
+            {"name": "forest", "file": "forest.istb", "scenes": ["path", "wolf"]}
+        ]
+    }
+Файл розділу — звичайний сценарій (JSON або .istb) лише з його сценами; `next_scene` може
+вказувати на сцену іншого розділу. Сцени нумеруються в порядку маніфесту, стартова — перша
+сцена першого розділу. Завдяки індексу в маніфесті гра знає, де лежить кожна сцена, не
+читаючи розділів: вони завантажуються при першому зверненні в обмежений LRU-кеш, а фоновий
+потік наперед читає розділи, досяжні за кілька виборів від поточної сцени.
+
+    python scenario_chapters.py split story.json chapters/ --size 500
+    python scenario_chapters.py merge chapters/story.chapters.json story.json
+"""
+import json
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from scenario_binary import atomic_write, load_scenario_file, save_scenario_file
+from scenario_engine import DEAD, ENDED, PLAYING, ChoiceNotAvailable, CompiledScenario
+import tracing
+
+MANIFEST_FORMAT = "chapters"
+CACHE_CHAPTERS = 8  # Скільки розділів тримати в пам'яті одночасно
+PREFETCH_DEPTH = 3  # На скільки виборів уперед читати розділи у фоні
+
+
+def is_manifest(data):
+    """Чи є завантажений JSON маніфестом розділів, а не звичайним сценарієм."""
+    return isinstance(data, dict) and data.get("format") == MANIFEST_FORMAT and "chapters" in data
+
+
+class Manifest:
+    """Маніфест розділів: порядок сцен і індекс «сцена → розділ» без читання самих розділів."""
+
+    def __init__(self, path, data=None):
+        self.path = os.fspath(path)
+        if data is None:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        if not is_manifest(data):
+            raise ValueError(f"'{self.path}' is not a chapter manifest.")
+        self.character = data.get("character", {})
+        self.extra = {key: value for key, value in data.items()
+                      if key not in ("format", "character", "chapters")}
+        self.chapters = []
+        for chapter in data["chapters"]:
+            if "file" not in chapter:
+                raise ValueError(f"Chapter '{chapter.get('name', '?')}' has no 'file'.")
+            self.chapters.append({"name": chapter.get("name") or os.path.splitext(chapter["file"])[0],
+                                  "file": chapter["file"], "scenes": list(chapter.get("scenes", ()))})
+        self._index()
+
+    def _index(self):
+        self.scene_names = []
+        self.chapter_of = array("l")
+        self.first_scene = []  # Глобальний номер першої сцени кожного розділу
+        self.scene_index = {}
+        for c, chapter in enumerate(self.chapters):
+            self.first_scene.append(len(self.scene_names))
+            for name in chapter["scenes"]:
+                if name in self.scene_index:
+                    raise ValueError(f"Scene '{name}' is listed in more than one chapter.")
+                self.scene_index[name] = len(self.scene_names)
+                self.scene_names.append(name)
+                self.chapter_of.append(c)
+
+    @property
+    def chapter_names(self):
+        return [chapter["name"] for chapter in self.chapters]
+
+    def chapter_path(self, c):
+        return os.path.join(os.path.dirname(os.path.abspath(self.path)), self.chapters[c]["file"])
+
+    def find_chapter(self, name):
+        """Номер розділу сцени або -1."""
+        s = self.scene_index.get(name)
+        return -1 if s is None else self.chapter_of[s]
+
+    @tracing.traced("chapters.read")
+    def read_chapter(self, c):
+        """Читає сцени розділу в порядку маніфесту."""
+        chapter = self.chapters[c]
+        scenes = load_scenario_file(self.chapter_path(c)).get("scenes", {})
+        missing = [name for name in chapter["scenes"] if name not in scenes]
+        if missing:
+            raise ValueError(f"Chapter '{chapter['name']}' is missing scene '{missing[0]}'.")
+        return {name: scenes[name] for name in chapter["scenes"]}
+
+    def chapter_data(self, c):
+        """Розділ як окремий сценарій (посилання в інші розділи лишаються назвами)."""
+        return {"character": dict(self.character), "scenes": self.read_chapter(c)}
+
+    def merged(self):
+        """Увесь сценарій одним словником, як з одного файлу."""
+        scenes = {}
+        for c in range(len(self.chapters)):
+            scenes.update(self.read_chapter(c))
+        data = {"character": dict(self.character), "scenes": scenes}
+        data.update(self.extra)
+        return data
+
+    def to_dict(self):
+        data = {"format": MANIFEST_FORMAT, "character": self.character}
+        data.update(self.extra)
+        data["chapters"] = self.chapters
+        return data
+
+    def save(self, data, chapter=None):
+        """Записує зміни назад у розділи й маніфест.
+
+        З `chapter=None` `data` — увесь сценарій: сцени лишаються у своїх розділах, нові
+        потрапляють у розділ сусідньої за порядком `data["scenes"]` сцени. Інакше `data` — сцени лише розділу `chapter`.
+        Кожен файл записується атомарно; маніфест — останнім.
+        """
+        owner = {}
+        if chapter is None:
+            if not self.chapters:
+                self.chapters.append({"name": "chapter_1", "file": "chapter_1.json", "scenes": []})
+            targets = range(len(self.chapters))
+            names = list(data["scenes"])
+            chapters = [self.find_chapter(name) for name in names]
+            # Нова назва (зокрема перейменована сцена) стає в розділ сусідньої сцени: попередньої,
+            # а на початку сценарію — наступної, тож стартова сцена лишається в першому розділі
+            c = next((c for c in chapters if c >= 0), len(self.chapters) - 1)
+            for name, known in zip(names, chapters):
+                if known >= 0:
+                    c = known
+                owner.setdefault(c, []).append(name)
+        else:
+            targets = [chapter]
+            for name in data["scenes"]:
+                c = self.find_chapter(name)
+                if c >= 0 and c != chapter:
+                    raise ValueError(f"Scene '{name}' already exists in chapter '{self.chapters[c]['name']}'.")
+            owner[chapter] = list(data["scenes"])
+
+        self.character = data.get("character", self.character)
+        for c in targets:
+            names = owner.get(c, [])
+            self.chapters[c]["scenes"] = names
+            save_scenario_file({"character": self.character,
+                                "scenes": {name: data["scenes"][name] for name in names}}, self.chapter_path(c))
+        self._index()
+        atomic_write(self.path, lambda f: json.dump(self.to_dict(), f, ensure_ascii=False, indent=4),
+                     mode="w", encoding="utf-8")
+
+
+class ChapterCache:
+    """Обмежений LRU-кеш розділів, спільний для головного й фонового потоків.
+
+    `build(c, scenes)` перетворює прочитані сцени розділу на значення кешу (напр. скомпільовані
+    таблиці). Розділ, який вже читає інший потік, не читається вдруге: виклик чекає на нього.
+    """
+
+    def __init__(self, manifest, capacity=CACHE_CHAPTERS, build=None):
+        self.manifest = manifest
+        self.capacity = max(1, capacity)
+        self.build = build or (lambda c, scenes: scenes)
+        self._chapters = OrderedDict()
+        self._loading = {}  # розділ → threading.Event, поки його читають
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def __contains__(self, c):
+        with self._lock:
+            return c in self._chapters
+
+    def get(self, c):
+        while True:
+            with self._lock:
+                value = self._chapters.get(c)
+                if value is not None:
+                    self._chapters.move_to_end(c)
+                    return value
+                event = self._loading.get(c)
+                if event is None:
+                    event = self._loading[c] = threading.Event()
+                    break
+            event.wait()  # Розділ читає інший потік; якщо він не впорався — пробуємо самі
+
+        try:
+            value = self.build(c, self.manifest.read_chapter(c))
+            with self._lock:
+                self._chapters[c] = value
+                self.loads += 1
+                while len(self._chapters) > self.capacity:
+                    self._chapters.popitem(last=False)
+            tracing.count("chapters.loaded")
+            return value
+        finally:
+            with self._lock:
+                del self._loading[c]
+            event.set()
+
+    def loaded(self):
+        """Номери розділів у кеші, від найдавніше використаного."""
+        with self._lock:
+            return list(self._chapters)
+
+
+class Prefetcher(threading.Thread):
+    """Фоновий потік, що читає розділи, досяжні від сцени не більш як за `depth` виборів.
+
+    Новий запит скасовує незавершений попередній. Читається не більше розділів, ніж
+    вміщує кеш без витіснення поточного.
+    """
+
+    def __init__(self, cache, successors):
+        super().__init__(name="chapter-prefetch", daemon=True)
+        self.cache = cache
+        self.successors = successors  # сцена → номери сцен, куди ведуть її вибори
+        self._condition = threading.Condition()
+        self._request = None
+        self._closed = False
+
+    def request(self, scene, depth=PREFETCH_DEPTH):
+        with self._condition:
+            self._request = (scene, depth)
+            self._condition.notify()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+    def _next_request(self):
+        with self._condition:
+            while self._request is None and not self._closed:
+                self._condition.wait()
+            request, self._request = self._request, None
+            return None if self._closed else request
+
+    def _superseded(self):
+        with self._condition:
+            return self._request is not None or self._closed
+
+    def run(self):
+        while True:
+            request = self._next_request()
+            if request is None:
+                return
+            try:
+                self._prefetch(*request)
+            except (OSError, ValueError):
+                pass  # Помилку побачить гра, коли справді дійде до цього розділу
+
+    @tracing.traced("chapters.prefetch")
+    def _prefetch(self, scene, depth):
+        chapter_of = self.cache.manifest.chapter_of
+        wanted = {chapter_of[scene]}
+        limit = self.cache.capacity - 1
+        seen = {scene}
+        frontier = [scene]
+        for _ in range(depth):
+            following = []
+            for s in frontier:
+                if self._superseded():
+                    return
+                for t in self.successors(s):
+                    if t in seen:
+                        continue
+                    seen.add(t)
+                    following.append(t)
+                    c = chapter_of[t]
+                    if c not in wanted:
+                        if len(wanted) > limit:
+                            return
+                        wanted.add(c)
+                        self.cache.get(c)
+            frontier = following
+
+
+class ChapterScenes(Mapping):
+    """Ледачий словник сцен маніфесту: розділ читається при першому зверненні до його сцени."""
+
+    def __init__(self, manifest, capacity=CACHE_CHAPTERS):
+        self.manifest = manifest
+        self.cache = ChapterCache(manifest, capacity)
+
+    def __getitem__(self, name):
+        c = self.manifest.find_chapter(name)
+        if c < 0:
+            raise KeyError(name)
+        return self.cache.get(c)[name]
+
+    def __contains__(self, name):
+        return name in self.manifest.scene_index
+
+    def __iter__(self):
+        return iter(self.manifest.scene_names)
+
+    def __len__(self):
+        return len(self.manifest.scene_names)
+
+    def compile(self):
+        """Аналізатору й розв'язувачу потрібен увесь граф: компілюємо об'єднаний сценарій."""
+        return CompiledScenario(self.manifest.merged())
+
+
+class _Chapter:
+    """Скомпільований розділ: локальні таблиці й цілі виборів у глобальній нумерації."""
+    __slots__ = ("compiled", "first", "targets")
+
+    def __init__(self, compiled, first, targets):
+        self.compiled = compiled
+        self.first = first
+        self.targets = targets
+
+
+class _SceneTexts:
+    """Послідовність текстів сцен, що читає розділи на вимогу (для `Engine.scene_text`)."""
+
+    def __init__(self, scenario):
+        self._scenario = scenario
+
+    def __len__(self):
+        return self._scenario.scene_count
+
+    def __getitem__(self, scene):
+        chapter, local = self._scenario.locate(scene)
+        return chapter.compiled.scene_texts[local]
+
+
+class ChapterScenario:
+    """Сценарій для `Engine`, що тримає в пам'яті лише кілька скомпільованих розділів.
+
+    Має ті самі атрибути й методи, що використовує рушій (`initial`, `scene_names`, `scene_count`,
+    `is_ending`, `is_stuck`, `step`, `scene_text`, `scene_choices`, `available`), але без загальної
+    CSR-таблиці: кожен розділ компілюється окремо при завантаженні в кеш.
+    """
+
+    def __init__(self, manifest, capacity=CACHE_CHAPTERS, prefetch_depth=PREFETCH_DEPTH):
+        self.manifest = manifest
+        character = manifest.character
+        self.attr_names = list(character)
+        self.attr_index = {name: i for i, name in enumerate(self.attr_names)}
+        self.initial = list(character.values())
+        self.health = self.attr_index.get("health", -1)
+        self.scene_names = manifest.scene_names
+        self.scene_index = manifest.scene_index
+        self.scene_texts = _SceneTexts(self)
+        self.prefetch_depth = prefetch_depth
+        self.cache = ChapterCache(manifest, capacity, self._compile_chapter)
+        self._prefetcher = None
+
+    def _compile_chapter(self, c, scenes):
+        compiled = CompiledScenario({"character": self.manifest.character, "scenes": scenes})
+        first = self.manifest.first_scene[c]
+        targets = array("l", (first + t if t >= 0 else -1 for t in compiled.targets))
+        scene_index = self.manifest.scene_index
+        for s, i, name in compiled.dangling:  # Переходи в інші розділи
+            targets[compiled.offsets[s] + i] = scene_index.get(name, -1)
+        return _Chapter(compiled, first, targets)
+
+    @property
+    def scene_count(self):
+        return len(self.scene_names)
+
+    def locate(self, scene):
+        """Скомпільований розділ сцени (читається, якщо його немає в кеші) і її локальний номер."""
+        chapter = self.cache.get(self.manifest.chapter_of[scene])
+        return chapter, scene - chapter.first
+
+    def is_ending(self, scene):
+        chapter, local = self.locate(scene)
+        return chapter.compiled.is_ending(local)
+
+    def scene_text(self, scene):
+        chapter, local = self.locate(scene)
+        return chapter.compiled.scene_text(local)
+
+    def scene_choices(self, scene):
+        chapter, local = self.locate(scene)
+        return chapter.compiled.scene_choices(local)
+
+    def available(self, scene, attrs):
+        chapter, local = self.locate(scene)
+        return chapter.compiled.available(local, attrs)
+
+    def is_stuck(self, scene, attrs):
+        chapter, local = self.locate(scene)
+        return chapter.compiled.is_stuck(local, attrs)
+
+    def successors(self, scene):
+        chapter, local = self.locate(scene)
+        offsets = chapter.compiled.offsets
+        return [t for t in chapter.targets[offsets[local]:offsets[local + 1]] if t >= 0]
+
+    def step(self, scene, attrs, index):
+        """Те саме, що `CompiledScenario.step`, з переходами між розділами."""
+        chapter, local = self.locate(scene)
+        compiled = chapter.compiled
+        lo = compiled.offsets[local]
+        if not 0 <= index < compiled.offsets[local + 1] - lo:
+            raise IndexError(f"Scene '{self.scene_names[scene]}' has no choice #{index}.")
+        edge = lo + index
+        condition = compiled.conditions.get(edge)
+        if condition is not None and not condition(attrs):
+            raise ChoiceNotAvailable(f"Choice #{index} in scene '{self.scene_names[scene]}' is not available.")
+        target = chapter.targets[edge]
+        if target >= 0:
+            # Розділ цілі читаємо до ефекту: якщо він не завантажиться, стан гри лишиться незмінним
+            target_chapter, target_local = self.locate(target)
+        compiled.apply(edge, attrs)
+
+        if self.health >= 0 and attrs[self.health] <= 0:
+            return scene, DEAD
+        if target < 0:
+            return scene, ENDED
+        target_compiled = target_chapter.compiled
+        ended = target_compiled.is_ending(target_local) or target_compiled.is_stuck(target_local, attrs)
+        return target, (ENDED if ended else PLAYING)
+
+    def prefetch(self, scene):
+        """Просить фоновий потік прочитати розділи, досяжні від `scene`."""
+        if self.prefetch_depth <= 0 or scene < 0:
+            return
+        if self._prefetcher is None:
+            self._prefetcher = Prefetcher(self.cache, self.successors)
+            self._prefetcher.start()
+        self._prefetcher.request(scene, self.prefetch_depth)
+
+    def close(self):
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+            self._prefetcher = None
+
+
+def load_manifest(path, data=None, lazy=False):
+    """Сценарій з маніфесту: з `lazy=True` — з ледачим словником сцен, інакше повністю."""
+    manifest = Manifest(path, data)
+    if not lazy:
+        return manifest.merged()
+    result = {"character": dict(manifest.character), "scenes": ChapterScenes(manifest)}
+    result.update(manifest.extra)
+    return result
+
+
+def split_scenario(data, directory, size=500, extension=".json", name="story"):
+    """Розбиває сценарій на розділи по `size` сцен і записує їх разом із маніфестом.
+
+    Повертає шлях до маніфесту `<directory>/<name>.chapters.json`.
+    """
+    os.makedirs(directory, exist_ok=True)
+    names = list(data["scenes"])
+    chapters = []
+    for number, start in enumerate(range(0, len(names), max(1, size)), start=1):
+        chapters.append({"name": f"chapter_{number}", "file": f"chapter_{number}{extension}",
+                         "scenes": names[start:start + size]})
+    manifest_data = {"format": MANIFEST_FORMAT, "character": data.get("character", {})}
+    manifest_data.update({key: value for key, value in data.items() if key not in ("character", "scenes")})
+    manifest_data["chapters"] = chapters
+    path = os.path.join(directory, f"{name}.chapters.json")
+    manifest = Manifest(path, manifest_data)
+    manifest.save({"character": manifest.character, "scenes": data["scenes"]})
+    return path
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Split scenarios into chapter files or merge them back.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    split = commands.add_parser("split", help="write chapter files and a manifest")
+    split.add_argument("scenario", help="JSON or .istb scenario")
+    split.add_argument("directory", help="where to write the chapters")
+    split.add_argument("--size", type=int, default=500, help="scenes per chapter")
+    split.add_argument("--binary", action="store_true", help="write chapters as .istb")
+    merge = commands.add_parser("merge", help="join a manifest's chapters into one scenario file")
+    merge.add_argument("manifest")
+    merge.add_argument("target", help="output file; .istb writes binary, anything else writes JSON")
+    args = parser.parse_args()
+
+    if args.command == "split":
+        name = os.path.splitext(os.path.basename(args.scenario))[0]
+        path = split_scenario(load_scenario_file(args.scenario), args.directory, args.size,
+                              ".istb" if args.binary else ".json", name)
+        print(path)
+    else:
+        save_scenario_file(Manifest(args.manifest).merged(), args.target)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""Безголовий рушій сценаріїв: компіляція JSON у цілочисельні таблиці та покрокова гра без Tk."""
+from array import array
+
+from scenario_expr import ExpressionError, compile_expression
+from tracing import traced
+
+# Стани гри
+PLAYING = "playing"
+DEAD = "dead"
+ENDED = "ended"
+
+
+class ChoiceNotAvailable(ValueError):
+    """Умова `requires` вибору не виконується."""
+
+
+def invalid_effect(scene, i, attr, value):
+    """Помилка для значення ефекту, що не є ні числом, ні рядком-виразом."""
+    return ValueError(f"Scene '{scene}' choice #{i}: effect on '{attr}' should be a number or an expression, "
+                      f"not {type(value).__name__}.")
+
+
+class CompiledScenario:
+    """Сценарій, один раз скомпільований у цілочисельні ID сцен і CSR-таблицю виборів.
+
+    Сцени нумеруються в порядку ключів JSON (сцена 0 — стартова). Вибори сцени `s`
+    займають діапазон `offsets[s]:offsets[s + 1]` у масивах `targets` та `effects`.
+    Ціль -1 означає порожній або неіснуючий `next_scene`.
+
+    Умови `requires` і ефекти-вирази (scenario_expr) компілюються один раз і зберігаються
+    розріджено: `conditions` і `assignments` — словники за номером вибору.
+    """
+
+    def __init__(self, data):
+        character = data.get("character", {})
+        scenes = data.get("scenes", {})
+
+        # Фіксований порядок характеристик
+        self.attr_names = list(character)
+        self.attr_index = {name: i for i, name in enumerate(self.attr_names)}
+        self.initial = list(character.values())
+        self.health = self.attr_index.get("health", -1)
+
+        self.scene_names = list(scenes)
+        self.scene_index = {name: i for i, name in enumerate(self.scene_names)}
+
+        self.scene_texts = []
+        self.choice_texts = []
+        self.offsets = array("l", [0])
+        self.targets = array("l")
+        self.effect_items = []  # Розріджені ефекти: кортеж (індекс характеристики, зміна) на вибір
+        self.conditions = {}  # вибір → Expression умови `requires`
+        self.assignments = {}  # вибір → кортеж (індекс характеристики, Expression нового значення)
+        self.dangling = []  # (сцена, номер вибору, next_scene) для посилань у нікуди
+        self.unknown_attrs = []  # (сцена, номер вибору, ключ) для ефектів поза `character`
+
+        n_attrs = len(self.attr_names)
+        dense = []
+        scene_index = self.scene_index
+        attr_index = self.attr_index
+        for s, scene in enumerate(scenes.values()):
+            self.scene_texts.append(scene.get("text", ""))
+            for i, choice in enumerate(scene.get("choices", ())):
+                self.choice_texts.append(choice.get("text", ""))
+                next_scene = choice.get("next_scene")
+                target = scene_index.get(next_scene, -1) if next_scene else -1
+                if target < 0 and next_scene:
+                    self.dangling.append((s, i, next_scene))
+                self.targets.append(target)
+
+                row = [0] * n_attrs
+                items = []
+                expressions = []
+                for attr, value in (choice.get("effect") or {}).items():
+                    a = attr_index.get(attr)
+                    if a is None:
+                        self.unknown_attrs.append((s, i, attr))
+                        continue
+                    if isinstance(value, str):
+                        expressions.append((a, value))
+                        continue
+                    if not isinstance(value, (int, float)):
+                        raise invalid_effect(self.scene_names[s], i, attr, value)
+                    row[a] += value
+                    items.append((a, value))
+                self.effect_items.append(tuple(items))
+                self._add_logic(s, i, len(self.targets) - 1, choice.get("requires"), expressions)
+                dense.extend(row)
+            self.offsets.append(len(self.targets))
+
+        self._pack_effects(dense)
+
+    def _add_logic(self, s, i, edge, requires, expressions):
+        """Компілює умову й ефекти-вирази вибору `edge`; `expressions` — пари (індекс, текст виразу)."""
+        try:
+            if requires:
+                self.conditions[edge] = compile_expression(requires, self.attr_index)
+            if expressions:
+                self.assignments[edge] = tuple((a, compile_expression(source, self.attr_index))
+                                               for a, source in expressions)
+        except ExpressionError as error:
+            raise ExpressionError(f"Scene '{self.scene_names[s]}' choice #{i}: {error}") from None
+
+    @classmethod
+    def from_tables(cls, character, scene_names, scene_texts, choice_texts, offsets, targets, effect_items,
+                    dangling=(), unknown_attrs=(), logic=()):
+        """Збирає скомпільований сценарій з готових таблиць (напр. з бінарного файлу).
+
+        `scene_texts` і `choice_texts` можуть бути будь-якими послідовностями з лінивим декодуванням.
+        `logic` — кортежі (сцена, номер вибору, вибір, requires, [(індекс, вираз)]) для умов і виразів.
+        """
+        self = cls.__new__(cls)
+        self.attr_names = list(character)
+        self.attr_index = {name: i for i, name in enumerate(self.attr_names)}
+        self.initial = list(character.values())
+        self.health = self.attr_index.get("health", -1)
+        self.scene_names = scene_names
+        self.scene_index = {name: i for i, name in enumerate(scene_names)}
+        self.scene_texts = scene_texts
+        self.choice_texts = choice_texts
+        self.offsets = array("l", offsets)
+        self.targets = array("l", targets)
+        self.effect_items = effect_items
+        self.conditions = {}
+        self.assignments = {}
+        self.dangling = list(dangling)
+        self.unknown_attrs = list(unknown_attrs)
+        for s, i, edge, requires, expressions in logic:
+            self._add_logic(s, i, edge, requires, expressions)
+
+        n_attrs = len(self.attr_names)
+        dense = [0] * (len(self.targets) * n_attrs)
+        for edge, items in enumerate(effect_items):
+            for a, value in items:
+                dense[edge * n_attrs + a] += value
+        self._pack_effects(dense)
+        return self
+
+    def _pack_effects(self, dense):
+        # Щільні вектори ефектів: effects[e * n_attrs + a]
+        integral = (all(isinstance(v, int) for v in dense) and all(isinstance(v, int) for v in self.initial)
+                    and all(expr.integral for items in self.assignments.values() for _, expr in items))
+        self.effects = array("q" if integral else "d", dense)
+
+    @property
+    def scene_count(self):
+        return len(self.scene_names)
+
+    @property
+    def choice_count(self):
+        return len(self.targets)
+
+    @property
+    def has_logic(self):
+        """Чи є умови або ефекти-вирази (тоді перебіг гри залежить не лише від здоров'я)."""
+        return bool(self.conditions or self.assignments)
+
+    def available(self, scene, attrs):
+        """Для кожного вибору сцени — чи виконується його умова."""
+        lo, hi = self.offsets[scene], self.offsets[scene + 1]
+        conditions = self.conditions
+        if not conditions:
+            return [True] * (hi - lo)
+        return [edge not in conditions or bool(conditions[edge](attrs)) for edge in range(lo, hi)]
+
+    def is_stuck(self, scene, attrs):
+        """Чи не лишилося в нефінальній сцені жодного доступного вибору (гра тоді завершується)."""
+        conditions = self.conditions
+        if not conditions:
+            return False
+        lo, hi = self.offsets[scene], self.offsets[scene + 1]
+        return lo < hi and all(edge in conditions and not conditions[edge](attrs) for edge in range(lo, hi))
+
+    def apply(self, edge, attrs):
+        """Застосовує ефект вибору до `attrs` на місці; вирази обчислюються за станом до вибору."""
+        assigned = self.assignments.get(edge) if self.assignments else None
+        if assigned:
+            values = [(a, expr(attrs)) for a, expr in assigned]
+        for a, value in self.effect_items[edge]:
+            attrs[a] += value
+        if assigned:
+            for a, value in values:
+                attrs[a] = value
+
+    def is_ending(self, scene):
+        """Чи є сцена фінальною (без варіантів вибору)."""
+        return self.offsets[scene] == self.offsets[scene + 1]
+
+    def scene_text(self, scene):
+        return self.scene_texts[scene]
+
+    def scene_choices(self, scene):
+        """Тексти варіантів вибору сцени."""
+        return self.choice_texts[self.offsets[scene]:self.offsets[scene + 1]]
+
+    def step(self, scene, attrs, index):
+        """Застосовує вибір `index` у сцені `scene` до вектора `attrs` на місці.
+
+        Повертає пару (наступна сцена, стан гри) за правилами `Game.make_choice`:
+        спершу ефекти, потім перевірка `health <= 0`, потім перехід.
+        """
+        lo = self.offsets[scene]
+        if not 0 <= index < self.offsets[scene + 1] - lo:
+            raise IndexError(f"Scene '{self.scene_names[scene]}' has no choice #{index}.")
+        edge = lo + index
+        if self.conditions:
+            condition = self.conditions.get(edge)
+            if condition is not None and not condition(attrs):
+                raise ChoiceNotAvailable(f"Choice #{index} in scene '{self.scene_names[scene]}' is not available.")
+        if self.assignments:
+            self.apply(edge, attrs)
+        else:
+            for a, value in self.effect_items[edge]:
+                attrs[a] += value
+
+        if self.health >= 0 and attrs[self.health] <= 0:
+            return scene, DEAD
+
+        target = self.targets[edge]
+        if target < 0:
+            return scene, ENDED
+        return target, (ENDED if self.is_ending(target) or self.is_stuck(target, attrs) else PLAYING)
+
+
+@traced("scenario.compile")
+def compile_scenario(data):
+    """Компілює завантажений сценарій."""
+    scenes = data.get("scenes")
+    if hasattr(scenes, "compile"):  # Ліниві сцени бінарного файлу компілюються без декодування текстів
+        return scenes.compile()
+    return CompiledScenario(data)
+
+
+class Engine:
+    """Одна партія гри поверх скомпільованого сценарію."""
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+        self.scene = -1
+        self.attrs = []
+        self.status = ENDED
+        self.steps = 0
+
+    def start(self):
+        """Починає гру зі стартової сцени з початковими характеристиками."""
+        compiled = self.compiled
+        self.attrs = list(compiled.initial)
+        self.steps = 0
+        if not compiled.scene_count:
+            self.scene = -1
+            self.status = ENDED
+            return self.status
+        self.scene = 0
+        self.status = ENDED if compiled.is_ending(0) or compiled.is_stuck(0, self.attrs) else PLAYING
+        return self.status
+
+    def choose(self, index):
+        """Робить вибір `index` у поточній сцені й повертає новий стан гри."""
+        if self.status != PLAYING:
+            raise RuntimeError("The game is not in progress.")
+        self.scene, self.status = self.compiled.step(self.scene, self.attrs, index)
+        self.steps += 1
+        return self.status
+
+    def scene_name(self):
+        return self.compiled.scene_names[self.scene] if self.scene >= 0 else None
+
+    def scene_text(self):
+        return self.compiled.scene_text(self.scene) if self.scene >= 0 else ""
+
+    def choices(self):
+        """Тексти варіантів вибору поточної сцени."""
+        if self.scene < 0:
+            return []
+        return self.compiled.scene_choices(self.scene)
+
+    def available(self):
+        """Чи доступний кожен з варіантів поточної сцени (умови `requires`)."""
+        if self.scene < 0:
+            return []
+        return self.compiled.available(self.scene, self.attrs)
+
+    def character(self):
+        """Поточні характеристики у вигляді словника."""
+        return dict(zip(self.compiled.attr_names, self.attrs))
+
+    def state(self):
+        """Знімок стану партії."""
+        return {
+            "scene": self.scene_name(),
+            "character": self.character(),
+            "status": self.status,
+            "steps": self.steps,
+        }
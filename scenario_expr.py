@@ -0,0 +1,411 @@
+"""Умови й ефекти виборів: безпечні вирази над характеристиками героя.
+
+    "requires": "money >= 20 and strength > 5"
+    "effect": {"health": -10, "money": "max(money - 20, 0)", "strength": "10"}
+
+Число в `effect` — зміна характеристики (як і раніше), рядок — вираз для її нового значення.
+Усі вирази вибору обчислюються за характеристиками до вибору. Дозволено: числа, назви
+характеристик, `+ - * / // %`, порівняння (також ланцюжки `0 < x <= 10`), `and`, `or`, `not`,
+дужки, `min`, `max`, `abs`, `clamp(x, lo, hi)`. `and`, `or`, `not` і порівняння дають 1 або 0;
+ділення й остача від ділення на нуль дають 0.
+
+Вираз розбирається один раз (модуль `ast`, лише дозволені вузли, без `eval`) і компілюється
+у два варіанти: замикання над списком характеристик для гри та функцію над масивом NumPy
+станів (рядок — гравець, стовпчик — характеристика) для пакетної симуляції.
+"""
+import ast
+import operator
+import re
+
+from lazy_import import optional
+
+
+class ExpressionError(ValueError):
+    """Недопустимий або помилковий вираз."""
+
+
+def _or_zero(op, zero):
+    """Ділення, що дає нуль замість ZeroDivisionError (так само, як векторний варіант)."""
+    def divide(left, right):
+        return zero if right == 0 else op(left, right)
+    return divide
+
+
+_DIVISION = {ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod}
+_BINARY = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: _or_zero(operator.truediv, 0.0),
+    ast.FloorDiv: _or_zero(operator.floordiv, 0),
+    ast.Mod: _or_zero(operator.mod, 0),
+}
+_COMPARE = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+}
+_FUNCTIONS = {"min": (2, None), "max": (2, None), "abs": (1, 1), "clamp": (3, 3)}
+
+
+def _clamp(value, lo, hi):
+    return lo if value < lo else hi if value > hi else value
+
+
+class Expression:
+    """Скомпільований вираз: `expr(attrs)` — значення для одного стану, `expr.vector(states)` — для масиву."""
+    __slots__ = ("source", "names", "integral", "_scalar", "_vector", "_tree", "_attr_index")
+
+    def __init__(self, source, attr_index):
+        self.source = source
+        self._tree = parse(source)
+        self._attr_index = attr_index
+        self.names = _names(self._tree)
+        unknown = [name for name in self.names if name not in attr_index]
+        if unknown:
+            raise ExpressionError(f"Unknown attribute '{unknown[0]}' in '{source}'.")
+        # Без ділення й дробових констант результат над цілими характеристиками лишається цілим
+        self.integral = not any(isinstance(node, ast.BinOp) and isinstance(node.op, ast.Div)
+                                or isinstance(node, ast.Constant) and isinstance(node.value, float)
+                                for node in ast.walk(self._tree))
+        self._scalar = self._compile(self._tree.body)
+        self._vector = None
+
+    @property
+    def zero_divisor(self):
+        """Чи ділиться щось на сталий нуль (результат такого ділення завжди 0 — мабуть, помилка автора)."""
+        return any(isinstance(node, ast.BinOp) and type(node.op) in _DIVISION
+                   and isinstance(node.right, ast.Constant) and node.right.value == 0
+                   for node in ast.walk(self._tree))
+
+    @property
+    def constants(self):
+        """Усі числові сталі виразу (з урахуванням унарного мінуса)."""
+        negated = {id(node.operand) for node in ast.walk(self._tree)
+                   if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub)}
+        return [-node.value if id(node) in negated else node.value
+                for node in ast.walk(self._tree) if isinstance(node, ast.Constant)]
+
+    def thresholds(self):
+        """Для кожної характеристики виразу — сталі, з якими її порівнюють (`gold >= 5`, `0 < x <= 10`).
+
+        None замість списку — характеристика входить у вираз інакше (арифметика, функції,
+        порівняння з іншою характеристикою), і тоді важливе її точне значення.
+        """
+        compared = {}
+        for node in ast.walk(self._tree):
+            if isinstance(node, ast.Compare):
+                operands = [node.left] + node.comparators
+                for left, right in zip(operands, operands[1:]):
+                    for name, other in ((left, right), (right, left)):
+                        value = _constant(other)
+                        if isinstance(name, ast.Name) and value is not None:
+                            compared.setdefault(id(name), []).append(value)
+        functions = {id(node.func) for node in ast.walk(self._tree) if isinstance(node, ast.Call)}
+        result = {}
+        for node in ast.walk(self._tree):
+            if isinstance(node, ast.Name) and id(node) not in functions:
+                index = self._attr_index[node.id]
+                values = compared.get(id(node))
+                if values is None or result.get(index, ()) is None:
+                    result[index] = None
+                else:
+                    result.setdefault(index, []).extend(values)
+        return result
+
+    def direction(self, index):
+        """Як значення виразу залежить від характеристики `index`: 1 — не спадає з її ростом,
+        -1 — не зростає, 0 — не залежить, None — невідомо (напр. `x * y`, `x == 5`)."""
+        return _direction(self._tree.body, index, self._attr_index)
+
+    def __call__(self, attrs):
+        return self._scalar(attrs)
+
+    def __repr__(self):
+        return f"Expression({self.source!r})"
+
+    @property
+    def indices(self):
+        return [self._attr_index[name] for name in self.names]
+
+    def vector(self, states):
+        """Значення для кожного рядка масиву станів `states` (форма: гравці × характеристики)."""
+        np = optional("numpy")  # Потрібен лише для пакетної симуляції; замикання працюють і без нього
+        if self._vector is None:
+            if np is None:
+                raise ExpressionError("Vector evaluation needs NumPy.")
+            self._vector = self._compile_vector(self._tree.body)
+        result = self._vector(states)
+        if np.ndim(result) == 0:
+            result = np.full(len(states), result)
+        return result
+
+    def _compile(self, node):
+        if isinstance(node, ast.Constant):
+            value = node.value
+            return lambda attrs: value
+        if isinstance(node, ast.Name):
+            index = self._attr_index[node.id]
+            return lambda attrs: attrs[index]
+        if isinstance(node, ast.UnaryOp):
+            operand = self._compile(node.operand)
+            if isinstance(node.op, ast.USub):
+                return lambda attrs: -operand(attrs)
+            if isinstance(node.op, ast.UAdd):
+                return operand
+            return lambda attrs: int(not operand(attrs))
+        if isinstance(node, ast.BinOp):
+            op, left, right = _BINARY[type(node.op)], self._compile(node.left), self._compile(node.right)
+            return lambda attrs: op(left(attrs), right(attrs))
+        if isinstance(node, ast.BoolOp):
+            values = [self._compile(value) for value in node.values]
+            if isinstance(node.op, ast.And):
+                return lambda attrs: int(all(value(attrs) for value in values))
+            return lambda attrs: int(any(value(attrs) for value in values))
+        if isinstance(node, ast.Compare):
+            operands = [self._compile(node.left)] + [self._compile(value) for value in node.comparators]
+            ops = [_COMPARE[type(op)] for op in node.ops]
+            if len(ops) == 1:
+                op, left, right = ops[0], operands[0], operands[1]
+                return lambda attrs: int(op(left(attrs), right(attrs)))
+
+            def chain(attrs):
+                left = operands[0](attrs)
+                for op, operand in zip(ops, operands[1:]):
+                    right = operand(attrs)
+                    if not op(left, right):
+                        return 0
+                    left = right
+                return 1
+            return chain
+        # Виклик дозволеної функції (перевірено в parse)
+        args = [self._compile(arg) for arg in node.args]
+        function = {"min": min, "max": max, "abs": abs, "clamp": _clamp}[node.func.id]
+        if len(args) == 1:
+            only = args[0]
+            return lambda attrs: function(only(attrs))
+        return lambda attrs: function(*[arg(attrs) for arg in args])
+
+    def _compile_vector(self, node):
+        np = optional("numpy")
+        if isinstance(node, ast.Constant):
+            value = node.value
+            return lambda states: value
+        if isinstance(node, ast.Name):
+            index = self._attr_index[node.id]
+            return lambda states: states[:, index]
+        if isinstance(node, ast.UnaryOp):
+            operand = self._compile_vector(node.operand)
+            if isinstance(node.op, ast.USub):
+                return lambda states: -operand(states)
+            if isinstance(node.op, ast.UAdd):
+                return operand
+            return lambda states: np.logical_not(operand(states)).astype(np.int64)
+        if isinstance(node, ast.BinOp):
+            left, right = self._compile_vector(node.left), self._compile_vector(node.right)
+            if type(node.op) in _DIVISION:
+                divide = _DIVISION[type(node.op)]
+
+                def safe_divide(states):
+                    divisor = right(states)
+                    zero = divisor == 0
+                    # Нульовий дільник замінюється одиницею, а результат для нього — нулем
+                    return np.where(zero, 0, divide(left(states), np.where(zero, 1, divisor)))
+                return safe_divide
+            op = _BINARY[type(node.op)]
+            return lambda states: op(left(states), right(states))
+        if isinstance(node, ast.BoolOp):
+            values = [self._compile_vector(value) for value in node.values]
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+
+            def boolean(states):
+                result = np.asarray(values[0](states), dtype=bool)
+                for value in values[1:]:
+                    result = combine(result, value(states))
+                return result.astype(np.int64)
+            return boolean
+        if isinstance(node, ast.Compare):
+            operands = [self._compile_vector(node.left)] + [self._compile_vector(value) for value in node.comparators]
+            ops = [_COMPARE[type(op)] for op in node.ops]
+
+            def compare(states):
+                values = [operand(states) for operand in operands]
+                result = np.asarray(ops[0](values[0], values[1]))
+                for op, left, right in zip(ops[1:], values[1:], values[2:]):
+                    result = np.logical_and(result, op(left, right))
+                return result.astype(np.int64)
+            return compare
+        args = [self._compile_vector(arg) for arg in node.args]
+        name = node.func.id
+        if name == "abs":
+            return lambda states: np.abs(args[0](states))
+        if name == "clamp":
+            return lambda states: np.minimum(np.maximum(args[0](states), args[1](states)), args[2](states))
+        reduce = np.minimum if name == "min" else np.maximum
+
+        def extremum(states):
+            result = args[0](states)
+            for arg in args[1:]:
+                result = reduce(result, arg(states))
+            return result
+        return extremum
+
+
+def _combine(*directions):
+    """Напрям суми (або іншої неспадної функції) частин з напрямами `directions`."""
+    result = 0
+    for direction in directions:
+        if direction is None or result and direction and direction != result:
+            return None
+        result = result or direction
+    return result
+
+
+def _negate(direction):
+    return None if direction is None else -direction
+
+
+_LOGICAL = (ast.Compare, ast.BoolOp)
+
+
+def _direction(node, index, attr_index):
+    if isinstance(node, ast.Constant):
+        return 0
+    if isinstance(node, ast.Name):
+        return 1 if attr_index[node.id] == index else 0
+    if isinstance(node, ast.UnaryOp):
+        inner = _direction(node.operand, index, attr_index)
+        if isinstance(node.op, ast.UAdd):
+            return inner
+        if isinstance(node.op, ast.Not) and inner and not isinstance(node.operand, _LOGICAL):
+            return None  # Істинність числа (від'ємне — істина, нуль — ні) немонотонна
+        return _negate(inner)
+    if isinstance(node, ast.BinOp):
+        left, right = _direction(node.left, index, attr_index), _direction(node.right, index, attr_index)
+        if isinstance(node.op, ast.Add):
+            return _combine(left, right)
+        if isinstance(node.op, ast.Sub):
+            return _combine(left, _negate(right))
+        return 0 if left == 0 and right == 0 else None
+    if isinstance(node, ast.BoolOp):
+        values = [_direction(value, index, attr_index) for value in node.values]
+        if any(value and not isinstance(operand, _LOGICAL) for value, operand in zip(values, node.values)):
+            return None
+        return _combine(*values)
+    if isinstance(node, ast.Compare):
+        operands = [node.left] + node.comparators
+        directions = [_direction(operand, index, attr_index) for operand in operands]
+        result = []
+        for op, left, right in zip(node.ops, directions, directions[1:]):
+            if isinstance(op, (ast.Gt, ast.GtE)):
+                result.append(_combine(left, _negate(right)))
+            elif isinstance(op, (ast.Lt, ast.LtE)):
+                result.append(_combine(_negate(left), right))
+            else:
+                result.append(0 if left == 0 and right == 0 else None)
+        return _combine(*result)
+    args = [_direction(arg, index, attr_index) for arg in node.args]
+    if node.func.id == "abs":
+        return 0 if args[0] == 0 else None
+    return _combine(*args)  # min, max і clamp не спадають за кожним аргументом
+
+
+def _constant(node):
+    """Значення сталої (зокрема від'ємної) або None."""
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        value = _constant(node.operand)
+        return None if value is None else (-value if isinstance(node.op, ast.USub) else value)
+    return node.value if isinstance(node, ast.Constant) else None
+
+
+def parse(source):
+    """Розбирає вираз і перевіряє, що в ньому лише дозволені конструкції."""
+    if not isinstance(source, str) or not source.strip():
+        raise ExpressionError("Empty expression.")
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except SyntaxError:
+        raise ExpressionError(f"Invalid expression '{source}'.") from None
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Expression, ast.Name, ast.Load, ast.UnaryOp, ast.BinOp, ast.BoolOp, ast.Compare,
+                             ast.USub, ast.UAdd, ast.Not, ast.And, ast.Or)):
+            continue
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            continue
+        if type(node) in _BINARY or type(node) in _COMPARE:
+            continue
+        if isinstance(node, ast.Call):
+            limits = _FUNCTIONS.get(node.func.id) if isinstance(node.func, ast.Name) else None
+            if limits is None or node.keywords:
+                raise ExpressionError(f"Unsupported function in '{source}'.")
+            low, high = limits
+            if len(node.args) < low or (high is not None and len(node.args) > high):
+                raise ExpressionError(f"Wrong number of arguments to {node.func.id}() in '{source}'.")
+            continue
+        raise ExpressionError(f"Unsupported syntax in '{source}'.")
+    return tree
+
+
+def _names(tree):
+    """Назви характеристик у виразі (без назв функцій), у порядку появи."""
+    functions = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and id(node) not in functions and node.id not in names:
+            names.append(node.id)
+    return names
+
+
+def expression_names(source):
+    """Назви характеристик, яких потребує вираз; кидає ExpressionError, якщо вираз недопустимий."""
+    return _names(parse(source))
+
+
+def compile_expression(source, attr_index):
+    """Компілює вираз для характеристик з індексами `attr_index` (назва → позиція у векторі)."""
+    return Expression(source, attr_index)
+
+
+_EFFECT_ITEM = re.compile(r"^\s*([^\s=+\-]+)\s*(\+=|-=|=)\s*(.+?)\s*$")
+
+
+def parse_effect(text):
+    """Ефект з рядка редактора: `health -= 10; money = max(money - 20, 0)`.
+
+    `+=` і `-=` з числом — зміна, `=` — новий вираз (число після `=` теж записується виразом).
+    """
+    effect = {}
+    for item in filter(str.strip, text.split(";")):
+        match = _EFFECT_ITEM.match(item)
+        if not match:
+            raise ExpressionError(f"Cannot parse effect '{item.strip()}'; use 'attr += 5' or 'attr = expression'.")
+        attr, op, value = match.groups()
+        if op == "=":
+            parse(value)
+            effect[attr] = value
+            continue
+        try:
+            number = int(value)
+        except ValueError:
+            try:
+                number = float(value)
+            except ValueError:
+                raise ExpressionError(f"'{attr} {op}' needs a number, got '{value}'.") from None
+        effect[attr] = -number if op == "-=" else number
+    return effect
+
+
+def format_effect(effect):
+    """Рядок для редактора з ефекту вибору (обернене до `parse_effect`)."""
+    parts = []
+    for attr, value in (effect or {}).items():
+        if isinstance(value, str):
+            parts.append(f"{attr} = {value}")
+        elif value < 0:
+            parts.append(f"{attr} -= {-value}")
+        else:
+            parts.append(f"{attr} += {value}")
+    return "; ".join(parts)
@@ -0,0 +1,77 @@
+"""Детермінований генератор синтетичних сценаріїв у форматі README (для бенчмарків і перевірок)."""
+import argparse
+import random
+
+from scenario_binary import save_scenario_file
+
+WORDS = ("the", "road", "dark", "forest", "old", "man", "sword", "river", "light", "door", "gold", "wolf",
+         "night", "you", "see", "a", "castle", "voice", "cold", "fire", "stone", "path", "quiet", "storm")
+
+
+def _text(rng, length):
+    """Текст приблизно з `length` символів зі слів словника."""
+    words = []
+    size = -1
+    while size < length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words).capitalize() + "." if words else ""
+
+
+def generate(scenes=1000, branching=3, cycles=0.1, text_length=200, attributes=3, endings=0.05, seed=0):
+    """Створює сценарій.
+
+    * `scenes` — кількість сцен; сцена 0 — стартова;
+    * `branching` — середня кількість виборів у нефінальній сцені (від 1 до 2·branching - 1);
+    * `cycles` — частка виборів, що ведуть назад (утворюють цикли), решта веде вперед;
+    * `text_length` — довжина тексту сцени в символах (вибори мають коротші тексти);
+    * `attributes` — кількість характеристик, перша з них — `health`;
+    * `endings` — частка фінальних сцен (без виборів); остання сцена фінальна завжди.
+
+    Той самий `seed` дає той самий сценарій.
+    """
+    rng = random.Random(seed)
+    names = [f"scene_{i}" for i in range(scenes)]
+    attrs = ["health"] + [f"attr_{i}" for i in range(1, attributes)]
+    character = {attr: (100 if attr == "health" else 10) for attr in attrs}
+
+    data = {"character": character, "scenes": {}}
+    for i, name in enumerate(names):
+        choices = []
+        final = i == scenes - 1 or (i > 0 and rng.random() < endings)
+        if not final:
+            for _ in range(rng.randint(1, max(1, 2 * branching - 1))):
+                if rng.random() < cycles:
+                    target = rng.randint(0, i)
+                else:
+                    # Переважно близькі переходи вперед, як у справжніх історіях
+                    target = min(scenes - 1, i + 1 + int(rng.expovariate(1 / max(1, branching * 2))))
+                effect = {}
+                if attrs and rng.random() < 0.5:
+                    effect[rng.choice(attrs)] = rng.randint(-10, 10)
+                choices.append({"text": _text(rng, max(10, text_length // 8)),
+                                "next_scene": names[target], "effect": effect})
+        data["scenes"][name] = {"text": _text(rng, text_length), "choices": choices}
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic scenario.")
+    parser.add_argument("output", help="target file; .istb writes binary, anything else writes JSON")
+    parser.add_argument("--scenes", type=int, default=1000)
+    parser.add_argument("--branching", type=int, default=3, help="average choices per scene")
+    parser.add_argument("--cycles", type=float, default=0.1, help="share of choices that lead backwards")
+    parser.add_argument("--text-length", type=int, default=200, help="characters per scene text")
+    parser.add_argument("--attributes", type=int, default=3, help="character attributes, health included")
+    parser.add_argument("--endings", type=float, default=0.05, help="share of scenes without choices")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data = generate(args.scenes, args.branching, args.cycles, args.text_length, args.attributes,
+                    args.endings, args.seed)
+    save_scenario_file(data, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Історія правок редактора: скасування й повторення без копій сценарію.
+
+Крок історії — команда зі списку операцій моделі (`ScenarioModel`): для сцени зберігаються
+посилання на старий і новий словники. Сцени не змінюються на місці, тож ці словники спільні
+зі сценарієм і між кроками, і крок коштує пам'яті лише на змінені сцени, а не на весь сценарій.
+Кілька правок (перейменування разом з оновленням посилань і збереженням сцени) групуються
+в один крок. Найстаріші кроки відкидаються, коли історія перевищує бюджет пам'яті.
+"""
+from collections import deque
+from contextlib import contextmanager
+
+from scenario_texts import TextRef
+
+HISTORY_BYTES = 64 * 1024 * 1024  # Приблизний бюджет пам'яті історії
+MAX_STEPS = 10_000
+_OBJECT = 64  # Приблизна вага словника чи кортежу без вмісту
+_REF = 16  # Стиснений текст належить сховищу; історія тримає лише посилання
+
+
+def _text_size(text):
+    return _REF if isinstance(text, TextRef) else _OBJECT + len(text or "")
+
+
+def scene_size(scene):
+    """Оцінка пам'яті сцени в байтах (без розпакування стиснених текстів)."""
+    if scene is None:
+        return 0
+    size = _OBJECT + _text_size(scene.get("text"))
+    for choice in scene.get("choices", ()):
+        size += _OBJECT * 2 + _text_size(choice.get("text")) + len(choice.get("next_scene") or "")
+    return size
+
+
+class Edit:
+    """Крок історії: назва для меню й операції моделі в порядку виконання."""
+    __slots__ = ("label", "ops", "size")
+
+    def __init__(self, label, ops):
+        self.label = label
+        self.ops = ops
+        self.size = 0
+        for op in ops:
+            if op[0] == "scene":
+                # Рахуємо обидва стани: один з них може бути вже не в сценарії
+                self.size += _OBJECT + scene_size(op[2]) + scene_size(op[3])
+            elif op[0] == "character":
+                self.size += _OBJECT * (2 + len(op[1]) + len(op[2]))
+            else:
+                self.size += _OBJECT
+
+
+class History:
+    """Стеки скасування й повторення для моделі сценарію.
+
+    Модель повідомляє історії кожну операцію; поза `group()` кожна операція — окремий крок.
+    """
+
+    def __init__(self, model, budget=HISTORY_BYTES, max_steps=MAX_STEPS):
+        self.model = model
+        self.budget = budget
+        self.max_steps = max_steps
+        self.done = deque()  # Виконані кроки; останній — праворуч
+        self.undone = []  # Скасовані кроки; наступний для повторення — останній
+        self.size = 0
+        self._ops = None
+        self._label = ""
+        self._depth = 0
+        model.recorder = self._record
+
+    def __len__(self):
+        return len(self.done) + len(self.undone)
+
+    @property
+    def position(self):
+        """Кількість виконаних кроків (номер поточного стану в історії)."""
+        return len(self.done)
+
+    def can_undo(self):
+        return bool(self.done)
+
+    def can_redo(self):
+        return bool(self.undone)
+
+    def labels(self):
+        """Назви всіх кроків від найстарішого; перші `position` — виконані."""
+        return [edit.label for edit in self.done] + [edit.label for edit in reversed(self.undone)]
+
+    def clear(self):
+        self.done.clear()
+        self.undone.clear()
+        self.size = 0
+
+    @contextmanager
+    def group(self, label):
+        """Об'єднує всі правки всередині блоку в один крок (вкладені групи зливаються з зовнішньою)."""
+        if self._depth == 0:
+            self._ops, self._label = [], label
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                ops, self._ops = self._ops, None
+                if ops:
+                    self._push(Edit(self._label, ops))
+
+    def _record(self, op):
+        if self._ops is not None:
+            self._ops.append(op)
+        else:
+            self._push(Edit("", [op]))
+
+    def _push(self, edit):
+        # Нова правка робить скасовані кроки недосяжними
+        for old in self.undone:
+            self.size -= old.size
+        self.undone.clear()
+        self.done.append(edit)
+        self.size += edit.size
+        while len(self.done) > 1 and (self.size > self.budget or len(self.done) > self.max_steps):
+            self.size -= self.done.popleft().size
+
+    def undo(self, steps=1):
+        """Скасовує до `steps` кроків; повертає назви зачеплених сцен."""
+        return self.jump(self.position - steps)
+
+    def redo(self, steps=1):
+        return self.jump(self.position + steps)
+
+    def jump(self, position):
+        """Переходить до стану після `position` кроків за одне застосування операцій.
+
+        Повертає назви сцен, що змінилися.
+        """
+        position = max(0, min(position, len(self)))
+        if position < self.position:
+            edits = [self.done.pop() for _ in range(self.position - position)]
+            self.undone.extend(edits)
+            # Кроки зняті від останнього до першого, а apply(undo=True) сам розвертає порядок
+            ops = [op for edit in reversed(edits) for op in edit.ops]
+            return self.model.apply(ops, undo=True)
+        if position > self.position:
+            edits = [self.undone.pop() for _ in range(position - self.position)]
+            self.done.extend(edits)
+            ops = [op for edit in edits for op in edit.ops]
+            return self.model.apply(ops)
+        return []
@@ -0,0 +1,323 @@
+"""Модель сценарію для редактора без залежності від Tk."""
+
+
+class SceneNames:
+    """Впорядкований список назв сцен з індексом назва→рядок.
+
+    Спільна модель для списку сцен і випадаючих списків `next_scene`: кортеж назв
+    будується лише після змін, а не при кожному відкритті сцени.
+    """
+
+    def __init__(self, names=()):
+        self.reset(names)
+
+    def reset(self, names):
+        self._names = list(names)
+        self._rows = {name: row for row, name in enumerate(self._names)}
+        self._values = None
+        self.version = 0
+
+    def __len__(self):
+        return len(self._names)
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __getitem__(self, row):
+        return self._names[row]
+
+    def __contains__(self, name):
+        return name in self._rows
+
+    def row(self, name):
+        """Номер рядка сцени або -1."""
+        return self._rows.get(name, -1)
+
+    def values(self):
+        """Кортеж усіх назв (кешується до наступної зміни)."""
+        if self._values is None:
+            self._values = tuple(self._names)
+        return self._values
+
+    def _changed(self):
+        self._values = None
+        self.version += 1
+
+    def append(self, name):
+        self._rows[name] = len(self._names)
+        self._names.append(name)
+        self._changed()
+
+    def remove(self, name):
+        """Видаляє назву й повертає її колишній рядок; наступні рядки зсуваються (O(n))."""
+        row = self._rows.pop(name)
+        del self._names[row]
+        for i in range(row, len(self._names)):
+            self._rows[self._names[i]] = i
+        self._changed()
+        return row
+
+    def insert(self, row, name):
+        """Вставляє назву в рядок `row` (обернене до `remove`)."""
+        self._names.insert(row, name)
+        for i in range(row, len(self._names)):
+            self._rows[self._names[i]] = i
+        self._changed()
+
+    def rename(self, old, new):
+        """Перейменовує назву на її ж рядку."""
+        row = self._rows.pop(old)
+        self._names[row] = new
+        self._rows[new] = row
+        self._changed()
+
+    def replace(self, names):
+        """Замінює весь порядок назв за один прохід (для стрибків історією)."""
+        self._names = list(names)
+        self._rows = {name: row for row, name in enumerate(self._names)}
+        self._changed()
+
+
+class ReferenceIndex:
+    """Зворотні посилання: назва сцени → множина (сцена-джерело, номер відповіді)."""
+
+    def __init__(self, scenes=None):
+        self.incoming = {}
+        if scenes:
+            for name, scene in scenes.items():
+                self.add_scene(name, scene)
+
+    def add_scene(self, name, scene):
+        for i, choice in enumerate(scene.get("choices", ())):
+            target = choice.get("next_scene")
+            if target:
+                self.incoming.setdefault(target, set()).add((name, i))
+
+    def remove_scene(self, name, scene):
+        for i, choice in enumerate(scene.get("choices", ())):
+            target = choice.get("next_scene")
+            refs = self.incoming.get(target)
+            if refs is not None:
+                refs.discard((name, i))
+                if not refs:
+                    del self.incoming[target]
+
+    def referrers(self, name):
+        """Відповіді, що ведуть до сцени, у вигляді відсортованого списку (джерело, номер)."""
+        return sorted(self.incoming.get(name, ()))
+
+
+class ScenarioModel:
+    """Дані сценарію разом з індексами редактора: порядок назв і зворотні посилання.
+
+    Сцени не змінюються на місці: кожна правка підставляє новий словник сцени, тож
+    раніше взяті посилання на сцени лишаються незмінними знімками.
+
+    Усі зміни проходять через кілька примітивів. Спостерігачі `observers` отримують кожну
+    заміну сцени як `(назва, стара, нова)` (див. `scenario_search.py`). Якщо задано `recorder`,
+    кожен примітив повідомляє йому операцію (див. `scenario_history.py`):
+        ("scene", назва, стара сцена або None, нова сцена або None)
+        ("append", назва) / ("remove", назва, рядок) / ("rename", стара, нова) — порядок назв
+        ("character", старі характеристики, нові характеристики)
+    """
+
+    BULK_NAMES = 32  # З такої кількості операцій над назвами порядок перебудовується одним проходом
+
+    def __init__(self, data):
+        self.names = SceneNames(())
+        self.recorder = None
+        self.observers = []
+        self.reset(data)
+
+    def reset(self, data):
+        self.data = data
+        self.names.reset(data["scenes"])
+        self.refs = ReferenceIndex(data["scenes"])
+        self.changed = set()  # Сцени, змінені після останнього take_changes()
+        self.character_changed = False
+        # Порядок назв розійшовся з порядком словника сцен (сцену повернуто на її колишній рядок).
+        # Словник не перебудовується на кожну правку: знімок і журнал беруть порядок з `names`
+        self.order_changed = False
+
+    @property
+    def scenes(self):
+        return self.data["scenes"]
+
+    def referrers(self, name, include_self=False):
+        refs = self.refs.referrers(name)
+        return refs if include_self else [ref for ref in refs if ref[0] != name]
+
+    def _set_scene(self, name, scene):
+        """Примітив: замінює (None — видаляє) словник сцени й оновлює зворотні посилання."""
+        old = self.scenes.get(name)
+        if old is not None:
+            self.refs.remove_scene(name, old)
+        if scene is None:
+            self.scenes.pop(name, None)
+        else:
+            self.scenes[name] = scene
+            self.refs.add_scene(name, scene)
+        self.changed.add(name)
+        for observer in self.observers:
+            observer(name, old, scene)
+        if self.recorder is not None:
+            self.recorder(("scene", name, old, scene))
+
+    def _append_name(self, name):
+        self.names.append(name)
+        if self.recorder is not None:
+            self.recorder(("append", name))
+
+    def _remove_name(self, name):
+        row = self.names.remove(name)
+        if self.recorder is not None:
+            self.recorder(("remove", name, row))
+
+    def _rename_name(self, old, new):
+        self.names.rename(old, new)
+        self.order_changed = True  # У словнику сцен нова назва стоїть в кінці
+        if self.recorder is not None:
+            self.recorder(("rename", old, new))
+
+    def put_scene(self, name, scene):
+        """Додає або замінює сцену, оновлюючи індекси."""
+        if name not in self.scenes:
+            self._append_name(name)
+        self._set_scene(name, scene)
+
+    def mark_character(self):
+        self.character_changed = True
+
+    def set_character(self, values):
+        """Замінює значення характеристик (словник змінюється на місці, бо його тримає редактор)."""
+        before = dict(self.data["character"])
+        self.data["character"].update(values)
+        after = dict(self.data["character"])
+        self.character_changed = True
+        if self.recorder is not None and after != before:
+            self.recorder(("character", before, after))
+
+    def apply(self, ops, undo=False):
+        """Застосовує записані операції (`undo=True` — у зворотному порядку й навпаки).
+
+        Для кожної сцени важить лише її останній стан, тож стрибок через сотні кроків
+        замінює кожну зачеплену сцену один раз. Операції не записуються повторно.
+        """
+        ops = ops[::-1] if undo else ops
+        recorder, self.recorder = self.recorder, None
+        try:
+            final = {}
+            name_ops = []
+            character = None
+            for op in ops:
+                kind = op[0]
+                if kind == "scene":
+                    final[op[1]] = op[2] if undo else op[3]
+                elif kind == "character":
+                    character = op[1] if undo else op[2]
+                else:
+                    name_ops.append(op)
+            self._apply_names(name_ops, undo)
+            for name, scene in final.items():
+                if self.scenes.get(name) is not scene:
+                    self._set_scene(name, scene)
+            if character is not None:
+                self.data["character"].clear()
+                self.data["character"].update(character)
+                self.character_changed = True
+        finally:
+            self.recorder = recorder
+        return list(final)
+
+    def _apply_names(self, name_ops, undo):
+        if len(name_ops) < self.BULK_NAMES:
+            names = self.names
+        else:
+            names = list(self.names)
+        for op in name_ops:
+            if op[0] == "rename":
+                old, new = (op[2], op[1]) if undo else (op[1], op[2])
+                if names is self.names:
+                    names.rename(old, new)
+                else:
+                    names[names.index(old)] = new
+                self.order_changed = True
+            elif (op[0] == "append") != undo:
+                if op[0] == "append":
+                    names.append(op[1])
+                else:
+                    names.insert(op[2], op[1])
+                    self.order_changed = True
+            else:
+                names.remove(op[1])
+        if names is not self.names:
+            self.names.replace(names)
+
+    def take_changes(self):
+        """Зміни з попереднього виклику: (характеристики або None, {назва: сцена або None — видалена},
+        порядок назв або None, якщо він не змінювався інакше, ніж додаванням у кінець)."""
+        character = dict(self.data["character"]) if self.character_changed else None
+        scenes = {name: self.scenes.get(name) for name in self.changed}
+        order = list(self.names) if self.order_changed else None
+        self.changed = set()
+        self.character_changed = False
+        self.order_changed = False
+        return character, scenes, order
+
+    def snapshot(self):
+        """Знімок для запису в іншому потоці. Словники сцен не змінюються на місці,
+        тож досить скопіювати контейнери верхнього рівня. Сцени йдуть у порядку списку назв:
+        перша з них — стартова."""
+        data = dict(self.data)
+        data["character"] = dict(self.data["character"])
+        scenes = self.scenes
+        data["scenes"] = {name: scenes[name] for name in self.names}
+        return data
+
+    def _retarget(self, refs, new_target):
+        """Перенаправляє вказані відповіді інших сцен на `new_target` (None — видалити відповіді)."""
+        by_source = {}
+        for source, i in refs:
+            by_source.setdefault(source, []).append(i)
+        for source, indexes in by_source.items():
+            scene = self.scenes[source]
+            choices = list(scene["choices"])
+            if new_target is None:
+                for i in sorted(indexes, reverse=True):
+                    del choices[i]
+            else:
+                for i in indexes:
+                    choices[i] = dict(choices[i], next_scene=new_target)
+            self._set_scene(source, dict(scene, choices=choices))
+        return sorted(by_source)
+
+    def rename_scene(self, old, new):
+        """Перейменовує сцену й оновлює всі посилання на неї за O(кількості посилань).
+
+        Сцена лишається на своєму рядку, а в збереженому файлі — на своєму місці (тож
+        перейменована стартова сцена лишається стартовою). Повертає змінені сцени-джерела.
+        """
+        if new in self.scenes:
+            raise ValueError(f"Scene '{new}' already exists.")
+        scene = self.scenes[old]
+        self._set_scene(old, None)
+        self._rename_name(old, new)
+        # Посилання сцени на саму себе теж переходять на нову назву
+        choices = [dict(choice, next_scene=new) if choice.get("next_scene") == old else choice
+                   for choice in scene.get("choices", ())]
+        if "choices" in scene:
+            scene = dict(scene, choices=choices)
+        changed = self._retarget(self.refs.referrers(old), new)
+        self._set_scene(new, scene)
+        return changed
+
+    def delete_scene(self, name, drop_references=False):
+        """Видаляє сцену. Повертає посилання на неї з інших сцен; з `drop_references=True`
+        ці відповіді також видаляються. Посилання знаходяться за O(кількості посилань),
+        але рядки наступних сцен у списку зсуваються за O(n)."""
+        self._set_scene(name, None)
+        self._remove_name(name)
+        refs = self.referrers(name)
+        if drop_references:
+            self._retarget(refs, None)
+        return refs
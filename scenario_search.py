@@ -0,0 +1,354 @@
+"""Пошук сцен у редакторі: інвертований індекс назв, текстів сцен і текстів відповідей.
+
+Слово запиту збігається зі словом індексу точно, за префіксом або нечітко — за спільними
+трійками літер (trigram), тож «castel» знаходить «castle». Сцена потрапляє в результати,
+якщо збіглися всі слова запиту; вище стоять збіги в назві, потім у тексті сцени, потім
+у відповідях. Запит `to:назва` — відповіді, що ведуть до сцени (з індексу посилань моделі).
+
+Індекс оновлюється з кожною зміною сцени в `ScenarioModel` (збереження, видалення,
+скасування), а після завантаження будується у фоновому потоці; поки побудова триває,
+пошук повертає вже проіндексовані сцени.
+"""
+import string
+import threading
+from array import array
+from bisect import bisect_left, insort
+
+from lazy_import import optional
+import tracing
+
+NAME, TEXT, CHOICE = 0, 1, 2  # Поля сцени
+_WEIGHTS = (4.0, 2.0, 1.0)
+PREFIX_WEIGHT = 0.75  # Множник для збігу за префіксом
+FUZZY_WEIGHT = 0.5  # Множник для нечіткого збігу
+MAX_EXPANSIONS = 64  # Скільки слів індексу може замінити одне слово запиту
+FUZZY_SIMILARITY = 0.5  # Найменша схожість трійок літер (коефіцієнт Дайса)
+BUILD_CHUNK = 2000  # Сцен за одне захоплення блокування під час фонової побудови
+COMPACT_MIN = 1024  # Від скількох видалених номерів індекс стискається (коли їх більше, ніж живих)
+REFERENCE_PREFIX = "to:"
+
+# Розділові знаки стають пробілами; `str.translate` зі `split` удвічі швидші за регулярний вираз
+_SEPARATORS = str.maketrans({c: " " for c in string.punctuation.replace("_", "") + "«»—–…’‘“”„"})
+
+
+def tokenize(text):
+    """Слова тексту в нижньому регістрі."""
+    return str(text).lower().translate(_SEPARATORS).split() if text else []
+
+
+def trigrams(word):
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def scene_fields(name, scene):
+    """Множини слів для полів сцени: назва, текст, тексти відповідей."""
+    if scene is None:
+        return None
+    choices = "\n".join(str(choice.get("text") or "") for choice in scene.get("choices", ()))
+    return set(tokenize(name)), set(tokenize(scene.get("text"))), set(tokenize(choices))
+
+
+class SearchHit:
+    """Результат пошуку: сцена, оцінка й поле найкращого збігу (або номери відповідей для `to:`)."""
+    __slots__ = ("name", "score", "field", "choices")
+
+    def __init__(self, name, score, field, choices=()):
+        self.name = name
+        self.score = score
+        self.field = field
+        self.choices = list(choices)
+
+    def __repr__(self):
+        return f"SearchHit({self.name!r}, {self.score})"
+
+
+class SearchIndex:
+    """Інвертований індекс сцен моделі; підписується на її зміни."""
+
+    def __init__(self, model):
+        self.model = model
+        self._lock = threading.RLock()
+        self._postings = ({}, {}, {})  # Для кожного поля: слово → зростаючий array номерів сцен
+        self._ids = {}  # Назва сцени → номер
+        self._names = []  # Номер → назва (None — сцену видалено)
+        self._vocabulary = []  # Відсортовані слова всіх полів (для префіксів)
+        self._unsorted = []  # Нові слова фонової побудови; сортуються разом наприкінці
+        self._trigrams = {}  # Трійка літер → множина слів
+        self._touched = set()  # Сцени, змінені під час фонової побудови
+        self._generation = 0  # Побудова для застарілого сценарію зупиняється
+        self._thread = None
+        self.ready = True
+        model.observers.append(self.scene_changed)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def close(self):
+        if self.scene_changed in self.model.observers:
+            self.model.observers.remove(self.scene_changed)
+
+    # --- Побудова й оновлення ---
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._postings = ({}, {}, {})
+            self._ids = {}
+            self._names = []
+            self._vocabulary = []
+            self._unsorted = []
+            self._trigrams = {}
+            self._touched = set()
+
+    def rebuild(self, background=True):
+        """Індексує всі сцени моделі заново; з `background=True` — у фоновому потоці."""
+        self.clear()
+        items = list(self.model.scenes.items())  # Сцени не змінюються на місці, тож список — знімок
+        self.ready = False
+        if not background:
+            self._build(items, self._generation)
+            return
+        self._thread = threading.Thread(target=self._build, args=(items, self._generation), name="search-index",
+                                        daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @tracing.traced("search.build")
+    def _build(self, items, generation):
+        optional("numpy")  # Імпорт для ранжування — тут, у фоні, а не з першим запитом
+        for start in range(0, len(items), BUILD_CHUNK):
+            # Тексти розпаковуються й розбиваються на слова поза блокуванням
+            chunk = [(name, scene_fields(name, scene)) for name, scene in items[start:start + BUILD_CHUNK]]
+            with self._lock:
+                if generation != self._generation:
+                    return
+                for name, fields in chunk:
+                    # Сцену вже змінили в редакторі — її свіжа версія проіндексована в scene_changed
+                    if name not in self._touched and name not in self._ids:
+                        self._add(name, fields)
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._sort_vocabulary()
+            self._touched = set()
+            self.ready = True
+
+    def scene_changed(self, name, old, new):
+        """Спостерігач моделі: сцену `name` замінено (`new` None — видалено)."""
+        removed, added = scene_fields(name, old), scene_fields(name, new)
+        with self._lock:
+            if not self.ready:
+                self._touched.add(name)
+            doc = self._ids.get(name)
+            if doc is not None:
+                self._remove(name, removed)
+            if added is not None:
+                self._add(name, added, doc)  # Змінена сцена зберігає свій номер
+            elif len(self._names) - len(self._ids) > max(len(self._ids), COMPACT_MIN):
+                self._compact()
+
+    def _add(self, name, fields, doc=None):
+        if doc is None:
+            doc = len(self._names)
+            self._names.append(name)
+        else:
+            self._names[doc] = name
+        self._ids[name] = doc
+        for postings, words in zip(self._postings, fields):
+            get = postings.get
+            for word in words:
+                ids = get(word)
+                if ids is None:
+                    if not self._known(word):
+                        self._new_word(word)
+                    ids = postings[word] = array("q")
+                if ids and ids[-1] > doc:
+                    insort(ids, doc)  # Старий номер повторно доданої сцени
+                else:
+                    ids.append(doc)
+
+    def _remove(self, name, fields):
+        doc = self._ids.pop(name)
+        self._names[doc] = None
+        for postings, words in zip(self._postings, fields):
+            for word in words:
+                ids = postings.get(word)
+                if ids is None:
+                    continue
+                # Номери в списку завжди відсортовані
+                i = bisect_left(ids, doc)
+                if i == len(ids) or ids[i] != doc:
+                    continue
+                del ids[i]
+                if not ids:
+                    del postings[word]
+                    if not self._known(word):
+                        self._drop_word(word)
+
+    def _compact(self):
+        """Перенумеровує живі сцени підряд, щоб видалені не роздували масиви ранжування."""
+        renumber = {}
+        names = []
+        for doc, name in enumerate(self._names):
+            if name is not None:
+                renumber[doc] = len(names)
+                names.append(name)
+        self._names = names
+        self._ids = {name: doc for doc, name in enumerate(names)}
+        for postings in self._postings:
+            for word, ids in postings.items():
+                # Нумерація монотонна, тож порядок у списках зберігається
+                postings[word] = array("q", [renumber[doc] for doc in ids])
+
+    def _known(self, word):
+        return any(word in postings for postings in self._postings)
+
+    def _new_word(self, word):
+        if self.ready:
+            vocabulary = self._vocabulary
+            vocabulary.insert(bisect_left(vocabulary, word), word)
+        else:
+            self._unsorted.append(word)  # Вставка в середину на кожне слово коштувала б O(V²)
+        for gram in trigrams(word):
+            self._trigrams.setdefault(gram, set()).add(word)
+
+    def _sort_vocabulary(self):
+        if self._unsorted:
+            self._vocabulary = sorted(self._vocabulary + self._unsorted)
+            self._unsorted = []
+
+    def _drop_word(self, word):
+        self._sort_vocabulary()
+        vocabulary = self._vocabulary
+        i = bisect_left(vocabulary, word)
+        if i < len(vocabulary) and vocabulary[i] == word:
+            del vocabulary[i]
+        for gram in trigrams(word):
+            words = self._trigrams.get(gram)
+            if words is not None:
+                words.discard(word)
+                if not words:
+                    del self._trigrams[gram]
+
+    # --- Пошук ---
+
+    def expand(self, word):
+        """Слова індексу для слова запиту з множниками ваги: точне, префіксні, інакше нечіткі."""
+        self._sort_vocabulary()
+        vocabulary = self._vocabulary
+        matches = []
+        i = bisect_left(vocabulary, word)
+        while i < len(vocabulary) and vocabulary[i].startswith(word) and len(matches) < MAX_EXPANSIONS:
+            matches.append((vocabulary[i], 1.0 if vocabulary[i] == word else PREFIX_WEIGHT))
+            i += 1
+        if matches:
+            return matches
+        grams = trigrams(word)
+        shared = {}
+        for gram in grams:
+            for candidate in self._trigrams.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        scored = []
+        for candidate, count in shared.items():
+            similarity = 2 * count / (len(grams) + len(candidate))  # У слова з n літер n трійок
+            if similarity >= FUZZY_SIMILARITY:
+                scored.append((similarity, candidate))
+        scored.sort(reverse=True)
+        return [(candidate, FUZZY_WEIGHT) for _, candidate in scored[:MAX_EXPANSIONS]]
+
+    @tracing.traced("search.query")
+    def search(self, query, limit=100):
+        """Сцени, що відповідають запиту, від найкращого збігу; за рівних оцінок — у порядку сценарію."""
+        query = query.strip()
+        if query.lower().startswith(REFERENCE_PREFIX):
+            return self.references(query[len(REFERENCE_PREFIX):].strip(), limit)
+        words = tokenize(query)
+        if not words:
+            return []
+        with self._lock:
+            # Для кожного слова запиту: (поле, вага, номери сцен) усіх його розгортань
+            groups = []
+            for word in words:
+                matched = [(field, _WEIGHTS[field] * weight, postings[token])
+                           for token, weight in self.expand(word)
+                           for field, postings in enumerate(self._postings) if token in postings]
+                if not matched:
+                    return []
+                groups.append(matched)
+            # Без NumPy оцінки рахуються словниками, лише повільніше
+            ranked = (self._rank_numpy if optional("numpy") is not None else self._rank)(groups, limit)
+            return [SearchHit(self._names[doc], score, field) for doc, score, field in ranked]
+
+    def _row(self, doc):
+        """Рядок сцени в порядку сценарію — для рівних оцінок; назви поза списком ідуть наприкінці."""
+        names = self.model.names
+        row = names.row(self._names[doc])
+        return row if row >= 0 else len(names)
+
+    def _rank_numpy(self, groups, limit):
+        np = optional("numpy")
+        n = len(self._names)
+        total = np.zeros(n)
+        best = np.zeros((len(self._postings), n))  # Найбільша вага кожного поля серед слів
+        found = np.ones(n, dtype=bool)
+        for matched in groups:
+            word = np.zeros(n)
+            for field, value, ids in matched:
+                docs = np.frombuffer(ids, dtype=np.int64)  # Без копіювання
+                word[docs] = np.maximum(word[docs], value)
+                best[field, docs] = np.maximum(best[field, docs], value)
+            found &= word > 0
+            total += word
+        docs = np.flatnonzero(found)
+        rows = np.fromiter(map(self._row, docs.tolist()), dtype=np.int64, count=len(docs))
+        order = np.lexsort((rows, -total[docs]))[:limit]
+        docs = docs[order]
+        fields = best[:, docs].argmax(axis=0)
+        return [(int(doc), float(total[doc]), int(field)) for doc, field in zip(docs, fields)]
+
+    def _rank(self, groups, limit):
+        """Те саме без NumPy: словники оцінок і перетин множин."""
+        per_word = []
+        for matched in groups:
+            fields = [{} for _ in self._postings]  # Поле → {номер сцени: вага}
+            for field, value, ids in matched:
+                scores = fields[field]
+                for doc in ids:
+                    if scores.get(doc, 0) < value:
+                        scores[doc] = value
+            per_word.append(fields)
+        candidates = None
+        for fields in per_word:
+            matched = set().union(*fields)
+            candidates = matched if candidates is None else candidates & matched
+        ranked = []
+        for doc in candidates:
+            score = 0.0
+            best_field, best = TEXT, 0.0
+            for fields in per_word:
+                top = 0.0
+                for field, scores in enumerate(fields):
+                    value = scores.get(doc, 0.0)
+                    top = max(top, value)
+                    if value > best:
+                        best_field, best = field, value
+                score += top
+            ranked.append((doc, score, best_field))
+        ranked.sort(key=lambda item: (-item[1], self._row(item[0])))
+        return ranked[:limit]
+
+    def references(self, target, limit=100):
+        """Сцени з відповідями, що ведуть до `target` (без урахування регістру, якщо точної назви немає)."""
+        if target not in self.model.scenes:
+            lowered = target.lower()
+            target = next((name for name in self.model.names if name.lower() == lowered), target)
+        by_source = {}
+        for source, i in self.model.referrers(target, include_self=True):
+            by_source.setdefault(source, []).append(i)
+        hits = [SearchHit(source, float(len(choices)), CHOICE, choices) for source, choices in by_source.items()]
+        hits.sort(key=lambda hit: (-hit.score, hit.name))
+        return hits[:limit]
@@ -0,0 +1,288 @@
+"""Векторизований симулятор Монте-Карло: тисячі проходжень сценарію одночасно на масивах NumPy."""
+import argparse
+import json
+
+import numpy as np
+
+from scenario_engine import compile_scenario
+import tracing
+
+# Стани проходжень
+PLAYING = 0
+ENDED = 1
+DEAD = 2
+TRUNCATED = 3
+
+
+def random_policy(scenes, attrs, degree, rng):
+    """Рівномірно випадковий вибір серед варіантів поточної сцени.
+
+    `degree` — кількість доступних варіантів; якщо в сцені є умови `requires`, номер
+    рахується лише серед тих, чия умова виконується.
+    """
+    return (rng.random(len(scenes)) * degree).astype(np.int64)
+
+
+class SimulationResult:
+    """Зведена статистика пакета проходжень."""
+
+    def __init__(self, compiled):
+        n_scenes = compiled.scene_count
+        self.compiled = compiled
+        self.runs = 0
+        self.truncated = 0
+        self.total_steps = 0
+        self.ending_counts = np.zeros(n_scenes, dtype=np.int64)
+        self.death_counts = np.zeros(n_scenes, dtype=np.int64)
+        self.visit_counts = np.zeros(n_scenes, dtype=np.int64)  # Скільки виборів зроблено в сцені
+        self.value_counts = [{} for _ in compiled.attr_names]  # Фінальні значення характеристик
+
+    @property
+    def deaths(self):
+        return int(self.death_counts.sum())
+
+    @property
+    def mean_path_length(self):
+        return self.total_steps / self.runs if self.runs else 0.0
+
+    def endings(self):
+        """Розподіл фінальних сцен: {сцена: частка проходжень}."""
+        names = self.compiled.scene_names
+        return {names[s]: int(self.ending_counts[s]) / self.runs for s in np.flatnonzero(self.ending_counts)}
+
+    def death_rates(self):
+        """Частка фатальних виборів у кожній сцені: {сцена: смерті / вибори}."""
+        names = self.compiled.scene_names
+        return {
+            names[s]: int(self.death_counts[s]) / int(self.visit_counts[s])
+            for s in np.flatnonzero(self.death_counts)
+        }
+
+    def histogram(self, attr, bins=20):
+        """Гістограма фінальних значень характеристики: (кількості, межі кошиків)."""
+        counts = self.value_counts[self.compiled.attr_index[attr]]
+        values = np.fromiter(counts.keys(), dtype=np.float64, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        return np.histogram(values, bins=bins, weights=weights)
+
+    def to_dict(self, bins=20):
+        histograms = {}
+        for attr in self.compiled.attr_names:
+            hist, edges = self.histogram(attr, bins)
+            histograms[attr] = {"counts": hist.astype(np.int64).tolist(), "edges": edges.tolist()}
+        return {
+            "runs": self.runs,
+            "deaths": self.deaths,
+            "truncated": self.truncated,
+            "mean_path_length": self.mean_path_length,
+            "endings": self.endings(),
+            "death_rates": self.death_rates(),
+            "histograms": histograms,
+        }
+
+    def summary(self, top=10):
+        """Текстовий звіт для консолі."""
+        runs = self.runs or 1
+        lines = [
+            f"Runs: {self.runs}",
+            f"Deaths: {self.deaths} ({self.deaths / runs:.2%})",
+            f"Truncated: {self.truncated} ({self.truncated / runs:.2%})",
+            f"Mean path length: {self.mean_path_length:.2f}",
+            "Endings:",
+        ]
+        for name, share in sorted(self.endings().items(), key=lambda item: -item[1])[:top]:
+            lines.append(f"  {name}: {share:.2%}")
+        lines.append("Deadliest scenes:")
+        for name, rate in sorted(self.death_rates().items(), key=lambda item: -item[1])[:top]:
+            lines.append(f"  {name}: {rate:.2%}")
+        lines.append("Final attributes (mean):")
+        for i, attr in enumerate(self.compiled.attr_names):
+            counts = self.value_counts[i]
+            total = sum(counts.values()) or 1
+            lines.append(f"  {attr}: {sum(v * c for v, c in counts.items()) / total:.2f}")
+        return "\n".join(lines)
+
+    def _add_values(self, attrs):
+        for i, counts in enumerate(self.value_counts):
+            values, hits = np.unique(attrs[:, i], return_counts=True)
+            for value, hit in zip(values.tolist(), hits.tolist()):
+                counts[value] = counts.get(value, 0) + hit
+
+
+class Simulator:
+    """Пакетний прогін сценарію за правилами `Game.make_choice` для всіх гравців за одну операцію."""
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+        self.offsets = np.asarray(compiled.offsets, dtype=np.int64)
+        self.degree = np.diff(self.offsets)
+        self.targets = np.asarray(compiled.targets, dtype=np.int64)
+        self.effects = np.asarray(compiled.effects).reshape(compiled.choice_count, len(compiled.attr_names))
+        self.initial = np.asarray(compiled.initial, dtype=self.effects.dtype)
+        self.health = compiled.health
+
+        # Умови й ефекти-вирази обчислюються пакетно, групами гравців з однаковим вибором
+        self.conditional = np.zeros(compiled.choice_count, dtype=bool)
+        self.conditional[list(compiled.conditions)] = True
+        sources = np.repeat(np.arange(compiled.scene_count), self.degree)
+        self.guarded = np.zeros(compiled.scene_count, dtype=bool)
+        self.guarded[sources[self.conditional]] = True
+        self.assigned = np.zeros(compiled.choice_count, dtype=bool)
+        self.assigned[list(compiled.assignments)] = True
+
+    def _available(self, s, states):
+        """Маска доступних варіантів (гравці × найбільша кількість варіантів серед їхніх сцен)."""
+        degree = self.degree[s]
+        columns = np.arange(int(degree.max()) if len(degree) else 0)
+        mask = columns[None, :] < degree[:, None]
+        rows = np.flatnonzero(self.guarded[s])
+        if not len(rows):
+            return mask
+        edges = self.offsets[s[rows]][:, None] + columns[None, :]
+        r, c = np.nonzero(mask[rows])
+        e = edges[r, c]
+        keep = self.conditional[e]
+        r, c, e = r[keep], c[keep], e[keep]
+        conditions = self.compiled.conditions
+        for edge, group in _groups(e):
+            passed = conditions[edge].vector(states[rows[r[group]]]).astype(bool)
+            mask[rows[r[group]], c[group]] = passed
+        return mask
+
+    def _choose(self, s, states, policy, rng):
+        """Номери варіантів з урахуванням умов; -1 — у сцені не лишилося доступних варіантів."""
+        if not self.compiled.conditions:
+            return policy(s, states, self.degree[s], rng)
+        mask = self._available(s, states)
+        count = mask.sum(axis=1)
+        choice = np.full(len(s), -1, dtype=np.int64)
+        ok = np.flatnonzero(count > 0)
+        if len(ok):
+            k = policy(s[ok], states[ok], count[ok], rng)
+            # k-й доступний варіант: перший стовпчик, де накопичена кількість доступних перевищує k
+            choice[ok] = (np.cumsum(mask[ok], axis=1) > k[:, None]).argmax(axis=1)
+        return choice
+
+    def _assign(self, active, edge, before, attrs):
+        """Ефекти-вирази: нові значення за станом до вибору `before`."""
+        rows = np.flatnonzero(self.assigned[edge])
+        assignments = self.compiled.assignments
+        for e, group in _groups(edge[rows]):
+            players = rows[group]
+            for a, expr in assignments[e]:
+                attrs[active[players], a] = expr.vector(before[players])
+
+    @tracing.traced("sim.run")
+    def run(self, runs, max_steps=1000, policy=random_policy, seed=None, batch_size=1_000_000):
+        """Виконує `runs` проходжень пакетами по `batch_size` і повертає `SimulationResult`."""
+        result = SimulationResult(self.compiled)
+        rng = np.random.default_rng(seed)
+        if not self.compiled.scene_count:
+            return result
+        done = 0
+        while done < runs:
+            n = min(batch_size, runs - done)
+            self._run_batch(result, n, max_steps, policy, rng)
+            done += n
+        return result
+
+    def _run_batch(self, result, n, max_steps, policy, rng):
+        degree, offsets, targets, effects = self.degree, self.offsets, self.targets, self.effects
+        scene = np.zeros(n, dtype=np.int64)
+        attrs = np.tile(self.initial, (n, 1))
+        steps = np.zeros(n, dtype=np.int64)
+        status = np.full(n, PLAYING if degree[0] else ENDED, dtype=np.int8)
+
+        active = np.flatnonzero(status == PLAYING)
+        for _ in range(max_steps):
+            if not len(active):
+                break
+            s = scene[active]
+            choice = self._choose(s, attrs[active], policy, rng)
+            if self.compiled.conditions:
+                # Жоден варіант недоступний — гра завершується в цій сцені
+                stuck = choice < 0
+                if stuck.any():
+                    status[active[stuck]] = ENDED
+                    active, s, choice = active[~stuck], s[~stuck], choice[~stuck]
+                    if not len(active):
+                        break
+            edge = offsets[s] + choice
+            before = attrs[active] if self.compiled.assignments else None
+            attrs[active] += effects[edge]
+            if before is not None:
+                self._assign(active, edge, before, attrs)
+            steps[active] += 1
+            visits = np.bincount(s)
+            result.visit_counts[:len(visits)] += visits
+
+            # Смерть перевіряється до переходу, як у `make_choice`
+            if self.health >= 0:
+                dead = attrs[active, self.health] <= 0
+                if dead.any():
+                    status[active[dead]] = DEAD
+                    deaths = np.bincount(s[dead])
+                    result.death_counts[:len(deaths)] += deaths
+                    alive = ~dead
+                    active, edge = active[alive], edge[alive]
+
+            target = targets[edge]
+            # Порожній або неіснуючий next_scene завершує гру в поточній сцені
+            status[active[target < 0]] = ENDED
+            moved = target >= 0
+            active, target = active[moved], target[moved]
+            scene[active] = target
+            finished = degree[target] == 0
+            status[active[finished]] = ENDED
+            active = active[~finished]
+
+        status[active] = TRUNCATED
+        ended = scene[status == ENDED]
+        counts = np.bincount(ended, minlength=len(result.ending_counts))
+        result.ending_counts += counts
+        result.truncated += len(active)
+        result.total_steps += int(steps.sum())
+        result.runs += n
+        result._add_values(attrs)
+
+
+def _groups(keys):
+    """Пари (ключ, індекси з цим ключем) для масиву `keys`."""
+    if not len(keys):
+        return
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    bounds = np.flatnonzero(np.diff(sorted_keys)) + 1
+    for start, end in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(keys)]))):
+        yield int(sorted_keys[start]), order[start:end]
+
+
+def simulate(data, runs, **kwargs):
+    """Компілює JSON-сценарій і запускає `runs` випадкових проходжень."""
+    return Simulator(compile_scenario(data)).run(runs, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte-Carlo playthrough simulator for scenario balancing.")
+    parser.add_argument("scenario", help="scenario JSON file")
+    parser.add_argument("-n", "--runs", type=int, default=100_000, help="number of playthroughs")
+    parser.add_argument("--max-steps", type=int, default=1000, help="step limit per playthrough")
+    parser.add_argument("--seed", type=int, default=None, help="random seed")
+    parser.add_argument("--batch-size", type=int, default=1_000_000, help="playthroughs held in memory at once")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    parser.add_argument("--trace", metavar="FILE", help="write a Chrome trace and print a timing summary")
+    args = parser.parse_args()
+    if args.trace:
+        tracing.enable(args.trace)
+
+    with open(args.scenario, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    result = simulate(data, args.runs, max_steps=args.max_steps, seed=args.seed, batch_size=args.batch_size)
+    if args.json:
+        print(json.dumps(result.to_dict(), ensure_ascii=False, indent=4))
+    else:
+        print(result.summary())
+
+
+if __name__ == "__main__":
+    main()
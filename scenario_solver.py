@@ -0,0 +1,707 @@
+"""Точний розв'язувач сценарію: пошук у просторі станів (сцена, здоров'я).
+
+Досяжність у графі сцен (`scenario_analyzer.py`, `visio.py`) не враховує, що ефект може вбити
+героя (`health <= 0`) раніше, ніж він дійде до фіналу. Розв'язувач перебирає стани гри:
+
+* пошук у ширину з домінуванням: у тій самій сцені стан з не більшим здоров'ям, знайдений
+  не раніше, нічого не додає (ефекти адитивні, а смерть залежить лише від здоров'я), тож
+  для кожної сцени зберігається лише зростаюча послідовність рівнів здоров'я;
+* цикл, що повертає в ту саму сцену з більшим здоров'ям, можна повторювати скільки завгодно —
+  такий стан отримує нескінченне здоров'я, тож пошук завершується й на циклах;
+* мінімальне стартове здоров'я для кожного фіналу — зворотний пошук найкоротших шляхів
+  (SPFA); ці пошуки незалежні й розподіляються між процесами.
+
+Інші характеристики на перебіг гри не впливають, тому в стан не входять; у маршрутах
+показуються їхні підсумкові значення. Якщо ж у сценарії є умови `requires` або ефекти-вирази,
+у стан входять усі характеристики, які ці вирази читають, і пошук іде без домінування
+(`search_states`): характеристики, більше значення яких не шкодить, відсіюються домінуванням,
+значення за межами сталих з умов зливаються, а цикли набору, як і для здоров'я, роблять
+характеристику необмеженою; мінімальне стартове здоров'я тоді не обчислюється.
+Обірваний лімітом пошук показує знайдені фінали лише як досяжні, без найкоротших і найбезпечніших
+маршрутів.
+"""
+import argparse
+import json
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from scenario_binary import load_scenario_file
+from scenario_engine import compile_scenario
+import tracing
+
+INF = float("inf")
+MAX_STATES = 5_000_000
+
+
+class SolverReport:
+    """Результат: досяжні фінали з маршрутами, смертельні вибори та мінімальне стартове здоров'я."""
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+        # сцена → {"shortest": Route, "safest": Route, "min_health": ...}; при обриві пошуку — {"route": Route}
+        self.endings = {}
+        self.blocked = []  # Фінальні сцени, до яких не дійти живим
+        self.deaths = []  # (сцена, номер вибору), де герой може загинути
+        self.min_health = None  # Найменше стартове здоров'я, з яким досяжний хоч один фінал
+        self.states = 0
+        self.truncated = False
+        self.conditional = compiled.has_logic  # Умови/вирази: мінімальне здоров'я не обчислюється
+
+    def to_dict(self):
+        names = self.compiled.scene_names
+        return {
+            "endings": {names[s]: {key: (value.to_dict() if isinstance(value, Route) else _number(value))
+                                   for key, value in info.items()}
+                        for s, info in self.endings.items()},
+            "blocked": [names[s] for s in self.blocked],
+            "deaths": [{"scene": names[s], "choice": i} for s, i in self.deaths],
+            "min_health": _number(self.min_health),
+            "states": self.states,
+            "truncated": self.truncated,
+            "conditional": self.conditional,
+        }
+
+    def format(self, limit=20):
+        names = self.compiled.scene_names
+        lines = [f"Explored {self.states} states" + (" (search truncated)" if self.truncated else "") + "."]
+        if self.compiled.health >= 0 and self.conditional:
+            lines.append("Minimum starting health: not computed (the scenario has conditions or expression effects).")
+        elif self.compiled.health >= 0:
+            lines.append("Minimum starting health to reach an ending: "
+                         + ("unreachable" if self.min_health is None else _format_number(self.min_health)))
+        if self.truncated:
+            lines.append(f"Endings found before the state limit ({len(self.endings)}); "
+                         "routes are not necessarily the shortest or safest:")
+        else:
+            lines.append(f"Reachable endings ({len(self.endings)}):")
+        for s in list(self.endings)[:limit]:
+            info = self.endings[s]
+            if self.truncated:
+                lines.append(f"  '{names[s]}': {info['route'].format()}")
+                continue
+            shortest, safest = info["shortest"], info["safest"]
+            extra = f", needs health >= {_format_number(info['min_health'])}" if "min_health" in info else ""
+            lines.append(f"  '{names[s]}': {len(shortest.steps)} steps, "
+                         f"best health {_format_number(safest.health)}{extra}")
+            lines.append(f"    shortest: {shortest.format()}")
+            if safest is not shortest:
+                lines.append(f"    safest:   {safest.format()}")
+        if len(self.endings) > limit:
+            lines.append(f"  ... and {len(self.endings) - limit} more")
+        if self.truncated:
+            lines.append("Endings that cannot be reached alive: unknown (search truncated).")
+        for title, items in (("Endings that cannot be reached alive", [f"'{names[s]}'" for s in self.blocked]),
+                             ("Choices that can kill", [f"'{names[s]}' choice #{i}" for s, i in self.deaths])):
+            if items:
+                lines.append(f"{title} ({len(items)}):")
+                lines.extend(f"  {item}" for item in items[:limit])
+                if len(items) > limit:
+                    lines.append(f"  ... and {len(items) - limit} more")
+        return "\n".join(lines)
+
+
+class Route:
+    """Маршрут від стартової сцени: кроки (сцена, номер вибору) і стан у кінці.
+
+    `loops` — діапазони кроків [від, до), які можна повторювати, щоб набрати здоров'я.
+    """
+
+    def __init__(self, compiled, steps, health, loops=()):
+        self.compiled = compiled
+        self.steps = steps
+        self.health = health
+        self.loops = list(loops)
+
+    def character(self):
+        """Характеристики після проходження маршруту (цикли — один раз)."""
+        compiled = self.compiled
+        attrs = list(compiled.initial)
+        for s, i in self.steps:
+            compiled.apply(compiled.offsets[s] + i, attrs)
+        return dict(zip(compiled.attr_names, attrs))
+
+    def to_dict(self):
+        compiled = self.compiled
+        return {
+            "steps": [{"scene": compiled.scene_names[s], "choice": i,
+                       "text": compiled.choice_texts[compiled.offsets[s] + i]} for s, i in self.steps],
+            "health": _number(self.health),
+            "loops": [{"from": a, "to": b} for a, b in self.loops],
+            "character": self.character(),
+        }
+
+    def format(self, limit=12):
+        names = self.compiled.scene_names
+        parts = [f"{names[s]}#{i}" for s, i in self.steps[:limit]]
+        if len(self.steps) > limit:
+            parts.append(f"... ({len(self.steps) - limit} more)")
+        text = " -> ".join(parts) if parts else "(start)"
+        if self.loops:
+            text += " [repeatable loop]"
+        return text
+
+
+def _number(value):
+    """Число для JSON: "inf" — необмежене здоров'я, "any" — підходить будь-яке."""
+    if value == INF:
+        return "inf"
+    return "any" if value == -INF else value
+
+
+def _format_number(value):
+    return "any" if value == -INF else ("unbounded" if value == INF else str(value))
+
+
+def health_deltas(compiled):
+    """Зміна здоров'я для кожного вибору."""
+    h = compiled.health
+    if h < 0:
+        return [0] * compiled.choice_count
+    return [sum(value for a, value in items if a == h) for items in compiled.effect_items]
+
+
+@tracing.traced("solver.search")
+def search(compiled, max_states=MAX_STATES):
+    """Пошук у ширину по станах (сцена, здоров'я) з домінуванням.
+
+    Повертає словник з таблицями станів і знайденими фіналами та смертями.
+    """
+    n = compiled.scene_count
+    offsets, targets = compiled.offsets, compiled.targets
+    h_index = compiled.health
+    delta = health_deltas(compiled)
+
+    # Стани в паралельних списках: сцена, здоров'я, батьківський стан, вибір у батьківській сцені
+    st_scene = [0]
+    st_health = [compiled.initial[h_index] if h_index >= 0 else INF]
+    st_parent = [-1]
+    st_choice = [-1]
+    pumps = {}  # стан → стан-предок у тій самій сцені, з якого починається цикл підсилення
+    best = [-INF] * n
+    best[0] = st_health[0]
+
+    endings = {}  # сцена → [найкоротший кінець, найбезпечніший кінець]; кінець — (стан, вибір або -1, здоров'я)
+    deaths = {}
+    truncated = False
+
+    def reach_end(s, end):
+        found = endings.get(s)
+        if found is None:
+            endings[s] = [end, end]
+        elif end[2] > found[1][2]:
+            found[1] = end
+
+    k = 0
+    while k < len(st_scene):
+        s, h = st_scene[k], st_health[k]
+        lo, hi = offsets[s], offsets[s + 1]
+        if lo == hi:
+            reach_end(s, (k, -1, h))
+        for e in range(lo, hi):
+            h2 = h + delta[e]
+            if h2 <= 0:
+                deaths.setdefault((s, e - lo), k)
+                continue
+            t = targets[e]
+            if t < 0:
+                reach_end(s, (k, e - lo, h2))
+                continue
+            if h2 <= best[t]:
+                continue  # Домінований стан: тут уже були з не меншим здоров'ям
+            if len(st_scene) >= max_states:
+                truncated = True
+                break
+            if best[t] > -INF and h2 < INF:
+                # Повернення в сцену на власній гілці з більшим здоров'ям — цикл можна повторювати
+                a = k
+                while a >= 0:
+                    if st_scene[a] == t and st_health[a] < h2:
+                        pumps[len(st_scene)] = a
+                        h2 = INF
+                        break
+                    a = st_parent[a]
+            best[t] = h2
+            st_scene.append(t)
+            st_health.append(h2)
+            st_parent.append(k)
+            st_choice.append(e - lo)
+        if truncated:
+            break
+        k += 1
+
+    return {
+        "scene": st_scene, "health": st_health, "parent": st_parent, "choice": st_choice,
+        "pumps": pumps, "endings": endings, "deaths": deaths, "truncated": truncated,
+    }
+
+
+def _relevant(compiled):
+    """Характеристики, від яких залежить перебіг гри: здоров'я і все, що читають вирази."""
+    relevant = {compiled.health} if compiled.health >= 0 else set()
+    for expr in compiled.conditions.values():
+        relevant.update(expr.indices)
+    for assigned in compiled.assignments.values():
+        for _, expr in assigned:
+            relevant.update(expr.indices)
+    return sorted(relevant)
+
+
+def _signs(compiled, relevant):
+    """Для кожної з `relevant`: 1 — більше значення ніде не шкодить, -1 — менше, 0 — важливе точне.
+
+    Так буває, коли ефекти-вирази характеристику не читають, а кожна умова від її росту лише
+    виграє (`gold >= 5`) чи лише програє (`alarm < 3`). Для здоров'я можливе лише 1: менше
+    здоров'я наближає смерть.
+    """
+    assigned = {a for items in compiled.assignments.values() for _, expr in items for a in expr.indices}
+    signs = {}
+    for a in relevant:
+        directions = {expr.direction(a) for expr in compiled.conditions.values() if a in expr.indices}
+        if a in assigned:
+            signs[a] = 0
+        elif directions <= {0, 1}:
+            signs[a] = 1
+        elif directions <= {0, -1} and a != compiled.health:
+            signs[a] = -1
+        else:
+            signs[a] = 0
+    return signs
+
+
+def _bounds(compiled, tracked):
+    """Межі, за якими значення характеристики вже не впливає на перебіг гри.
+
+    Якщо характеристику лише порівнюють зі сталими, вирази її не читають і не присвоюють, а
+    ефекти тільки збільшують її, то всі значення, більші за найбільшу сталу, однаково проходять
+    кожну умову: у ключі стану вони зливаються в одне (так само знизу для тих, що лише зменшуються).
+    Повертає для кожної з `tracked` пару (нижня, верхня межа); ±INF — межі немає.
+    """
+    constants = {a: [] for a in tracked}
+    for expr in compiled.conditions.values():
+        for a, values in expr.thresholds().items():
+            if constants.get(a) is not None:
+                constants[a] = None if values is None else constants[a] + values
+    for assigned in compiled.assignments.values():
+        for a, expr in assigned:
+            constants[a] = None
+            for b in expr.indices:
+                constants[b] = None
+    constants[compiled.health] = None  # Здоров'я вирішує смерть і показується в маршрутах: лише точне
+    rises, falls = set(), set()
+    for items in compiled.effect_items:
+        for a, value in items:
+            (rises if value > 0 else falls).add(a)
+    bounds = []
+    for a in tracked:
+        values = constants[a]
+        if not values or a in rises and a in falls:
+            bounds.append((-INF, INF))
+            continue
+        bounds.append((-INF if a in rises else min(values) - 1, INF if a in falls else max(values) + 1))
+    return bounds
+
+
+def _pump_limits(compiled, tracked):
+    """Для кожної з `tracked` (словник) — діапазон сталих виразів, що її читають (для здоров'я — і нуль).
+
+    Цикл робить таку характеристику необмеженою, лише коли вона вже вийшла за цей діапазон: поки
+    значення між сталими, кожне з них може відкрити іншу умову, тож їх перебираємо точно.
+    """
+    constants = {a: [] for a in tracked}
+    if compiled.health in constants:
+        constants[compiled.health].append(0)
+    expressions = list(compiled.conditions.values())
+    expressions.extend(expr for assigned in compiled.assignments.values() for _, expr in assigned)
+    for expr in expressions:
+        values = expr.constants
+        for a in expr.indices:
+            if a in constants:
+                constants[a].extend(values)
+    return {a: (min(values, default=INF), max(values, default=-INF)) for a, values in constants.items()}
+
+
+@tracing.traced("solver.search_states")
+def search_states(compiled, max_states=MAX_STATES):
+    """Пошук у ширину по станах (сцена, значущі характеристики) для сценаріїв з умовами.
+
+    Стан скорочується так само, як у `search`, але для кількох характеристик:
+
+    * ті, більше (чи менше) значення яких ніде не шкодить (`_signs`, зокрема зазвичай здоров'я),
+      відсіюються домінуванням: для ключа стану зберігаються лише непорівнянні набори їхніх
+      значень, а цикл, що повертає в ту саму сцену з не гіршими значеннями й кращим хоча б одним,
+      робить покращені необмеженими (±INF);
+    * решта входить у ключ стану; ті, що лише порівнюються зі сталими й змінюються в один бік,
+      обрізаються межами `_bounds`, а інші стають необмеженими, коли цикл виводить їх за сталі
+      виразів і це коло можна пройти ще раз з тим самим напрямком змін.
+
+    Тому пошук завершується й на циклах набору. Повертає словник того самого вигляду, що й `search`.
+    """
+    offsets, targets = compiled.offsets, compiled.targets
+    h_index = compiled.health
+    relevant = _relevant(compiled)
+    signs = _signs(compiled, relevant)
+    ordered = [a for a in relevant if signs[a]]
+    tracked = [a for a in relevant if not signs[a]]
+    bounds = _bounds(compiled, tracked)
+    exact = [i for i, (low, high) in enumerate(bounds) if low == -INF and high == INF]
+    limits = _pump_limits(compiled, relevant)
+
+    def key_of(attrs):
+        key = []
+        for a, (low, high) in zip(tracked, bounds):
+            value = attrs[a]
+            key.append(low if value < low else high if value > high else value)
+        return tuple(key)
+
+    def rank_of(attrs):
+        """Значення характеристик з домінуванням; більше — краще."""
+        return tuple(attrs[a] * signs[a] for a in ordered)
+
+    st_scene = [0]
+    st_attrs = [list(compiled.initial)]
+    st_key = [key_of(st_attrs[0])]
+    st_rank = [rank_of(st_attrs[0])]
+    st_health = [compiled.initial[h_index] if h_index >= 0 else INF]
+    st_parent = [-1]
+    st_choice = [-1]
+    seen = {(0, st_key[0]): [st_rank[0]]}  # (сцена, ключ) → непорівнянні набори значень з домінуванням
+    visited = {0}  # Сцени, у яких уже є стани: лише там можливе повернення циклом
+    pumps = {}
+    endings = {}
+    deaths = {}
+    truncated = False
+
+    def reach_end(s, end):
+        found = endings.get(s)
+        if found is None:
+            endings[s] = [end, end]
+        elif end[2] > found[1][2]:
+            found[1] = end
+
+    def dominated(t, key, rank):
+        front = seen.get((t, key))
+        return front is not None and any(all(x >= y for x, y in zip(other, rank)) for other in front)
+
+    def pumped(attrs2, changes):
+        """Чи вийшли змінені на колі характеристики за сталі виразів; здоров'я має лише зрости
+        (коло, що його забирає, рано чи пізно вбиває)."""
+        return all(attrs2[attr] > limits[attr][1] if rising else attr != h_index and attrs2[attr] < limits[attr][0]
+                   for attr, rising in changes)
+
+    def pump(k, edge, t, attrs2, key, rank):
+        """Предок у сцені `t` на гілці стану `k`, від якого коло можна повторювати, або -1.
+
+        Змінені на колі характеристики в `attrs2` стають ±INF. Обрізані межами мають лишитися
+        незмінними, а з домінуванням — не погіршитися.
+        """
+        loop = [edge]
+        a = k
+        while a >= 0:
+            if (st_scene[a] == t and all(x >= y for x, y in zip(rank, st_rank[a]))
+                    and all(key[i] == st_key[a][i] or i in exact for i in range(len(key)))):
+                changes = [(attr, signs[attr] > 0) for attr, x, y in zip(ordered, rank, st_rank[a]) if x > y]
+                changes.extend((tracked[i], key[i] > st_key[a][i]) for i in exact if key[i] != st_key[a][i])
+                if changes and pumped(attrs2, changes) and _repeats(compiled, loop[::-1], attrs2, changes):
+                    for attr, rising in changes:
+                        attrs2[attr] = INF if rising else -INF
+                    return a
+            if st_parent[a] >= 0:
+                loop.append(offsets[st_scene[st_parent[a]]] + st_choice[a])
+            a = st_parent[a]
+        return -1
+
+    k = 0
+    while k < len(st_scene):
+        s, attrs, h = st_scene[k], st_attrs[k], st_health[k]
+        lo, hi = offsets[s], offsets[s + 1]
+        if lo == hi or compiled.is_stuck(s, attrs):
+            reach_end(s, (k, -1, h))
+        for e, ok in enumerate(compiled.available(s, attrs), start=lo):
+            if not ok:
+                continue
+            attrs2 = list(attrs)
+            compiled.apply(e, attrs2)
+            h2 = attrs2[h_index] if h_index >= 0 else INF
+            if h2 <= 0:
+                deaths.setdefault((s, e - lo), k)
+                continue
+            t = targets[e]
+            if t < 0:
+                reach_end(s, (k, e - lo, h2))
+                continue
+            key, rank = key_of(attrs2), rank_of(attrs2)
+            if dominated(t, key, rank):
+                continue  # Тут уже були з тим самим ключем і не гіршими значеннями
+            if len(st_scene) >= max_states:
+                truncated = True
+                break
+            if t in visited:
+                origin = pump(k, e, t, attrs2, key, rank)
+                if origin >= 0:
+                    key, rank = key_of(attrs2), rank_of(attrs2)
+                    h2 = attrs2[h_index] if h_index >= 0 else INF
+                    if dominated(t, key, rank):
+                        continue
+                    pumps[len(st_scene)] = origin
+            front = seen.setdefault((t, key), [])
+            front[:] = [other for other in front if not all(x >= y for x, y in zip(rank, other))]
+            front.append(rank)
+            visited.add(t)
+            st_scene.append(t)
+            st_attrs.append(attrs2)
+            st_key.append(key)
+            st_rank.append(rank)
+            st_health.append(h2)
+            st_parent.append(k)
+            st_choice.append(e - lo)
+        if truncated:
+            break
+        k += 1
+
+    return {
+        "scene": st_scene, "health": st_health, "parent": st_parent, "choice": st_choice,
+        "pumps": pumps, "endings": endings, "deaths": deaths, "truncated": truncated,
+    }
+
+
+def _repeats(compiled, loop, attrs, changes):
+    """Чи можна з `attrs` ще раз пройти коло `loop` (номери виборів по порядку) живим і з тими
+    самими напрямками змін `changes` — пар (характеристика, чи зростає)."""
+    current = list(attrs)
+    h_index = compiled.health
+    for edge in loop:
+        condition = compiled.conditions.get(edge)
+        if condition is not None and not condition(current):
+            return False
+        compiled.apply(edge, current)
+        if h_index >= 0 and current[h_index] <= 0:
+            return False
+    return all(current[a] > attrs[a] if rising else current[a] < attrs[a] for a, rising in changes)
+
+
+def _route(compiled, result, end):
+    """Відновлює маршрут за батьківськими посиланнями станів."""
+    state, choice, health = end
+    scene, parent, choices, pumps = result["scene"], result["parent"], result["choice"], result["pumps"]
+    chain = []
+    k = state
+    while k >= 0:
+        chain.append(k)
+        k = parent[k]
+    chain.reverse()
+    position = {k: i for i, k in enumerate(chain)}
+    steps = [(scene[parent[k]], choices[k]) for k in chain[1:]]
+    if choice >= 0:
+        steps.append((scene[state], choice))
+    loops = [(position[pumps[k]], position[k]) for k in chain if k in pumps and pumps[k] in position]
+    return Route(compiled, steps, health, loops)
+
+
+def _incoming(compiled):
+    """Зворотна CSR-таблиця вхідних виборів: для сцени t — номери ребер, що ведуть у t."""
+    n = compiled.scene_count
+    targets = compiled.targets
+    rev_offsets = [0] * (n + 1)
+    for t in targets:
+        if t >= 0:
+            rev_offsets[t + 1] += 1
+    for s in range(n):
+        rev_offsets[s + 1] += rev_offsets[s]
+    fill = rev_offsets[:-1]
+    edges = [0] * rev_offsets[n]
+    for e, t in enumerate(targets):
+        if t >= 0:
+            edges[fill[t]] = e
+            fill[t] += 1
+    return rev_offsets, edges
+
+
+def _sources(offsets):
+    sources = []
+    for s in range(len(offsets) - 1):
+        sources.extend([s] * (offsets[s + 1] - offsets[s]))
+    return sources
+
+
+@tracing.traced("solver.required_health")
+def required_health(tables, goals):
+    """Найменше здоров'я в кожній сцені, з яким можна живим дійти до однієї з `goals` (SPFA).
+
+    `tables` — (offsets, targets, delta, rev_offsets, rev_edges, sources). Для переходу
+    s → t зі зміною d потрібно h + d >= 1 і h + d >= req[t], тобто h >= max(1, req[t]) - d.
+    Цикли, що додають здоров'я, лише знижують вимоги; щоб не спускатися по них крок за кроком,
+    знайдений цикл підсилення одразу отримує свою межу — здоров'я, потрібне на одне коло.
+    """
+    offsets, targets, delta, rev_offsets, rev_edges, sources = tables
+    n = len(offsets) - 1
+    req = [INF] * n
+    pred = [-1] * n  # Вибір, через який отримано поточну вимогу сцени
+    updates = [0] * n
+    queue = deque()
+    queued = bytearray(n)
+
+    def push(s):
+        if not queued[s]:
+            queued[s] = 1
+            queue.append(s)
+
+    for s in goals:
+        lo, hi = offsets[s], offsets[s + 1]
+        if lo == hi:
+            req[s] = -INF  # Фінальна сцена: потрапивши сюди, гру вже завершено
+        else:
+            # Фінал через вибір без наступної сцени
+            req[s] = min(req[s], min((1 - delta[e] for e in range(lo, hi) if targets[e] < 0), default=INF))
+        if req[s] < INF:
+            push(s)
+    while queue:
+        t = queue.popleft()
+        queued[t] = 0
+        need = max(1, req[t])
+        for r in range(rev_offsets[t], rev_offsets[t + 1]):
+            e = rev_edges[r]
+            s = sources[e]
+            value = need - delta[e]
+            if value < req[s]:
+                req[s] = value
+                pred[s] = e
+                push(s)
+                updates[s] += 1
+                if updates[s] > n:
+                    updates[s] = 0
+                    for u, floor in _pump_floors(s, pred, targets, sources, delta, n):
+                        if floor < req[u]:
+                            req[u] = floor
+                            updates[u] = 0
+                            push(u)
+    return req
+
+
+def _pump_floors(s, pred, targets, sources, delta, n):
+    """Цикл у ланцюжку `pred` від сцени `s` і вимога до кожної його сцени на одне коло.
+
+    Після кола здоров'я більше, ніж на початку, тож далі вистачить того самого: вимога —
+    1 - найменша префіксна сума змін здоров'я вздовж кола.
+    """
+    v = s
+    for _ in range(n):
+        if pred[v] < 0:
+            return []
+        v = targets[pred[v]]
+    cycle = []
+    u = v
+    while True:
+        if pred[u] < 0:
+            return []
+        cycle.append(pred[u])
+        u = targets[pred[u]]
+        if u == v or len(cycle) > n:
+            break
+    if u != v or sum(delta[e] for e in cycle) <= 0:
+        return []
+    length = len(cycle)
+    prefix = [0]
+    for e in cycle + cycle:
+        prefix.append(prefix[-1] + delta[e])
+    floors = []
+    window = deque()  # Індекси префіксів з монотонно зростаючими значеннями (мінімум у ковзному вікні)
+    for j in range(2 * length, 0, -1):
+        while window and prefix[window[-1]] >= prefix[j]:
+            window.pop()
+        window.append(j)
+        if j <= length:
+            while window[0] > j + length - 1:
+                window.popleft()
+            i = j - 1  # Коло починається вибором cycle[i] зі сцени sources[cycle[i]]
+            floors.append((sources[cycle[i]], 1 - (prefix[window[0]] - prefix[i])))
+    return floors
+
+
+_TABLES = None
+
+
+def _init_worker(tables):
+    global _TABLES
+    _TABLES = tables
+
+
+def _min_start(goal):
+    return goal, required_health(_TABLES, [goal])[0]
+
+
+def solve(compiled, max_states=MAX_STATES, jobs=1, per_ending=True):
+    """Розв'язує сценарій і повертає `SolverReport`."""
+    report = SolverReport(compiled)
+    n = compiled.scene_count
+    if not n:
+        return report
+
+    result = (search_states if compiled.has_logic else search)(compiled, max_states)
+    report.states = len(result["scene"])
+    report.truncated = result["truncated"]
+    for s, (shortest, safest) in result["endings"].items():
+        if report.truncated:
+            # Обірваний пошук не знає, чи маршрут найкоротший чи найбезпечніший: лише що фінал досяжний
+            report.endings[s] = {"route": _route(compiled, result, shortest)}
+            continue
+        shortest_route = _route(compiled, result, shortest)
+        safest_route = shortest_route if safest is shortest else _route(compiled, result, safest)
+        report.endings[s] = {"shortest": shortest_route, "safest": safest_route}
+    report.deaths = sorted(result["deaths"])
+    if not report.truncated:  # Інакше недосяжність не доведено
+        report.blocked = [s for s in range(n) if compiled.is_ending(s) and s not in report.endings]
+
+    if compiled.health < 0 or compiled.has_logic or report.truncated:
+        return report
+    offsets, targets = list(compiled.offsets), list(compiled.targets)
+    rev_offsets, rev_edges = _incoming(compiled)
+    tables = (offsets, targets, health_deltas(compiled), rev_offsets, rev_edges, _sources(offsets))
+
+    goals = [s for s in range(n) if offsets[s] == offsets[s + 1] or
+             any(targets[e] < 0 for e in range(offsets[s], offsets[s + 1]))]
+    start = required_health(tables, goals)[0]
+    report.min_health = None if start == INF else start
+
+    if per_ending and report.endings:
+        endings = list(report.endings)
+        if jobs > 1 and len(endings) > 1:
+            with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(tables,)) as pool:
+                needs = list(pool.map(_min_start, endings, chunksize=max(1, len(endings) // (jobs * 4))))
+        else:
+            _init_worker(tables)
+            needs = [_min_start(s) for s in endings]
+        for s, need in needs:
+            report.endings[s]["min_health"] = need
+    return report
+
+
+def solve_data(data, **kwargs):
+    """Компілює та розв'язує завантажений сценарій."""
+    return solve(compile_scenario(data), **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exhaustive state-space solver for scenario endings.")
+    parser.add_argument("scenario", help="JSON or .istb scenario")
+    parser.add_argument("--json", action="store_true", help="print machine-readable report")
+    parser.add_argument("--jobs", type=int, default=1, help="worker processes for per-ending searches")
+    parser.add_argument("--max-states", type=int, default=MAX_STATES, help="state limit for the forward search")
+    parser.add_argument("--no-per-ending", action="store_true", help="skip minimum health per ending")
+    parser.add_argument("--limit", type=int, default=20, help="items shown per section")
+    parser.add_argument("--trace", metavar="FILE", help="write a Chrome trace and print a timing summary")
+    args = parser.parse_args()
+    if args.trace:
+        tracing.enable(args.trace)
+
+    report = solve_data(load_scenario_file(args.scenario, lazy=True), max_states=args.max_states,
+                        jobs=args.jobs, per_ending=not args.no_per_ending)
+    if args.json:
+        print(json.dumps(report.to_dict(), ensure_ascii=False, indent=4))
+    else:
+        print(report.format(args.limit))
+    sys.exit(1 if report.truncated else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Збереження сценарію без блокування інтерфейсу: повний запис у фоновому потоці та журнал змін.
+
+Журнал `<сценарій>.journal` — рядки JSON, що лише дописуються в кінець:
+    {"op": "scene", "name": ..., "scene": {...}}    — сцену додано або змінено
+    {"op": "delete", "name": ...}                   — сцену видалено
+    {"op": "character", "character": {...}}         — змінено характеристики
+    {"op": "order", "names": [...]}                 — новий порядок сцен (скасоване видалення тощо)
+Автозбереження дописує в журнал лише змінені сцени; явне збереження записує повний файл
+і очищає журнал. Після збою журнал програється поверх останнього повного файлу.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from scenario_binary import save_scenario_file
+from scenario_texts import unpack_scenario
+from tracing import traced
+
+
+class ChangeJournal:
+    """Журнал змін поруч зі сценарієм (`story.json.journal` для `story.json`)."""
+
+    def __init__(self, scenario_path):
+        self.path = os.fspath(scenario_path) + ".journal"
+
+    def exists(self):
+        return os.path.exists(self.path) and os.path.getsize(self.path) > 0
+
+    @traced("store.journal_append")
+    def append(self, character, scenes, order=None):
+        """Дописує пакет змін одним записом і скидає його на диск."""
+        lines = []
+        if character is not None:
+            lines.append({"op": "character", "character": character})
+        for name, scene in scenes.items():
+            if scene is None:
+                lines.append({"op": "delete", "name": name})
+            else:
+                lines.append({"op": "scene", "name": name, "scene": scene})
+        if order is not None:
+            lines.append({"op": "order", "names": order})
+        if not lines:
+            return
+        # Стиснені тексти (TextRef) записуються звичайними рядками
+        payload = "".join(json.dumps(line, ensure_ascii=False, default=str) + "\n" for line in lines)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @traced("store.journal_replay")
+    def replay(self, data):
+        """Застосовує журнал до завантаженого сценарію на місці; повертає кількість операцій.
+
+        Недописаний останній рядок (збій під час запису) відкидається й обрізається з файлу,
+        щоб нові записи не опинилися за ним.
+        """
+        count = 0
+        with open(self.path, "rb+") as f:
+            while True:
+                start = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete journal record")
+                    op = json.loads(line.decode("utf-8"))
+                except ValueError:
+                    f.truncate(start)
+                    break
+                kind = op.get("op")
+                if kind == "scene":
+                    data["scenes"][op["name"]] = op["scene"]
+                elif kind == "delete":
+                    data["scenes"].pop(op["name"], None)
+                elif kind == "character":
+                    data["character"] = op["character"]
+                elif kind == "order":
+                    scenes = data["scenes"]
+                    ordered = {name: scenes[name] for name in op["names"] if name in scenes}
+                    ordered.update(scenes)  # Сцени, яких немає в записі, лишаються в кінці
+                    scenes.clear()
+                    scenes.update(ordered)
+                else:
+                    continue
+                count += 1
+        return count
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class ScenarioStore:
+    """Черга записів на диск в одному фоновому потоці.
+
+    Повні збереження й дописування журналу виконуються строго в порядку виклику, тож
+    очищення журналу після повного запису не зачіпає змін, зроблених пізніше.
+    Методи повертають `Future`; дані мають бути знімком, який ніхто не змінює.
+    """
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scenario-store")
+
+    def save(self, snapshot, path, write=None):
+        """Атомарно записує повний файл і очищає журнал.
+
+        `write(snapshot)` замінює звичайний запис у `path` (напр. збереження розділів маніфесту);
+        журнал і тоді лежить поруч із `path`.
+        """
+        return self.executor.submit(self._save, snapshot, path, write)
+
+    @staticmethod
+    def _save(snapshot, path, write):
+        snapshot = unpack_scenario(snapshot)
+        if write is None:
+            save_scenario_file(snapshot, path)
+        else:
+            write(snapshot)
+        ChangeJournal(path).clear()
+        return path
+
+    def journal(self, path, character, scenes, order=None):
+        """Дописує зміни в журнал сценарію."""
+        return self.executor.submit(ChangeJournal(path).append, character, scenes, order)
+
+    def discard_journal(self, path):
+        """Видаляє журнал сценарію після вже поставлених у чергу записів."""
+        return self.executor.submit(ChangeJournal(path).clear)
+
+    def wait(self):
+        """Чекає, доки виконаються всі поставлені в чергу записи."""
+        self.executor.submit(lambda: None).result()
+
+    def close(self):
+        """Чекає завершення всіх записів."""
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,309 @@
+"""Стиснене сховище текстів сцен і виборів.
+
+Однакові тексти зберігаються один раз. Короткі («Піти ліворуч») лишаються звичайними
+інтернованими рядками, довші дописуються в потік, що стискається блоками zlib зі спільним
+словником (preset dictionary), навченим на самих текстах. Блок розпаковується лише тоді,
+коли його текст справді потрібен, і тримається в невеликому LRU-кеші.
+"""
+import hashlib
+import threading
+import zlib
+from array import array
+from collections import Counter, OrderedDict
+from collections.abc import Sequence
+
+BLOCK_SIZE = 16384  # Байтів нестиснених текстів в одному блоці
+DICT_SIZE = 16384  # Разом з блоком уміщується у 32-кілобайтне вікно zlib
+MIN_COMPRESSED = 16  # Коротші тексти (у байтах UTF-8) не стискаються
+MIN_REF = 96  # У словниках сцен коротші тексти дешевше тримати спільними рядками, ніж через TextRef
+CACHE_BLOCKS = 16
+DICT_SAMPLE = 2000  # Скільки текстів переглядати під час навчання словника
+FILE_LEVEL = 6  # Рівень zlib для файлів
+MEMORY_LEVEL = 3  # Рівень zlib під час завантаження: майже той самий виграш утричі швидше
+
+
+def train_dictionary(texts, size=DICT_SIZE, sample=DICT_SAMPLE):
+    """Словник для zlib з фрагментів, що найчастіше повторюються в текстах.
+
+    Кандидати — цілі речення та трійки слів; беруться ті, що трапляються хоча б двічі,
+    за виграшем «кількість × довжина». Найцінніші стоять у кінці: zlib кодує близькі
+    збіги коротше.
+    """
+    counts = Counter()
+    for i, text in enumerate(texts):
+        if i >= sample:
+            break
+        for sentence in text.split(". "):
+            counts[sentence.strip()] += 1
+            words = sentence.split()
+            for j in range(len(words) - 2):
+                counts[" ".join(words[j:j + 3])] += 1
+    chosen = []
+    total = 0
+    for fragment, count in sorted(counts.items(), key=lambda item: item[1] * len(item[0]), reverse=True):
+        if count < 2 or not fragment:
+            continue
+        encoded = fragment.encode("utf-8") + b" "
+        if total + len(encoded) > size:
+            continue
+        chosen.append(encoded)
+        total += len(encoded)
+    return b"".join(reversed(chosen))
+
+
+def compress_block(data, zdict, level=FILE_LEVEL):
+    compressor = zlib.compressobj(level, zdict=zdict) if zdict else zlib.compressobj(level)
+    return compressor.compress(data) + compressor.flush()
+
+
+class BlockCache:
+    """LRU розпакованих блоків поверх довільного джерела стиснених блоків.
+
+    `read_block(i)` повертає стиснений блок `i`; усі блоки, крім останнього, мають рівно
+    `block_size` розпакованих байтів, тож діапазон потоку відображається на блоки арифметикою.
+    """
+
+    def __init__(self, read_block, zdict, block_size=BLOCK_SIZE, capacity=CACHE_BLOCKS):
+        self.read_block = read_block
+        self.zdict = zdict
+        self.block_size = block_size
+        self.capacity = capacity
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def block(self, i):
+        with self._lock:
+            data = self._blocks.get(i)
+            if data is not None:
+                self._blocks.move_to_end(i)
+                return data
+        decompressor = zlib.decompressobj(zdict=self.zdict) if self.zdict else zlib.decompressobj()
+        data = decompressor.decompress(self.read_block(i))
+        with self._lock:
+            self._blocks[i] = data
+            if len(self._blocks) > self.capacity:
+                self._blocks.popitem(last=False)
+        return data
+
+    def read(self, start, end):
+        """Байти `start:end` розпакованого потоку."""
+        size = self.block_size
+        first, last = start // size, (end - 1) // size
+        if first == last:
+            return self.block(first)[start - first * size:end - first * size]
+        parts = [self.block(first)[start - first * size:]]
+        parts.extend(self.block(i) for i in range(first + 1, last))
+        parts.append(self.block(last)[:end - last * size])
+        return b"".join(parts)
+
+    def clear(self):
+        with self._lock:
+            self._blocks.clear()
+
+
+class TextStore:
+    """Сховище текстів з номерами: від'ємні — короткі рядки, невід'ємні — стиснені тексти.
+
+    Після `freeze()` допис закінчується: останній неповний блок стискається, а індекси
+    для пошуку дублікатів звільняються.
+    """
+
+    def __init__(self, zdict=b"", block_size=BLOCK_SIZE, min_length=MIN_COMPRESSED, cache_blocks=CACHE_BLOCKS,
+                 level=MEMORY_LEVEL):
+        self.zdict = zdict
+        self.block_size = block_size
+        self.level = level
+        self.min_length = min_length
+        self._short = []
+        self._short_ids = {}
+        self._starts = array("Q")
+        self._ends = array("Q")
+        self._digests = {}  # blake2b тексту → номер; рядки як ключі тримали б увесь текст у пам'яті
+        self._blocks = []
+        self._pending = bytearray()
+        self._sealed = 0  # Скільки байтів потоку вже стиснено
+        self._cache = BlockCache(self._blocks.__getitem__, zdict, block_size, cache_blocks)
+        self.added = 0
+        self.raw_bytes = 0
+
+    def __len__(self):
+        return len(self._short) + len(self._starts)
+
+    @property
+    def frozen(self):
+        return self._digests is None
+
+    def add(self, text):
+        """Додає текст і повертає його номер; однаковий текст отримує той самий номер."""
+        if self._digests is None:
+            raise RuntimeError("The text store is frozen.")
+        data = text.encode("utf-8")
+        self.added += 1
+        self.raw_bytes += len(data)
+        if len(data) < self.min_length:
+            tid = self._short_ids.get(text)
+            if tid is None:
+                tid = self._short_ids[text] = -len(self._short) - 1
+                self._short.append(text)
+            return tid
+        key = hashlib.blake2b(data, digest_size=16).digest()
+        tid = self._digests.get(key)
+        if tid is None:
+            tid = self._digests[key] = len(self._starts)
+            start = self._sealed + len(self._pending)
+            self._starts.append(start)
+            self._ends.append(start + len(data))
+            self._pending += data
+            while len(self._pending) >= self.block_size:
+                self._seal(self.block_size)
+        return tid
+
+    def _seal(self, size):
+        self._blocks.append(compress_block(bytes(self._pending[:size]), self.zdict, self.level))
+        del self._pending[:size]
+        self._sealed += size
+
+    def freeze(self):
+        if self._digests is None:
+            return
+        if self._pending:
+            self._seal(len(self._pending))
+        self._pending = bytearray()
+        self._digests = None
+        self._short_ids = None
+
+    def get(self, tid):
+        """Текст за номером; стиснений блок розпаковується через LRU-кеш."""
+        if tid < 0:
+            return self._short[-tid - 1]
+        start, end = self._starts[tid], self._ends[tid]
+        sealed = self._sealed
+        if end <= sealed:
+            data = self._cache.read(start, end)
+        elif start >= sealed:
+            data = self._pending[start - sealed:end - sealed]
+        else:
+            data = self._cache.read(start, sealed) + self._pending[:end - sealed]
+        return data.decode("utf-8")
+
+    def ref(self, text):
+        """Короткий текст — спільний рядок сховища, довгий — `TextRef` на стиснений запис."""
+        tid = self.add(text)
+        return self._short[-tid - 1] if tid < 0 else TextRef(self, tid)
+
+    def stats(self):
+        """Кількість і розміри: скільки було байтів тексту і скільки займає сховище."""
+        stored = (sum(len(block) for block in self._blocks) + len(self._pending) + len(self.zdict)
+                  + sum(len(text.encode("utf-8")) for text in self._short))
+        return {
+            "texts": self.added,
+            "unique": len(self),
+            "blocks": len(self._blocks),
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": stored,
+        }
+
+
+class TextRef:
+    """Посилання на стиснений текст; `str(ref)` розпаковує його."""
+    __slots__ = ("store", "id")
+
+    def __init__(self, store, tid):
+        self.store = store
+        self.id = tid
+
+    def __str__(self):
+        return self.store.get(self.id)
+
+    def __repr__(self):
+        return f"TextRef({self.id})"
+
+    def __eq__(self, other):
+        if isinstance(other, TextRef):
+            return self.store is other.store and self.id == other.id or str(self) == str(other)
+        if isinstance(other, str):
+            return str(self) == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(str(self))
+
+
+class TextColumn(Sequence):
+    """Послідовність текстів за номерами у сховищі (для `CompiledScenario.scene_texts`)."""
+
+    def __init__(self, store, ids):
+        self.store = store
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.store.get(tid) for tid in self.ids[index]]
+        return self.store.get(self.ids[index])
+
+
+def _texts(scenes):
+    for scene in scenes.values():
+        if isinstance(scene.get("text"), str):
+            yield scene["text"]
+        for choice in scene.get("choices", ()):
+            if isinstance(choice.get("text"), str):
+                yield choice["text"]
+
+
+def pack_scenario(data):
+    """Замінює тексти сцен і виборів сценарію на місці на спільні рядки або `TextRef`.
+
+    Повертає заморожене сховище. Для запису у файл `unpack_scenario` повертає звичайні рядки.
+    """
+    scenes = data["scenes"]
+    store = TextStore(train_dictionary(_texts(scenes)), min_length=MIN_REF)
+    for scene in scenes.values():
+        if isinstance(scene.get("text"), str):
+            scene["text"] = store.ref(scene["text"])
+        for choice in scene.get("choices", ()):
+            if isinstance(choice.get("text"), str):
+                choice["text"] = store.ref(choice["text"])
+    store.freeze()
+    return store
+
+
+def unpack_scene(scene):
+    """Копія сцени зі звичайними рядками (сама сцена не змінюється)."""
+    if not any(isinstance(value, TextRef) for value in _scene_texts(scene)):
+        return scene
+    scene = dict(scene)
+    if isinstance(scene.get("text"), TextRef):
+        scene["text"] = str(scene["text"])
+    if "choices" in scene:
+        scene["choices"] = [dict(choice, text=str(choice["text"])) if isinstance(choice.get("text"), TextRef)
+                            else choice for choice in scene["choices"]]
+    return scene
+
+
+def _scene_texts(scene):
+    yield scene.get("text")
+    for choice in scene.get("choices", ()):
+        yield choice.get("text")
+
+
+def unpack_scenario(data):
+    """Неглибока копія сценарію, у якій `TextRef` замінено на рядки."""
+    data = dict(data)
+    data["scenes"] = {name: unpack_scene(scene) for name, scene in data["scenes"].items()}
+    return data
+
+
+def compress_texts(compiled):
+    """Переносить тексти скомпільованого сценарію у стиснене сховище; повертає сховище.
+
+    Після цього вихідний словник сцен можна відпустити: рушій читає тексти зі сховища.
+    """
+    store = TextStore(train_dictionary(compiled.scene_texts))
+    compiled.scene_texts = TextColumn(store, array("l", map(store.add, compiled.scene_texts)))
+    compiled.choice_texts = TextColumn(store, array("l", map(store.add, compiled.choice_texts)))
+    store.freeze()
+    return store
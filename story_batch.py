@@ -0,0 +1,340 @@
+"""Пакетна перевірка, статистика й конвертація багатьох сценаріїв без вікон.
+
+    python story_batch.py validate content/ "stories/**/*.json" --jobs 8 --junit report.xml
+    python story_batch.py stats content/ --report stats.json
+    python story_batch.py convert content/ --to istb --output-dir build/
+
+Аргументи — файли, каталоги (рекурсивно: *.json, *.istb) або шаблони glob. Розділи, перелічені
+в маніфестах `*.chapters.json`, окремо не перевіряються: маніфест перевіряється як цілий сценарій.
+Файли обробляються пулом процесів. Результати кешуються за хешем вмісту (`--cache`), тож
+незмінені файли повторно не розбираються.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from scenario_analyzer import analyze, validate_scenario
+from scenario_binary import load_scenario_file, save_scenario_file
+from scenario_chapters import Manifest
+from scenario_engine import compile_scenario
+
+CACHE_FILE = ".story_batch_cache.json"
+CACHE_VERSION = 1
+EXTENSIONS = (".json", ".istb")
+MANIFEST_SUFFIX = ".chapters.json"
+SKIPPED_SUFFIXES = (".layout.json",)  # Кеші розкладки візуалізатора
+FORMATS = {"json": ".json", "istb": ".istb"}
+
+
+def find_files(patterns):
+    """Пари (файл, корінь) для аргументів командного рядка; корінь задає відносний шлях виводу.
+
+    Файли розділів, на які посилаються знайдені маніфести, пропускаються.
+    """
+    found = {}
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for directory, dirs, files in os.walk(pattern):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith(EXTENSIONS) and not name.endswith(SKIPPED_SUFFIXES):
+                        found.setdefault(os.path.join(directory, name), pattern)
+        elif os.path.isfile(pattern):
+            found.setdefault(pattern, os.path.dirname(pattern))
+        else:
+            for path in sorted(glob.glob(pattern, recursive=True)):
+                if os.path.isfile(path):
+                    found.setdefault(path, os.path.dirname(path))
+    chapters = set()
+    for path in found:
+        if path.endswith(MANIFEST_SUFFIX):
+            try:
+                manifest = Manifest(path)
+            except (OSError, ValueError):
+                continue  # Помилку маніфесту покаже його власна перевірка
+            chapters.update(os.path.abspath(manifest.chapter_path(c)) for c in range(len(manifest.chapters)))
+    return [(path, root) for path, root in found.items() if os.path.abspath(path) not in chapters]
+
+
+def content_hash(path):
+    """Хеш вмісту файлу; для маніфесту — разом з файлами його розділів."""
+    digest = hashlib.blake2b(digest_size=16)
+    paths = [path]
+    if path.endswith(MANIFEST_SUFFIX):
+        try:
+            manifest = Manifest(path)
+            paths += [manifest.chapter_path(c) for c in range(len(manifest.chapters))]
+        except (OSError, ValueError):
+            pass
+    for item in paths:
+        try:
+            with open(item, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        except OSError:
+            digest.update(b"missing:" + os.fsencode(item))
+    return digest.hexdigest()
+
+
+def scenario_stats(compiled):
+    """Кількості сцен і виборів, глибина (найдовший з найкоротших шляхів від старту) і фінали."""
+    n = compiled.scene_count
+    offsets, targets = compiled.offsets, compiled.targets
+    depth = [-1] * n
+    if n:
+        depth[0] = 0
+        queue = deque([0])
+        while queue:
+            s = queue.popleft()
+            for e in range(offsets[s], offsets[s + 1]):
+                t = targets[e]
+                if t >= 0 and depth[t] < 0:
+                    depth[t] = depth[s] + 1
+                    queue.append(t)
+    endings = [s for s in range(n) if compiled.is_ending(s)]
+    return {
+        "scenes": n,
+        "choices": compiled.choice_count,
+        "attributes": len(compiled.attr_names),
+        "endings": len(endings),
+        "reachable_scenes": sum(1 for d in depth if d >= 0),
+        "reachable_endings": sum(1 for s in endings if depth[s] >= 0),
+        "depth": max(depth, default=0),
+        "conditional": compiled.has_logic,
+    }
+
+
+def output_path(path, root, output_dir, extension):
+    """Шлях конвертованого файлу: структура каталогів відносно кореня аргументу зберігається."""
+    relative = os.path.relpath(path, root) if root else os.path.basename(path)
+    if relative.endswith(MANIFEST_SUFFIX):
+        relative = relative[:-len(MANIFEST_SUFFIX)] + ".json"  # Маніфест конвертується в цілий сценарій
+    return os.path.join(output_dir, os.path.splitext(relative)[0] + extension)
+
+
+def process_file(task):
+    """Обробляє один файл (у процесі пулу); повертає словник результату для звіту."""
+    path, root, options, cached = task
+    try:
+        digest = content_hash(path)
+    except OSError as error:
+        return {"path": path, "ok": False, "errors": [f"{type(error).__name__}: {error}"], "warnings": [],
+                "cached": False, "timings": {"total": 0.0}, "hash": None}
+    target = None
+    if options["command"] == "convert":
+        target = output_path(path, root, options["output_dir"], FORMATS[options["to"]])
+    if (cached is not None and cached.get("hash") == digest
+            and (target is None or cached["result"]["errors"] or os.path.exists(target))):
+        return dict(cached["result"], cached=True)
+
+    result = {"path": path, "ok": True, "errors": [], "warnings": [], "cached": False}
+    timings = result["timings"] = {}
+    start = time.perf_counter()
+    try:
+        data = load_scenario_file(path, lazy=True)
+        timings["load"] = time.perf_counter() - start
+
+        mark = time.perf_counter()
+        validate_scenario(data)
+        compiled = compile_scenario(data)
+        timings["compile"] = time.perf_counter() - mark
+
+        mark = time.perf_counter()
+        report = analyze(compiled)
+        timings["analyze"] = time.perf_counter() - mark
+        result["errors"] += [f"'{s}' choice #{i} -> missing scene '{name}'" for s, i, name in report.dangling]
+        result["errors"] += ["loop with no exit: " + " -> ".join(loop[:10]) + (" ..." if len(loop) > 10 else "")
+                             for loop in report.dead_loops]
+        result["warnings"] += [f"unreachable scene '{s}'" for s in report.unreachable]
+        result["warnings"] += [f"scene '{s}' cannot reach an ending" for s in report.no_ending]
+        result["warnings"] += [f"'{s}' choice #{i}: unknown effect attribute '{attr}'"
+                               for s, i, attr in report.unknown_attrs]
+        result["warnings"] += [f"'{s}' choice #{i}: division by zero in '{source}' (always gives 0)"
+                               for s, i, source in report.zero_divisions]
+        result["stats"] = scenario_stats(compiled)
+
+        if target is not None and not result["errors"]:  # Сценарій з помилками не конвертується
+            mark = time.perf_counter()
+            os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+            # Лінивий словник сцен (бінарний файл, розділи) для запису розгортається повністю
+            full = data if isinstance(data["scenes"], dict) else load_scenario_file(path)
+            save_scenario_file(full, target)
+            result["output"] = target
+            timings["convert"] = time.perf_counter() - mark
+    except json.JSONDecodeError as error:
+        result["errors"].append(f"invalid JSON: {error}")
+    except Exception as error:  # Будь-який збій одного файлу — його помилка, а не зупинка всього пакета
+        result["errors"].append(f"{type(error).__name__}: {error}")
+    timings["total"] = time.perf_counter() - start
+    result["ok"] = not result["errors"] and not (options["strict"] and result["warnings"])
+    result["hash"] = digest
+    return result
+
+
+class ResultCache:
+    """Кеш результатів за шляхом: хеш вмісту й результат для набору параметрів запуску."""
+
+    def __init__(self, path, signature):
+        self.path = path
+        self.signature = signature
+        self.entries = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    stored = json.load(f)
+                if stored.get("version") == CACHE_VERSION:
+                    self.entries = stored.get("entries", {})
+            except (OSError, ValueError):
+                self.entries = {}  # Пошкоджений кеш просто перебудовується
+
+    def get(self, path):
+        entry = self.entries.get(os.path.abspath(path))
+        return entry if entry is not None and entry.get("signature") == self.signature else None
+
+    def put(self, result):
+        self.entries[os.path.abspath(result["path"])] = {
+            "signature": self.signature, "hash": result["hash"],
+            "result": {key: value for key, value in result.items() if key != "cached"},
+        }
+
+    def save(self):
+        if not self.path:
+            return
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "entries": self.entries}, f)
+
+
+def run(files, options, jobs=1, cache=None, progress=None):
+    """Обробляє файли (пулом процесів, якщо `jobs` > 1) і повертає результати в порядку файлів."""
+    tasks = [(path, root, options, cache.get(path) if cache else None) for path, root in files]
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(jobs) as pool:
+            results = []
+            for result in pool.map(process_file, tasks, chunksize=max(1, len(tasks) // (jobs * 8))):
+                results.append(result)
+                if progress:
+                    progress(result)
+    else:
+        results = []
+        for task in tasks:
+            results.append(process_file(task))
+            if progress:
+                progress(results[-1])
+    if cache is not None:
+        for result in results:
+            if not result["cached"]:
+                cache.put(result)
+        cache.save()
+    return results
+
+
+def summarize(results, seconds):
+    return {
+        "files": len(results),
+        "failed": sum(1 for result in results if not result["ok"]),
+        "errors": sum(len(result["errors"]) for result in results),
+        "warnings": sum(len(result["warnings"]) for result in results),
+        "cached": sum(1 for result in results if result["cached"]),
+        "scenes": sum(result.get("stats", {}).get("scenes", 0) for result in results),
+        "seconds": round(seconds, 3),
+    }
+
+
+def write_junit(path, command, results, seconds):
+    """Звіт JUnit XML: кожен файл — testcase, помилки — failure (з --strict також попередження)."""
+    summary = summarize(results, seconds)
+    suites = ET.Element("testsuites")
+    suite = ET.SubElement(suites, "testsuite", name=f"story_batch.{command}", tests=str(summary["files"]),
+                          failures=str(summary["failed"]), errors="0", time=f"{seconds:.3f}")
+    for result in results:
+        directory, name = os.path.split(result["path"])
+        case = ET.SubElement(suite, "testcase", classname=directory.replace(os.sep, ".") or ".", name=name,
+                             time=f"{result.get('timings', {}).get('total', 0):.3f}")
+        if not result["ok"]:
+            problems = result["errors"] or result["warnings"]
+            failure = ET.SubElement(case, "failure", message=problems[0][:200],
+                                    type="error" if result["errors"] else "warning")
+            failure.text = "\n".join(problems)
+        elif result["warnings"]:
+            ET.SubElement(case, "system-out").text = "\n".join(result["warnings"])
+    ET.ElementTree(suites).write(path, encoding="utf-8", xml_declaration=True)
+
+
+def _line(result):
+    status = "ok" if result["ok"] else "FAIL"
+    details = []
+    stats = result.get("stats")
+    if stats:
+        details.append(f"{stats['scenes']} scenes, depth {stats['depth']}, "
+                       f"{stats['reachable_endings']}/{stats['endings']} endings reachable")
+    if result["errors"]:
+        details.append(f"{len(result['errors'])} errors")
+    if result["warnings"]:
+        details.append(f"{len(result['warnings'])} warnings")
+    if result["cached"]:
+        details.append("cached")
+    else:
+        details.append(f"{result['timings']['total'] * 1000:.0f} ms")
+    return f"{status:<4} {result['path']} ({', '.join(details)})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate, profile and convert many scenario files at once.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, text in (("validate", "check structure, references and reachability"),
+                       ("stats", "validate and print per-file statistics"),
+                       ("convert", "validate and write each scenario in another format")):
+        command = commands.add_parser(name, help=text)
+        command.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+        command.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="worker processes")
+        command.add_argument("--strict", action="store_true", help="fail on warnings as well as errors")
+        command.add_argument("--report", metavar="FILE", help="write a JSON report")
+        command.add_argument("--junit", metavar="FILE", help="write a JUnit XML report")
+        command.add_argument("--cache", default=CACHE_FILE, help="result cache file ('' disables it)")
+        command.add_argument("--quiet", action="store_true", help="print only failures and the summary")
+        if name == "convert":
+            command.add_argument("--to", choices=sorted(FORMATS), required=True, help="output format")
+            command.add_argument("--output-dir", required=True, help="where to write converted files")
+    args = parser.parse_args()
+
+    options = {"command": args.command, "strict": args.strict,
+               "to": getattr(args, "to", None), "output_dir": getattr(args, "output_dir", None)}
+    files = find_files(args.paths)
+    if not files:
+        print("No scenario files found.", file=sys.stderr)
+        sys.exit(2)
+    cache = ResultCache(args.cache, json.dumps(options, sort_keys=True)) if args.cache else None
+
+    def progress(result):
+        if not args.quiet or not result["ok"]:
+            print(_line(result))
+            if args.command == "stats" and result.get("stats") and not args.quiet:
+                print("     " + ", ".join(f"{key}={value}" for key, value in result["stats"].items()))
+            for problem in (result["errors"] + result["warnings"])[:5] if not result["ok"] else ():
+                print(f"     {problem}")
+
+    start = time.perf_counter()
+    results = run(files, options, max(1, args.jobs), cache, progress)
+    seconds = time.perf_counter() - start
+    summary = summarize(results, seconds)
+    print(f"{summary['files']} files, {summary['failed']} failed, {summary['errors']} errors, "
+          f"{summary['warnings']} warnings, {summary['cached']} cached, {summary['seconds']:.2f} s")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"command": args.command, "summary": summary, "files": results}, f,
+                      ensure_ascii=False, indent=4)
+    if args.junit:
+        write_junit(args.junit, args.command, results, seconds)
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
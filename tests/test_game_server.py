@@ -0,0 +1,42 @@
+"""Сервер ігрових партій: некоректні запити отримують помилку, застрягла партія завершується."""
+import asyncio
+
+import pytest
+
+from game_server import GameServer, SessionManager
+from scenario_engine import ENDED, Engine, compile_scenario
+
+SCENARIO = {"character": {"health": 10}, "scenes": {"start": {"text": "Кінець", "choices": []}}}
+
+
+async def exchange(request):
+    server = GameServer(SessionManager(compile_scenario(SCENARIO)))
+    port = await server.start(port=0)
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(request)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout=5)  # До закриття з'єднання сервером
+        writer.close()
+        return response
+    finally:
+        await server.close()
+
+
+@pytest.mark.parametrize("length", [b"abc", b"-5"])
+def test_invalid_content_length_gets_400_and_close(length):
+    response = asyncio.run(exchange(b"POST /sessions HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n{}"))
+    assert response.startswith(b"HTTP/1.1 400 Bad Request\r\n")
+    assert b"Connection: close" in response
+    assert b"Invalid Content-Length" in response
+
+
+def test_stuck_start_scene_ends_the_game():
+    scenario = {"character": {"health": 10, "gold": 0}, "scenes": {
+        "start": {"text": "Брама", "choices": [{"text": "Заплатити", "next_scene": "end", "requires": "gold >= 5"}]},
+        "end": {"text": "Кінець", "choices": []}}}
+    manager = SessionManager(compile_scenario(scenario))
+    state = manager.state(manager.create("player"))
+    assert state["status"] == ENDED
+    assert state["available"] == []
+    assert Engine(manager.compiled).start() == ENDED
@@ -0,0 +1,32 @@
+"""Кеш розкладки поруч зі сценарієм."""
+import os
+
+import pytest
+
+pytest.importorskip("networkx")
+
+import graph_layout  # noqa: E402
+from graph_layout import LAYOUT_VERSION, LayoutCache  # noqa: E402
+
+
+def test_cache_round_trip(tmp_path):
+    cache = LayoutCache(str(tmp_path / "story.json"))
+    cache.save("hash", "layered", {"start": (0, 1), "end": (2.5, 3)})
+    assert cache.load() == {"version": LAYOUT_VERSION, "hash": "hash", "algorithm": "layered",
+                            "positions": {"start": [0.0, 1.0], "end": [2.5, 3.0]}}
+    assert os.listdir(tmp_path) == ["story.layout.json"]
+
+
+def test_failed_save_keeps_previous_cache(tmp_path, monkeypatch):
+    cache = LayoutCache(str(tmp_path / "story.json"))
+    cache.save("old", "spring", {"start": (0, 0)})
+
+    def disk_full(data, f, **kwargs):
+        f.write('{"version": ')
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(graph_layout.json, "dump", disk_full)
+    cache.save("new", "spring", {"start": (1, 1)})  # Помилку запису кешу ковтає save
+    monkeypatch.undo()
+    assert cache.load()["hash"] == "old"
+    assert os.listdir(tmp_path) == ["story.layout.json"]
@@ -0,0 +1,47 @@
+"""Обхід графа з NumPy і без нього дає однаковий звіт."""
+import random
+import sys
+
+import pytest
+
+import scenario_analyzer
+from scenario_engine import compile_scenario
+
+np = pytest.importorskip("numpy")
+
+
+def chain(n, back=3):
+    """Найглибший граф: кожна сцена веде до наступної й на кілька сцен назад."""
+    scenes = {f"s{i}": {"text": "", "choices": [{"text": "далі", "next_scene": f"s{i + 1}"},
+                                               {"text": "назад", "next_scene": f"s{max(i - back, 0)}"}]}
+              for i in range(n - 1)}
+    scenes[f"s{n - 1}"] = {"text": "", "choices": []}
+    return {"character": {"health": 1}, "scenes": scenes}
+
+
+def random_graph(n, seed):
+    rng = random.Random(seed)
+    scenes = {}
+    for i in range(n):
+        # Кожна десята сцена фінальна; частина виборів веде в нікуди або назад
+        count = 0 if i % 10 == 9 else rng.randint(1, 4)
+        scenes[f"s{i}"] = {"text": "", "choices": [{"text": "", "next_scene": f"s{rng.randrange(n + 5)}"}
+                                                   for _ in range(count)]}
+    return {"character": {"health": 1}, "scenes": scenes}
+
+
+def reports(data, monkeypatch):
+    compiled = compile_scenario(data)
+    monkeypatch.setattr(scenario_analyzer, "NUMPY_MIN_SCENES", 0)
+    vector = scenario_analyzer.analyze(compiled).to_dict()
+    monkeypatch.setattr(scenario_analyzer, "NUMPY_MIN_SCENES", sys.maxsize)
+    monkeypatch.delitem(sys.modules, "numpy")  # Інакше вже імпортований NumPy використовується завжди
+    python = scenario_analyzer.analyze(compiled).to_dict()
+    return vector, python
+
+
+@pytest.mark.parametrize("data", [chain(5000), random_graph(5000, 1), random_graph(20000, 2)],
+                         ids=["chain", "random-5k", "random-20k"])
+def test_numpy_and_python_paths_agree(data, monkeypatch):
+    vector, python = reports(data, monkeypatch)
+    assert vector == python
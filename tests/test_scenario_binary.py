@@ -0,0 +1,127 @@
+"""Бінарний формат .istb (збереження й читання, пошкоджені файли) і атомарний запис."""
+import os
+import stat
+import threading
+
+import pytest
+
+import scenario_binary
+from scenario_binary import load_scenario_file, save_scenario_file
+from scenario_engine import CompiledScenario, compile_scenario
+
+STORY = {
+    "character": {"health": 100, "золото": 2.5, "стан": "спокій"},
+    "title": "Лісова історія",
+    "scenes": {
+        "початок": {"text": "Довгий опис лісу. " * 40, "choices": [
+            {"text": "Піти до річки", "next_scene": "річка", "effect": {"health": -5, "золото": 0.5}},
+            {"text": "Купити човен", "next_scene": "кінець", "requires": "золото >= 3",
+             "effect": {"health": "max(health - 10, 1)"}, "hint": "потрібні гроші"},
+            {"text": "Стояти", "next_scene": ""}]},
+        "річка": {"text": "Річка 🌊", "choices": [{"text": "Назад", "next_scene": "початок"}], "mood": "тихо"},
+        "кінець": {"text": "Кінець", "choices": []},
+        "дивна": {"text": 5, "choices": "не список"},
+    },
+}
+
+
+def test_round_trip_keeps_every_field(tmp_path):
+    path = tmp_path / "story.istb"
+    save_scenario_file(STORY, path)
+    assert scenario_binary.is_binary_file(path)
+    assert load_scenario_file(path) == STORY
+
+    lazy = load_scenario_file(path, lazy=True)
+    assert list(lazy["scenes"]) == list(STORY["scenes"])
+    assert lazy["scenes"]["річка"] == STORY["scenes"]["річка"]
+    assert "нема" not in lazy["scenes"]
+    assert {key: value for key, value in lazy.items() if key != "scenes"} == \
+        {key: value for key, value in STORY.items() if key != "scenes"}
+
+
+def test_compile_from_binary_matches_json(tmp_path):
+    story = {"character": STORY["character"],
+             "scenes": {name: scene for name, scene in STORY["scenes"].items() if name != "дивна"}}
+    path = tmp_path / "story.istb"
+    save_scenario_file(story, path)
+    compiled = compile_scenario(load_scenario_file(path, lazy=True))
+    expected = CompiledScenario(story)
+    assert list(compiled.scene_names) == expected.scene_names
+    assert list(compiled.scene_texts) == expected.scene_texts
+    assert list(compiled.choice_texts) == expected.choice_texts
+    assert compiled.offsets == expected.offsets and compiled.targets == expected.targets
+    assert compiled.effects == expected.effects
+    attrs = [100, 3.0, "спокій"]
+    assert compiled.available(0, attrs) == expected.available(0, attrs) == [True, True, True]
+    assert compiled.step(0, list(attrs), 1) == expected.step(0, list(attrs), 1)
+
+
+@pytest.mark.parametrize("keep", [0.2, 0.5, 0.9, 0.999])
+def test_truncated_file_is_rejected(tmp_path, keep):
+    path = tmp_path / "story.istb"
+    save_scenario_file(STORY, path)
+    payload = path.read_bytes()
+    path.write_bytes(payload[:int(len(payload) * keep)])
+    with pytest.raises(ValueError, match="truncated or corrupt"):
+        load_scenario_file(path, lazy=True)
+
+
+@pytest.mark.parametrize("field", [3, 4, 5, 6, 7, 8, 11, 12, 13, 14, 15, 16, 17])
+def test_corrupt_header_is_rejected(tmp_path, field):
+    path = tmp_path / "story.istb"
+    save_scenario_file(STORY, path)
+    payload = bytearray(path.read_bytes())
+    values = list(scenario_binary.HEADER.unpack_from(payload))
+    values[field] += 3  # Кількість записів, кошиків чи зсув секції
+    scenario_binary.HEADER.pack_into(payload, 0, *values)
+    path.write_bytes(payload)
+    with pytest.raises(ValueError):
+        load_scenario_file(path)
+
+
+def test_corrupt_text_block_is_rejected(tmp_path):
+    path = tmp_path / "story.istb"
+    save_scenario_file(STORY, path)
+    payload = bytearray(path.read_bytes())
+    header = scenario_binary.HEADER.unpack_from(payload)
+    attrs_offset = header[13]
+    payload[attrs_offset - 20:attrs_offset] = bytes(20)  # Кінець останнього стисненого блоку
+    path.write_bytes(payload)
+    with pytest.raises(ValueError):
+        load_scenario_file(path)
+
+
+def _write_text(f):
+    f.write("data")
+
+
+@pytest.mark.skipif(os.name != "posix", reason="права доступу POSIX")
+def test_new_file_gets_umask_mode(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(os, "umask", lambda mask: calls.append(mask) or 0)
+    path = tmp_path / "new.json"
+    scenario_binary.atomic_write(path, _write_text, mode="w")
+    assert path.read_text() == "data"
+    assert stat.S_IMODE(path.stat().st_mode) == 0o666 & ~scenario_binary._UMASK
+    assert calls == []  # umask процесу не чіпаємо навіть на мить
+
+
+@pytest.mark.skipif(os.name != "posix", reason="права доступу POSIX")
+def test_existing_file_keeps_mode(tmp_path):
+    path = tmp_path / "old.json"
+    path.write_text("old")
+    path.chmod(0o640)
+    scenario_binary.atomic_write(path, _write_text, mode="w")
+    assert path.read_text() == "data"
+    assert stat.S_IMODE(path.stat().st_mode) == 0o640
+
+
+def test_parallel_writes_do_not_leave_temporaries(tmp_path):
+    paths = [tmp_path / f"{i}.json" for i in range(16)]
+    threads = [threading.Thread(target=scenario_binary.atomic_write, args=(p, _write_text), kwargs={"mode": "w"})
+               for p in paths]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(os.listdir(tmp_path)) == sorted(p.name for p in paths)
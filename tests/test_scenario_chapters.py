@@ -0,0 +1,58 @@
+"""Сценарії з розділів: збереження з редактора й переходи між розділами."""
+import os
+
+import pytest
+
+from scenario_chapters import ChapterScenario, Manifest, split_scenario
+from scenario_engine import PLAYING, Engine
+from scenario_model import ScenarioModel
+
+
+def make_story(count=6):
+    scenes = {f"s{i}": {"text": f"Сцена {i}", "choices": [{"text": "далі", "next_scene": f"s{i + 1}"}]}
+              for i in range(count - 1)}
+    scenes[f"s{count - 1}"] = {"text": "Кінець", "choices": []}
+    return {"character": {"health": 10}, "scenes": scenes}
+
+
+def test_renamed_start_scene_stays_in_first_chapter(tmp_path):
+    manifest = Manifest(split_scenario(make_story(), tmp_path, size=2))
+    model = ScenarioModel(manifest.merged())
+    model.rename_scene("s0", "intro")
+    manifest.save(model.snapshot())
+
+    saved = Manifest(manifest.path)
+    assert [chapter["scenes"] for chapter in saved.chapters] == [["intro", "s1"], ["s2", "s3"], ["s4", "s5"]]
+    assert saved.scene_names[0] == "intro"
+    assert saved.merged()["scenes"]["intro"]["choices"][0]["next_scene"] == "s1"
+
+
+def test_new_scene_joins_chapter_of_its_neighbour(tmp_path):
+    manifest = Manifest(split_scenario(make_story(), tmp_path, size=2))
+    data = manifest.merged()
+    scenes = {}
+    for name, scene in data["scenes"].items():
+        scenes[name] = scene
+        if name == "s2":
+            scenes["side"] = {"text": "Бічна", "choices": []}
+    data["scenes"] = scenes
+    manifest.save(data)
+
+    assert [chapter["scenes"] for chapter in Manifest(manifest.path).chapters] == \
+        [["s0", "s1"], ["s2", "side", "s3"], ["s4", "s5"]]
+
+
+def test_unreadable_target_chapter_leaves_game_unchanged(tmp_path):
+    story = make_story(4)
+    story["scenes"]["s1"]["choices"][0]["effect"] = {"health": -3}
+    manifest = Manifest(split_scenario(story, tmp_path, size=2))
+    os.remove(manifest.chapter_path(1))
+    engine = Engine(ChapterScenario(manifest, prefetch_depth=0))
+    engine.start()
+    engine.choose(0)
+
+    with pytest.raises(OSError):
+        engine.choose(0)  # s1 -> s2 веде в розділ без файлу
+    assert engine.scene_name() == "s1"
+    assert engine.character() == {"health": 10}
+    assert engine.status == PLAYING
@@ -0,0 +1,137 @@
+"""Рушій сценаріїв: CSR-таблиці й правила кроку, як у початковому `Game.make_choice`."""
+import random
+
+import pytest
+
+from scenario_engine import DEAD, ENDED, PLAYING, ChoiceNotAvailable, CompiledScenario, Engine, compile_scenario
+from scenario_gen import generate
+
+
+def reference_play(data, picks):
+    """Початкові правила гравця: ефекти лише для відомих характеристик, потім `health <= 0`,
+    потім перехід; порожній `next_scene` чи сцена без виборів завершують гру."""
+    character = dict(data["character"])
+    scenes = data["scenes"]
+    scene = next(iter(scenes))
+    if not scenes[scene]["choices"]:
+        return scene, character, ENDED
+    for pick in picks:
+        choices = scenes[scene]["choices"]
+        choice = choices[pick % len(choices)]
+        for attr, value in choice.get("effect", {}).items():
+            if attr in character:
+                character[attr] += value
+        if character.get("health", 1) <= 0:
+            return scene, character, DEAD
+        if not choice["next_scene"]:
+            return scene, character, ENDED
+        scene = choice["next_scene"]
+        if not scenes[scene]["choices"]:
+            return scene, character, ENDED
+    return scene, character, PLAYING
+
+
+def engine_play(compiled, picks):
+    engine = Engine(compiled)
+    engine.start()
+    for pick in picks:
+        if engine.status != PLAYING:
+            break
+        engine.choose(pick % len(engine.choices()))
+    return engine.scene_name(), engine.character(), engine.status
+
+
+def test_random_playthroughs_match_reference_rules():
+    data = generate(scenes=300, cycles=0.2, seed=3)
+    data["character"]["health"] = 15  # Щоб частина партій закінчувалася смертю
+    compiled = compile_scenario(data)
+    rng = random.Random(7)
+    statuses = set()
+    for _ in range(300):
+        picks = [rng.randrange(10) for _ in range(60)]
+        expected = reference_play(data, picks)
+        assert engine_play(compiled, picks) == expected
+        statuses.add(expected[2])
+    assert statuses == {PLAYING, DEAD, ENDED}
+
+
+SMALL = {"character": {"health": 10, "gold": 0}, "scenes": {
+    "start": {"text": "Початок", "choices": [
+        {"text": "ліс", "next_scene": "forest", "effect": {"gold": 2, "luck": 1}},
+        {"text": "вихід", "next_scene": ""},
+        {"text": "прірва", "next_scene": "end", "effect": {"health": -10}},
+        {"text": "туман", "next_scene": "nowhere"}]},
+    "forest": {"text": "Ліс", "choices": [{"text": "додому", "next_scene": "end", "effect": {"health": -3}}]},
+    "end": {"text": "Кінець", "choices": []}}}
+
+
+def test_compiled_tables():
+    compiled = CompiledScenario(SMALL)
+    assert compiled.scene_names == ["start", "forest", "end"]
+    assert list(compiled.offsets) == [0, 4, 5, 5]
+    assert list(compiled.targets) == [1, -1, 2, -1, 2]
+    assert compiled.effect_items == [((1, 2),), (), ((0, -10),), (), ((0, -3),)]
+    assert compiled.effects[0 * 2 + 1] == 2 and compiled.effects[4 * 2 + 0] == -3
+    assert compiled.dangling == [(0, 3, "nowhere")]
+    assert compiled.unknown_attrs == [(0, 0, "luck")]
+    assert compiled.is_ending(2) and not compiled.is_ending(0)
+    assert compiled.scene_choices(1) == ["додому"]
+
+
+@pytest.mark.parametrize("index, expected", [
+    (0, (1, PLAYING, [10, 2])),
+    (1, (0, ENDED, [10, 0])),  # Порожній next_scene: гра завершується в поточній сцені
+    (2, (0, DEAD, [0, 0])),  # Смерть перевіряється до переходу, навіть у фінальну сцену
+    (3, (0, ENDED, [10, 0])),  # Посилання в нікуди теж завершує гру
+])
+def test_step_rules(index, expected):
+    compiled = CompiledScenario(SMALL)
+    attrs = list(compiled.initial)
+    scene, status = compiled.step(0, attrs, index)
+    assert (scene, status, attrs) == expected
+
+
+def test_step_into_ending_and_bad_index():
+    compiled = CompiledScenario(SMALL)
+    attrs = list(compiled.initial)
+    assert compiled.step(1, attrs, 0) == (2, ENDED)
+    assert attrs == [7, 0]
+    with pytest.raises(IndexError):
+        compiled.step(0, attrs, 4)
+
+
+def test_start_scene_is_first_key():
+    engine = Engine(compile_scenario(SMALL))
+    assert engine.start() == PLAYING and engine.scene_name() == "start"
+    ending_first = {"character": {}, "scenes": {"end": {"text": "", "choices": []}, "start": SMALL["scenes"]["start"]}}
+    engine = Engine(compile_scenario(ending_first))
+    assert engine.start() == ENDED and engine.scene_name() == "end"
+    empty = Engine(compile_scenario({"character": {}, "scenes": {}}))
+    assert empty.start() == ENDED and empty.scene_name() is None
+    with pytest.raises(RuntimeError):
+        empty.choose(0)
+
+
+def test_conditions_and_expression_effects():
+    data = {"character": {"health": 10, "gold": 3}, "scenes": {
+        "start": {"text": "", "choices": [
+            {"text": "купити", "next_scene": "end", "requires": "gold >= 5"},
+            {"text": "обміняти", "next_scene": "start", "effect": {"gold": "health", "health": "gold * 2"}}]},
+        "end": {"text": "", "choices": []}}}
+    engine = Engine(compile_scenario(data))
+    engine.start()
+    assert engine.available() == [False, True]
+    with pytest.raises(ChoiceNotAvailable):
+        engine.choose(0)
+    engine.choose(1)
+    assert engine.character() == {"health": 6, "gold": 10}  # Обидва вирази за станом до вибору
+    assert engine.choose(0) == ENDED
+
+
+def test_stuck_scene_ends_the_game():
+    data = {"character": {"gold": 0}, "scenes": {
+        "start": {"text": "", "choices": [{"text": "далі", "next_scene": "gate"}]},
+        "gate": {"text": "", "choices": [{"text": "заплатити", "next_scene": "start", "requires": "gold > 0"}]}}}
+    engine = Engine(compile_scenario(data))
+    engine.start()
+    assert engine.choose(0) == ENDED and engine.scene_name() == "gate"
@@ -0,0 +1,112 @@
+"""Безпечні вирази: дозволений синтаксис, однаковий результат для гри й симуляції, ділення на нуль."""
+import pytest
+
+from scenario_expr import ExpressionError, compile_expression, expression_names, format_effect, parse_effect
+
+ATTRS = {"health": 0, "money": 1, "strength": 2}
+STATE = [50, 7, 3]
+
+
+def evaluate(source, state=STATE):
+    return compile_expression(source, ATTRS)(state)
+
+
+@pytest.mark.parametrize("source, expected", [
+    ("money >= 5 and strength > 2", 1),
+    ("money >= 5 and strength > 3", 0),
+    ("not money", 0),
+    ("0 < strength <= 3", 1),
+    ("0 < strength < 3", 0),
+    ("max(money - 20, 0)", 0),
+    ("min(health, money) * 2", 14),
+    ("clamp(health, 0, 10)", 10),
+    ("abs(strength - money)", 4),
+    ("-money + +strength", -4),
+    ("money // 2 + money % 2", 4),
+    ("money / 2", 3.5),
+    ("money > 5 or health < 0", 1),
+])
+def test_scalar_values(source, expected):
+    assert evaluate(source) == expected
+
+
+@pytest.mark.parametrize("source", [
+    "__import__('os').system('echo hacked')",
+    "health.__class__",
+    "open('secret')",
+    "[money for money in ()]",
+    "lambda: 1",
+    "money if health else strength",
+    "'text'",
+    "money[0]",
+    "min(money, key=abs)",
+    "abs(money, health)",
+    "health = 5",
+    "",
+    "money >",
+])
+def test_rejected_syntax(source):
+    with pytest.raises(ExpressionError):
+        compile_expression(source, ATTRS)
+
+
+def test_unknown_attribute():
+    with pytest.raises(ExpressionError, match="Unknown attribute 'mana'"):
+        compile_expression("mana > 1", ATTRS)
+    assert sorted(expression_names("max(money, health) > strength")) == ["health", "money", "strength"]
+
+
+@pytest.mark.parametrize("source, expected", [
+    ("money / 0", 0.0),
+    ("money // (strength - 3)", 0),
+    ("money % 0", 0),
+    ("money / (health - 50) + 1", 1.0),
+])
+def test_division_by_zero_gives_zero(source, expected):
+    assert evaluate(source) == expected
+
+
+def test_literal_zero_divisor_is_flagged():
+    assert compile_expression("money / 0", ATTRS).zero_divisor
+    assert not compile_expression("money / strength", ATTRS).zero_divisor
+
+
+def test_integral_expressions():
+    assert compile_expression("max(money - 2, 0) * 3", ATTRS).integral
+    assert not compile_expression("money / 2", ATTRS).integral
+    assert not compile_expression("money * 1.5", ATTRS).integral
+
+
+@pytest.mark.parametrize("source", [
+    "money >= 5 and strength > 2",
+    "not (money > 3) or health <= 40",
+    "0 < strength <= money",
+    "max(money - 20, 0) + min(health, 10)",
+    "clamp(money * 2 - strength, 0, 12)",
+    "abs(strength - money) % 3",
+    "money / strength",
+    "money // strength",
+    "money % strength",
+])
+def test_vector_matches_scalar(source):
+    np = pytest.importorskip("numpy")
+    states = np.array([[50, 7, 3], [0, 0, 0], [10, -4, 2], [1, 25, 0], [100, 3, -2]], dtype=np.int64)
+    expr = compile_expression(source, ATTRS)
+    vector = expr.vector(states)
+    assert list(vector) == pytest.approx([expr(list(row)) for row in states.tolist()])
+
+
+def test_direction_and_thresholds():
+    expr = compile_expression("money >= 5 and strength < 3", ATTRS)
+    assert expr.direction(1) == 1 and expr.direction(2) == -1 and expr.direction(0) == 0
+    assert expr.thresholds() == {1: [5], 2: [3]}
+    assert compile_expression("money == 5", ATTRS).direction(1) is None
+    assert compile_expression("money * 2 > 5", ATTRS).thresholds() == {1: None}
+
+
+def test_effect_round_trip():
+    effect = parse_effect("health -= 10; money = max(money - 20, 0); strength += 2.5")
+    assert effect == {"health": -10, "money": "max(money - 20, 0)", "strength": 2.5}
+    assert parse_effect(format_effect(effect)) == effect
+    with pytest.raises(ExpressionError):
+        parse_effect("health -= lots")
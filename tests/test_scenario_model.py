@@ -0,0 +1,65 @@
+"""Порядок сцен у моделі редактора: перша сцена файлу — стартова."""
+from scenario_binary import load_scenario_file, save_scenario_file
+from scenario_history import History
+from scenario_model import ScenarioModel
+from scenario_store import ChangeJournal
+
+
+def make_model():
+    scenes = {name: {"text": name, "choices": [{"text": "далі", "next_scene": "end"}]}
+              for name in ("start", "middle", "other")}
+    scenes["end"] = {"text": "Кінець", "choices": []}
+    model = ScenarioModel({"character": {"health": 10}, "scenes": scenes})
+    return model, History(model)
+
+
+def test_undo_delete_keeps_scene_order_in_saved_file(tmp_path):
+    model, history = make_model()
+    with history.group("delete"):
+        model.delete_scene("start", drop_references=True)
+    history.undo()
+
+    assert list(model.names) == ["start", "middle", "other", "end"]
+    path = tmp_path / "story.json"
+    save_scenario_file(model.snapshot(), path)
+    assert list(load_scenario_file(path)["scenes"]) == ["start", "middle", "other", "end"]
+
+
+def test_journal_replay_restores_scene_order(tmp_path):
+    model, history = make_model()
+    saved = model.snapshot()
+    model.take_changes()
+    with history.group("delete"):
+        model.delete_scene("start")
+    history.undo()
+
+    journal = ChangeJournal(tmp_path / "story.json")
+    journal.append(*model.take_changes())
+    journal.replay(saved)
+    assert list(saved["scenes"]) == ["start", "middle", "other", "end"]
+
+
+def test_rename_keeps_row_and_start_scene():
+    model, history = make_model()
+    with history.group("rename"):
+        model.rename_scene("start", "prologue")
+
+    assert list(model.names) == ["prologue", "middle", "other", "end"]
+    assert list(model.snapshot()["scenes"]) == ["prologue", "middle", "other", "end"]
+    history.undo()
+    assert list(model.snapshot()["scenes"]) == ["start", "middle", "other", "end"]
+    history.redo()
+    assert model.names.row("prologue") == 0
+
+
+def test_history_jump_over_many_renames_keeps_order():
+    model, history = make_model()
+    model.delete_scene("other")
+    name = "middle"
+    for i in range(ScenarioModel.BULK_NAMES):  # Достатньо операцій, щоб назви перебудувалися одним проходом
+        model.rename_scene(name, f"middle{i}")
+        name = f"middle{i}"
+    history.jump(0)
+    assert list(model.snapshot()["scenes"]) == ["start", "middle", "other", "end"]
+    history.jump(len(history))
+    assert list(model.names) == ["start", f"middle{ScenarioModel.BULK_NAMES - 1}", "end"]
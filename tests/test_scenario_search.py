@@ -0,0 +1,48 @@
+"""Пошук сцен: номери документів після правок і порядок рівних результатів."""
+import pytest
+
+import scenario_search
+from scenario_model import ScenarioModel
+from scenario_search import SearchIndex
+
+
+def make_index(names):
+    scenes = {name: {"text": "темний ліс", "choices": []} for name in names}
+    model = ScenarioModel({"character": {"health": 10}, "scenes": scenes})
+    index = SearchIndex(model)
+    index.rebuild(background=False)
+    return model, index
+
+
+@pytest.fixture(params=[True, False], ids=["numpy", "python"])
+def ranking(request, monkeypatch):
+    if request.param:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(scenario_search, "optional", lambda name: None)
+
+
+def test_edits_reuse_document_number():
+    model, index = make_index(["a", "b", "c"])
+    for i in range(50):
+        model.put_scene("b", {"text": f"темний ліс {i}", "choices": []})
+    assert len(index._names) == 3
+    assert [hit.name for hit in index.search("ліс 49")] == ["b"]
+    assert [hit.name for hit in index.search("ліс")] == ["a", "b", "c"]
+
+
+def test_deleted_scenes_are_compacted(monkeypatch):
+    monkeypatch.setattr(scenario_search, "COMPACT_MIN", 2)
+    model, index = make_index([f"s{i}" for i in range(10)])
+    for i in range(8):
+        model.delete_scene(f"s{i}")
+    assert len(index._names) < 10
+    assert [hit.name for hit in index.search("ліс")] == ["s8", "s9"]
+
+
+def test_ties_follow_scenario_order(ranking):
+    model, index = make_index(["a", "b", "c"])
+    model.put_scene("a", {"text": "темний ліс знову", "choices": []})
+    model.put_scene("d", {"text": "темний ліс", "choices": []})
+    model.rename_scene("c", "z")  # Перейменована сцена лишається на своєму рядку
+    assert [hit.name for hit in index.search("темний")] == ["a", "b", "z", "d"]
@@ -0,0 +1,54 @@
+"""Розв'язувач: цикли в сценаріях з умовами й обірваний пошук."""
+import time
+
+from scenario_solver import INF, solve_data
+
+
+def gate_story(health_loop=1):
+    """Відпочинок додає здоров'я, робота — золото; пройти браму можна лише з 5 золота."""
+    return {"character": {"health": 10, "gold": 0}, "scenes": {
+        "start": {"text": "", "choices": [
+            {"text": "rest", "next_scene": "start", "effect": {"health": health_loop}},
+            {"text": "work", "next_scene": "start", "effect": {"gold": 1, "health": -1}},
+            {"text": "go", "next_scene": "gate"}]},
+        "gate": {"text": "", "choices": [
+            {"text": "pay", "next_scene": "win", "requires": "gold >= 5", "effect": {"gold": -5}},
+            {"text": "fight", "next_scene": "lose", "effect": {"health": -30}}]},
+        "win": {"text": "", "choices": []},
+        "lose": {"text": "", "choices": []}}}
+
+
+def names(report, scenes):
+    return sorted(report.compiled.scene_names[s] for s in scenes)
+
+
+def test_gain_loop_with_condition_finishes_quickly():
+    started = time.perf_counter()
+    report = solve_data(gate_story())
+    assert time.perf_counter() - started < 1
+    assert not report.truncated
+    assert names(report, report.endings) == ["lose", "win"]
+    win = report.endings[report.compiled.scene_index["win"]]
+    assert len(win["shortest"].steps) == 7  # П'ять разів працювати, піти до брами й заплатити
+    assert win["safest"].health == INF and win["safest"].loops
+
+
+def test_values_between_constants_are_explored_exactly():
+    data = {"character": {"health": 3, "money": 0}, "scenes": {
+        "a": {"text": "", "choices": [
+            {"text": "earn", "next_scene": "a", "effect": {"money": "money * 2 + 1"}},
+            {"text": "buy", "next_scene": "b", "requires": "money % 7 == 3"}]},
+        "b": {"text": "", "choices": []}}}
+    report = solve_data(data)
+    assert names(report, report.endings) == ["b"]
+    assert len(report.endings[1]["shortest"].steps) == 3  # 0 -> 1 -> 3
+
+
+def test_truncated_search_does_not_claim_routes():
+    report = solve_data(gate_story(), max_states=20)
+    assert report.truncated
+    assert report.blocked == []
+    assert all(set(info) == {"route"} for info in report.endings.values())
+    text = report.format()
+    assert "    shortest:" not in text and "    safest:" not in text
+    assert "unknown (search truncated)" in text
@@ -0,0 +1,46 @@
+"""Швидкий запуск: імпорт інструментів не тягне важких бібліотек і не відкриває вікон."""
+import importlib.util
+import os
+import subprocess
+import sys
+
+import pytest
+
+from scenario_bench import CORE_MODULES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLOTTING = ("numpy", "matplotlib", "networkx")
+GUI_MODULES = ("plot_game", "plot_editor", "visio")
+IMPORT_BUDGET = 0.5  # Секунд на імпорт модуля разом з залежностями; зараз — десятки мілісекунд
+
+
+def import_profile(module):
+    """Імпортує `module` у свіжому процесі; повертає `sys.modules` після імпорту й сумарний час
+    імпорту модуля в секундах (з виводу `-X importtime`)."""
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    code = f"import sys, {module}; print('\\n'.join(sys.modules))"
+    done = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          cwd=ROOT, env=env, capture_output=True, text=True, timeout=60)
+    assert done.returncode == 0, done.stderr
+    seconds = None
+    for line in done.stderr.splitlines():
+        if line.startswith("import time:") and line.rsplit("|", 1)[-1].strip() == module:
+            seconds = int(line.split("|")[1]) / 1e6
+    return set(done.stdout.split()), seconds
+
+
+@pytest.mark.parametrize("module", GUI_MODULES)
+def test_gui_modules_import_without_plotting_libraries(module):
+    if importlib.util.find_spec("tkinter") is None:
+        pytest.skip("tkinter is not installed")
+    modules, seconds = import_profile(module)
+    assert not modules & set(PLOTTING)
+    assert seconds < IMPORT_BUDGET
+
+
+@pytest.mark.parametrize("module", CORE_MODULES)
+def test_core_modules_import_without_heavy_libraries(module):
+    modules, seconds = import_profile(module)
+    assert not modules & set(PLOTTING + ("tkinter",))
+    assert seconds < IMPORT_BUDGET
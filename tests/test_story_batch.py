@@ -0,0 +1,45 @@
+"""Пакетна перевірка: збій одного файлу стає його помилкою, а не зупиняє весь пакет."""
+import json
+import os
+
+import story_batch
+
+OPTIONS = {"command": "validate", "strict": False, "to": None, "output_dir": None}
+GOOD = {"character": {"health": 1}, "scenes": {"end": {"text": "Кінець", "choices": []}}}
+BROKEN = {
+    "effect.json": {"character": {"health": 1}, "scenes": {
+        "start": {"text": "t", "choices": [{"text": "x", "next_scene": "end", "effect": [1]}]},
+        "end": {"text": "Кінець", "choices": []}}},
+    "character.json": {"character": [], "scenes": {"end": {"text": "Кінець", "choices": []}}},
+    "value.json": {"character": {"health": 1}, "scenes": {
+        "start": {"text": "t", "choices": [{"text": "x", "next_scene": "end", "effect": {"health": None}}]},
+        "end": {"text": "Кінець", "choices": []}}},
+}
+
+
+def write_files(directory):
+    for name, data in dict(BROKEN, **{"good.json": GOOD}).items():
+        (directory / name).write_text(json.dumps(data), encoding="utf-8")
+    return story_batch.find_files([str(directory)])
+
+
+def test_malformed_files_are_reported_in_parallel_batch(tmp_path):
+    files = write_files(tmp_path)
+    results = {os.path.basename(result["path"]): result for result in story_batch.run(files, OPTIONS, jobs=2)}
+
+    assert results["good.json"]["ok"]
+    assert "'effect' should be a dictionary" in results["effect.json"]["errors"][0]
+    assert "'character' should be a dictionary" in results["character.json"]["errors"][0]
+    assert "effect on 'health' should be a number or an expression" in results["value.json"]["errors"][0]
+
+
+def test_unexpected_exception_becomes_file_error(tmp_path, monkeypatch):
+    files = write_files(tmp_path)
+
+    def broken(compiled):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(story_batch, "analyze", broken)
+    results = story_batch.run(files, OPTIONS)
+
+    assert [result["ok"] for result in results] == [False] * len(files)
+    assert any(error == "RuntimeError: boom" for result in results for error in result["errors"])
@@ -0,0 +1,201 @@
+"""Легка інструментація гарячих ділянок: іменовані інтервали (spans) і лічильники.
+
+Вимкнена за замовчуванням і тоді коштує один виклик функції на інтервал. Вмикається:
+    STORY_TRACE=trace.json python visio.py     — трасування у файл і підсумок при виході
+    STORY_TRACE=1 python visio.py              — лише підсумкова таблиця
+    python visio.py --trace trace.json         — те саме з командного рядка
+Файл трасування має формат Chrome Trace Event (відкривається в chrome://tracing або Perfetto).
+Підсумок (кількість викликів, сумарний, середній і найбільший час) друкується в stderr.
+"""
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+ENV_VAR = "STORY_TRACE"
+MAX_EVENTS = 1_000_000  # Після цього події не записуються, але підсумок рахується далі
+
+_enabled = False
+_path = None
+_events = []
+_stats = {}  # назва → [виклики, сумарний час, найбільший час]
+_counters = {}
+_lock = threading.Lock()
+_origin = time.perf_counter()
+_registered = False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        _record(self.name, self.start, end - self.start, self.args)
+        return False
+
+    def set(self, **args):
+        """Додає аргументи до події (напр. розмір оброблених даних)."""
+        self.args.update(args)
+
+
+def enabled():
+    return _enabled
+
+
+def enable(path=None):
+    """Вмикає трасування; `path` — куди записати Chrome-трасу при виході (None — лише підсумок)."""
+    global _enabled, _path, _registered
+    _enabled = True
+    _path = path
+    if not _registered:
+        atexit.register(_at_exit)
+        _registered = True
+
+
+def enable_from_argv(argv=None):
+    """Вмикає трасування за ключем `--trace FILE` / `--trace=FILE` і прибирає його з `argv`."""
+    argv = sys.argv if argv is None else argv
+    for i, arg in enumerate(argv[1:], start=1):
+        if arg == "--trace" and i + 1 < len(argv):
+            enable(argv[i + 1])
+            del argv[i:i + 2]
+            return True
+        if arg.startswith("--trace="):
+            enable(arg.split("=", 1)[1] or None)
+            del argv[i]
+            return True
+    return False
+
+
+def span(name, **args):
+    """Контекстний менеджер інтервалу: `with span("visio.layout", nodes=n): ...`."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def traced(name=None):
+    """Декоратор: кожен виклик функції — інтервал з її назвою."""
+    def decorate(function):
+        label = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _record(label, start, time.perf_counter() - start, None)
+        return wrapper
+    return decorate
+
+
+def count(name, value=1):
+    """Збільшує лічильник; у трасі він видно як графік значень."""
+    if not _enabled:
+        return
+    with _lock:
+        total = _counters.get(name, 0) + value
+        _counters[name] = total
+        if len(_events) < MAX_EVENTS:
+            _events.append({"name": name, "ph": "C", "ts": (time.perf_counter() - _origin) * 1e6,
+                            "pid": os.getpid(), "args": {"value": total}})
+
+
+def gauge(name, value):
+    """Записує поточне значення величини (напр. кількість видимих вузлів)."""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = value
+        if len(_events) < MAX_EVENTS:
+            _events.append({"name": name, "ph": "C", "ts": (time.perf_counter() - _origin) * 1e6,
+                            "pid": os.getpid(), "args": {"value": value}})
+
+
+def _record(name, start, duration, args):
+    with _lock:
+        stat = _stats.get(name)
+        if stat is None:
+            _stats[name] = [1, duration, duration]
+        else:
+            stat[0] += 1
+            stat[1] += duration
+            if duration > stat[2]:
+                stat[2] = duration
+        if len(_events) < MAX_EVENTS:
+            event = {"name": name, "ph": "X", "ts": (start - _origin) * 1e6, "dur": duration * 1e6,
+                     "pid": os.getpid(), "tid": threading.get_ident()}
+            if args:
+                event["args"] = args
+            _events.append(event)
+
+
+def summary():
+    """Таблиця інтервалів (від найдовшого сумарного часу) і лічильників."""
+    with _lock:
+        stats = sorted(_stats.items(), key=lambda item: item[1][1], reverse=True)
+        counters = sorted(_counters.items())
+    lines = [f"{'span':<36} {'calls':>8} {'total ms':>11} {'mean ms':>10} {'max ms':>10}"]
+    for name, (calls, total, longest) in stats:
+        lines.append(f"{name:<36} {calls:>8} {total * 1000:>11.2f} {total * 1000 / calls:>10.3f} "
+                     f"{longest * 1000:>10.3f}")
+    if counters:
+        lines.append("")
+        lines.append(f"{'counter':<36} {'value':>8}")
+        lines.extend(f"{name:<36} {value:>8}" for name, value in counters)
+    return "\n".join(lines)
+
+
+def write_trace(path):
+    """Записує події у форматі Chrome Trace Event."""
+    with _lock:
+        events = list(_events)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def _at_exit():
+    if not _enabled:
+        return
+    if _path:
+        try:
+            write_trace(_path)
+        except OSError as error:
+            print(f"Could not write trace to {_path}: {error}", file=sys.stderr)
+    if _stats or _counters:
+        print(summary(), file=sys.stderr)
+
+
+_value = os.environ.get(ENV_VAR, "")
+if _value and _value != "0":
+    enable(None if _value == "1" else _value)
@@ -1,9 +1,38 @@
 import json
-import networkx as nx
-import matplotlib.pyplot as plt
 import tkinter as tk
 from tkinter import filedialog, messagebox
 
+from editor_widgets import WHOLE_SCENARIO, ask_chapter
+from scenario_analyzer import AnalysisReport, analyze, validate_scenario
+from scenario_binary import load_scenario_file
+from scenario_chapters import ChapterScenes
+from scenario_engine import compile_scenario
+import tracing
+
+NODE_SIZE = 2000  # Розмір вузла (pt²), коли на екрані мало сцен
+MIN_NODE_SIZE = 20
+NODE_LABEL_LIMIT = 150  # Підписи сцен показуються, лише коли видимих сцен не більше
+EDGE_LABEL_LIMIT = 60  # Підписи виборів — коли видимих стрілок не більше
+ARROW_LENGTH = 12  # Довжина вістря стрілки в пікселях
+ARROW_LIMIT = 5000  # Вістря малюються, лише коли видимих стрілок не більше
+DRAW_BUDGET = 20000  # Найбільше вузлів і ліній на кадр; надлишок відкидається сталою вибіркою
+
+# numpy, networkx і matplotlib імпортуються в import_plotting(), коли файл уже вибрано:
+# діалог відкривається одразу, а не після секунди імпорту бібліотек малювання
+np = nx = plt = Path = PathPatch = cached_layout = None
+
+
+def import_plotting():
+    global np, nx, plt, Path, PathPatch, cached_layout
+    if plt is None:
+        import numpy as np
+        import networkx as nx
+        import matplotlib.pyplot as plt
+        from matplotlib.patches import PathPatch
+        from matplotlib.path import Path
+        from graph_layout import cached_layout
+
+
 class ScenarioVisualizer:
     def __init__(self):
         self.root = tk.Tk()
@@ -17,18 +46,27 @@ class ScenarioVisualizer:
         if not self.data:
             return
         
+        self.setup_figure()
+
+    def setup_figure(self):
+        """Створює порожній граф і фігуру matplotlib."""
+        import_plotting()
         self.G = nx.DiGraph()
         self.pos = {}
         self.fig, self.ax = plt.subplots(figsize=(10, 6))
+        self.labels = []  # Поточні підписи (лише для видимої частини графа)
+        self.background = None
+        self.drag_start = None
 
     def select_file(self):
         """Відкриває діалог вибору JSON-файлу."""
         file_path = filedialog.askopenfilename(
             title="Select a JSON Scenario File",
-            filetypes=[("JSON files", "*.json")]
+            filetypes=[("Scenario files", "*.json *.istb"), ("JSON files", "*.json"), ("Binary scenarios", "*.istb")]
         )
         return file_path
 
+    @tracing.traced("visio.load_scenario")
     def load_scenario(self):
         """Завантажує та перевіряє JSON-файл."""
         if not self.json_file:
@@ -36,23 +74,39 @@ class ScenarioVisualizer:
             return None
 
         try:
-            with open(self.json_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            
-            # Валідація структури JSON
-            if "character" not in data or "scenes" not in data:
-                raise ValueError("Invalid JSON format: Missing 'character' or 'scenes' key.")
+            data = load_scenario_file(self.json_file, lazy=True)
+            manifest = None
+            if isinstance(data["scenes"], ChapterScenes):
+                # Сценарій з розділів: показуємо один розділ або весь
+                manifest = data["scenes"].manifest
+                chapter = ask_chapter(self.root, manifest.chapter_names, title="Chapter",
+                                      whole_label="Whole scenario", ok_label="Open", cancel_label="Cancel")
+                if chapter is None:
+                    return None
+                if chapter == WHOLE_SCENARIO:
+                    data = manifest.merged()
+                    manifest = None
+                else:
+                    data = manifest.chapter_data(chapter)
+                    self.json_file = manifest.chapter_path(chapter)  # Окремий кеш розкладки для розділу
+            elif not isinstance(data["scenes"], dict):
+                data = load_scenario_file(self.json_file)
 
-            if not isinstance(data["scenes"], dict):
-                raise ValueError("Invalid JSON format: 'scenes' should be a dictionary.")
-
-            for scene_id, scene in data["scenes"].items():
-                if "text" not in scene or "choices" not in scene:
-                    raise ValueError(f"Scene '{scene_id}' is missing 'text' or 'choices' keys.")
+            # Валідація структури JSON
+            validate_scenario(data)
 
-                for choice in scene["choices"]:
-                    if "text" not in choice or "next_scene" not in choice:
-                        raise ValueError(f"Choice in scene '{scene_id}' is missing 'text' or 'next_scene'.")
+            # Аналіз графа: биті посилання, недосяжні сцени, цикли без виходу
+            self.compiled = compile_scenario(data)
+            if manifest is None:
+                report = analyze(self.compiled)
+            else:
+                # Розділ — лише частина графа: досяжність і фінали має сенс перевіряти на всьому
+                # сценарії, тут лишаються посилання, яких немає в жодному розділі
+                report = AnalysisReport(self.compiled)
+                report.dangling = [(self.compiled.scene_names[s], i, name)
+                                   for s, i, name in self.compiled.dangling if name not in manifest.scene_index]
+            if not report.ok:
+                messagebox.showwarning("Scenario issues", report.format(limit=10))
 
             return data
         
@@ -63,63 +117,214 @@ class ScenarioVisualizer:
             messagebox.showerror("Error", str(e))
             return None
 
+    @tracing.traced("visio.build_graph")
     def build_graph(self):
         """Створює граф із сцен."""
-        scenes = self.data["scenes"]
+        compiled = self.compiled
+        names = compiled.scene_names
 
         # Додаємо вузли (сцени)
-        for scene_id in scenes:
+        for scene_id in names:
             self.G.add_node(scene_id, label=scene_id)
 
         # Додаємо стрілки (зв’язки між сценами)
-        for scene_id, scene_data in scenes.items():
-            for choice in scene_data["choices"]:
-                next_scene = choice["next_scene"]
-                if next_scene in scenes:
-                    self.G.add_edge(scene_id, next_scene, label=choice["text"])
+        offsets, targets, texts = compiled.offsets, compiled.targets, compiled.choice_texts
+        for s, scene_id in enumerate(names):
+            for edge in range(offsets[s], offsets[s + 1]):
+                if targets[edge] >= 0:
+                    self.G.add_edge(scene_id, names[targets[edge]], label=texts[edge])
 
+    @tracing.traced("visio.draw_graph")
     def draw_graph(self):
-        """Малює граф із стрілками."""
+        """Малює граф пакетно: один шлях для всіх ліній, один для вістрів і одна колекція вузлів."""
         self.ax.clear()
-        self.pos = nx.spring_layout(self.G, seed=42, k=1.2)
+        self.labels = []
+        # Позиції беруться з кешу поруч зі сценарієм; змінені сцени розкладаються інкрементально
+        self.pos = cached_layout(self.G, self.json_file)
 
-        # Малюємо вузли (сцени)
-        nx.draw_networkx_nodes(self.G, self.pos, ax=self.ax, node_color="lightblue", node_size=2000)
+        nodes = list(self.G.nodes)
+        index = {node: i for i, node in enumerate(nodes)}
+        edges = list(self.G.edges(data="label"))
+        self.node_names = nodes
+        self.node_xy = np.array([self.pos[node] for node in nodes], dtype=float).reshape(-1, 2)
+        self.edge_src = np.array([index[u] for u, _, _ in edges], dtype=np.int64)
+        self.edge_dst = np.array([index[v] for _, v, _ in edges], dtype=np.int64)
+        self.edge_labels = [label for _, _, label in edges]
+        # Сталий випадковий ранг для вибірки при сильному віддаленні
+        rng = np.random.default_rng(42)
+        self.node_rank = rng.permutation(len(nodes))
+        self.edge_rank = rng.permutation(len(edges))
 
-        # Малюємо зв’язки (орієнтовані стрілки)
-        nx.draw_networkx_edges(self.G, self.pos, ax=self.ax, edge_color="black", arrows=True, arrowsize=20)
-
-        # Додаємо підписи сцен
-        labels = {node: node for node in self.G.nodes}
-        nx.draw_networkx_labels(self.G, self.pos, ax=self.ax, labels=labels, font_size=10, font_weight="bold")
-
-        # Додаємо підписи до стрілок (текст вибору)
-        edge_labels = {(u, v): data["label"] for u, v, data in self.G.edges(data=True)}
-        nx.draw_networkx_edge_labels(self.G, self.pos, ax=self.ax, edge_labels=edge_labels, font_size=9, label_pos=0.5)
-
-        # Додаємо стрілки червоного кольору з напрямком
-        for edge in self.G.edges:
-            x1, y1 = self.pos[edge[0]]
-            x2, y2 = self.pos[edge[1]]
-            self.ax.annotate(
-                "",
-                xy=(x2, y2),
-                xytext=(x1, y1),
-                arrowprops=dict(arrowstyle="->", color="red", lw=2)
-            )
+        self.edge_collection = PathPatch(Path(np.empty((0, 2))), fill=False, edgecolor="red", lw=1.5, zorder=1)
+        self.arrow_collection = PathPatch(Path(np.empty((0, 2))), fill=False, edgecolor="red", lw=1.5, zorder=1)
+        self.ax.add_patch(self.edge_collection)
+        self.ax.add_patch(self.arrow_collection)
+        self.node_collection = self.ax.scatter(self.node_xy[:, 0], self.node_xy[:, 1], s=NODE_SIZE,
+                                               c="lightblue", edgecolors="none", zorder=2)
 
+        if len(nodes):
+            lo, hi = self.node_xy.min(axis=0), self.node_xy.max(axis=0)
+            pad = np.maximum((hi - lo) * 0.1, 0.1)
+            self.ax.set_xlim(lo[0] - pad[0], hi[0] + pad[0])
+            self.ax.set_ylim(lo[1] - pad[1], hi[1] + pad[1])
         self.ax.set_title("Scenario Graph Visualization")
         self.ax.axis("off")  # Вимикаємо координатні осі
+        self.update_view()
         self.fig.canvas.draw()
 
+    @tracing.traced("visio.update_view")
+    def update_view(self):
+        """Відсікає все поза видимою областю та обирає рівень деталізації."""
+        (xmin, xmax), (ymin, ymax) = self.ax.get_xlim(), self.ax.get_ylim()
+        xy = self.node_xy
+        visible = (xy[:, 0] >= xmin) & (xy[:, 0] <= xmax) & (xy[:, 1] >= ymin) & (xy[:, 1] <= ymax)
+        node_ids = self.sample(np.flatnonzero(visible), self.node_rank)
+        n_visible = int(visible.sum())
+
+        # Що більше сцен на екрані, то менші вузли
+        size = NODE_SIZE if n_visible <= 50 else max(MIN_NODE_SIZE, NODE_SIZE * 50 / n_visible)
+        self.node_collection.set_offsets(xy[node_ids])
+        self.node_collection.set_sizes([size])
+
+        # Ребро видиме, якщо його обмежувальний прямокутник перетинає екран
+        p1, p2 = xy[self.edge_src], xy[self.edge_dst]
+        shown = ((np.minimum(p1[:, 0], p2[:, 0]) <= xmax) & (np.maximum(p1[:, 0], p2[:, 0]) >= xmin)
+                 & (np.minimum(p1[:, 1], p2[:, 1]) <= ymax) & (np.maximum(p1[:, 1], p2[:, 1]) >= ymin)
+                 & (self.edge_src != self.edge_dst))
+        n_shown = int(shown.sum())
+        edge_ids = self.sample(np.flatnonzero(shown), self.edge_rank)
+        tracing.gauge("visio.visible_nodes", n_visible)
+        tracing.gauge("visio.visible_edges", n_shown)
+        p1, p2 = p1[edge_ids], p2[edge_ids]
+
+        # Геометрію стрілок рахуємо в пікселях, щоб вістря не залежали від масштабу
+        to_pixels = self.ax.transData
+        a = to_pixels.transform(p1) if len(edge_ids) else np.empty((0, 2))
+        b = to_pixels.transform(p2) if len(edge_ids) else np.empty((0, 2))
+        delta = b - a
+        length = np.hypot(delta[:, 0], delta[:, 1])
+        length[length == 0] = 1
+        unit = delta / length[:, None]
+        radius = np.sqrt(size) / 2 * self.fig.dpi / 72
+        start = a + unit * np.minimum(radius, length / 3)[:, None]
+        end = b - unit * np.minimum(radius, length / 3)[:, None]
+        to_data = to_pixels.inverted()
+        self.edge_collection.set_path(self.polylines(to_data, start, end))
+        self.edge_collection.set_linewidth(1.5 if n_shown <= ARROW_LIMIT else 0.5)
+        if n_shown <= ARROW_LIMIT:
+            head = np.minimum(ARROW_LENGTH, length / 3)[:, None]
+            normal = np.column_stack([-unit[:, 1], unit[:, 0]])
+            wing1 = end - unit * head + normal * head * 0.5
+            wing2 = end - unit * head - normal * head * 0.5
+            self.arrow_collection.set_path(self.polylines(to_data, wing1, end, wing2))
+        else:
+            self.arrow_collection.set_path(self.polylines(to_data))
+
+        self.draw_labels(visible, n_visible, edge_ids, n_shown, start, end, to_data)
+
+    @tracing.traced("visio.draw_labels")
+    def draw_labels(self, visible, n_visible, edge_ids, n_shown, start, end, to_data):
+        """Підписи — лише при достатньому наближенні."""
+        xy = self.node_xy
+        for label in self.labels:
+            label.remove()
+        self.labels = []
+        animated = self.background is not None
+        if n_visible <= NODE_LABEL_LIMIT:
+            for i in np.flatnonzero(visible):
+                self.labels.append(self.ax.text(xy[i, 0], xy[i, 1], self.node_names[i], fontsize=10,
+                                                fontweight="bold", ha="center", va="center", zorder=3,
+                                                clip_on=True, animated=animated))
+        if n_shown <= EDGE_LABEL_LIMIT:
+            middle = to_data.transform((start + end) / 2) if len(edge_ids) else []
+            for (x, y), e in zip(middle, edge_ids):
+                self.labels.append(self.ax.text(x, y, self.edge_labels[e], fontsize=9, ha="center", va="center",
+                                                zorder=3, clip_on=True, animated=animated,
+                                                bbox=dict(boxstyle="round", fc="white", ec="none", alpha=0.8)))
+
+    @staticmethod
+    def sample(ids, rank):
+        """Залишає не більше ~DRAW_BUDGET елементів з `ids`, завжди одних і тих самих."""
+        if len(ids) <= DRAW_BUDGET:
+            return ids
+        return ids[rank[ids] < DRAW_BUDGET * len(rank) / len(ids)]
+
+    @staticmethod
+    def polylines(to_data, *points):
+        """Один шлях з багатьох ламаних: i-та ламана проходить через i-ті точки з `points`."""
+        if not points or not len(points[0]):
+            return Path(np.empty((0, 2)))
+        vertices = to_data.transform(np.stack(points, axis=1).reshape(-1, 2))
+        codes = np.full(len(points), Path.LINETO, dtype=Path.code_type)
+        codes[0] = Path.MOVETO
+        return Path(vertices, np.tile(codes, len(points[0])))
+
+    def dynamic_artists(self):
+        return [self.edge_collection, self.arrow_collection, self.node_collection] + self.labels
+
+    def enable_blit(self):
+        """Переводить граф у режим блітингу: фон кешується, при панорамуванні й масштабуванні
+        перемальовуються лише колекції та видимі підписи."""
+        if not self.fig.canvas.supports_blit:
+            return
+        for artist in self.dynamic_artists():
+            artist.set_animated(True)
+        self.fig.canvas.mpl_connect("draw_event", self.on_draw)
+        self.fig.canvas.mpl_connect("button_press_event", self.on_press)
+        self.fig.canvas.mpl_connect("motion_notify_event", self.on_motion)
+        self.fig.canvas.mpl_connect("button_release_event", self.on_release)
+
+    def on_draw(self, event):
+        """Після повного перемальовування кешує статичний фон і домальовує динамічні шари."""
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self.update_view()  # Межі могли змінитися через панель інструментів або розмір вікна
+        self.blit()
+
+    def blit(self):
+        """Відновлює кешований фон і малює поверх нього лише динамічні шари."""
+        canvas = self.fig.canvas
+        if self.background is None:
+            canvas.draw_idle()
+            return
+        canvas.restore_region(self.background)
+        for artist in self.dynamic_artists():
+            self.ax.draw_artist(artist)
+        canvas.blit(self.fig.bbox)
+
+    def refresh(self):
+        self.update_view()
+        self.blit()
+
     def on_scroll(self, event):
-        """Масштабування графа колесом миші."""
+        """Масштабування графа колесом миші навколо курсора."""
         scale_factor = 1.1 if event.step > 0 else 0.9
         xlim = self.ax.get_xlim()
         ylim = self.ax.get_ylim()
-        self.ax.set_xlim([x * scale_factor for x in xlim])
-        self.ax.set_ylim([y * scale_factor for y in ylim])
-        self.fig.canvas.draw()
+        cx = event.xdata if event.xdata is not None else sum(xlim) / 2
+        cy = event.ydata if event.ydata is not None else sum(ylim) / 2
+        self.ax.set_xlim([cx + (x - cx) * scale_factor for x in xlim])
+        self.ax.set_ylim([cy + (y - cy) * scale_factor for y in ylim])
+        self.refresh()
+
+    def on_press(self, event):
+        """Початок панорамування лівою кнопкою миші."""
+        toolbar = self.fig.canvas.toolbar
+        if event.button == 1 and event.inaxes is self.ax and not getattr(toolbar, "mode", ""):
+            self.drag_start = (event.x, event.y, self.ax.get_xlim(), self.ax.get_ylim())
+
+    def on_motion(self, event):
+        """Панорамування: зсуваємо межі осей і блітимо лише динамічні шари."""
+        if self.drag_start is None:
+            return
+        x0, y0, (xmin, xmax), (ymin, ymax) = self.drag_start
+        dx = (event.x - x0) * (xmax - xmin) / self.ax.bbox.width
+        dy = (event.y - y0) * (ymax - ymin) / self.ax.bbox.height
+        self.ax.set_xlim(xmin - dx, xmax - dx)
+        self.ax.set_ylim(ymin - dy, ymax - dy)
+        self.refresh()
+
+    def on_release(self, event):
+        self.drag_start = None
 
     def run(self):
         """Запускає візуалізацію."""
@@ -128,13 +333,19 @@ class ScenarioVisualizer:
         
         self.build_graph()
         self.draw_graph()
+        self.enable_blit()
 
         # Додаємо обробник масштабування
         self.fig.canvas.mpl_connect("scroll_event", self.on_scroll)
 
         plt.show()
 
-# Запуск програми
-if __name__ == "__main__":
+def main():
+    tracing.enable_from_argv()
     visualizer = ScenarioVisualizer()
     visualizer.run()
+
+
+# Запуск програми
+if __name__ == "__main__":
+    main()